@@ -0,0 +1,88 @@
+"""Memory and top-k comparison of the levels user formats.
+
+    python -m benchmarks.levels_columns --sizes 10000,100000
+
+For each size builds a synthetic guild in the JSON form ({"uid": {...}})
+and as cogs.levels.columns.XPColumns, and reports the memory each takes
+(tracemalloc), the time of a full sort against XPColumns.top() for the first
+leaderboard page, and of a season reset. Results match or the run fails.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cogs.levels import columns
+from cogs.levels.columns import XPColumns
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+PAGE = 10
+
+
+def make_users(n: int, rng: random.Random) -> dict:
+    now = int(time.time())
+    return {
+        str(rng.randrange(10**17, 10**18)): {
+            'text_xp': rng.randrange(200_000),
+            'voice_xp': rng.randrange(50_000),
+            'last_msg_xp_at': now - rng.randrange(86400 * 30),
+        }
+        for _ in range(n)
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def run(n: int) -> dict:
+    rng = random.Random(n)
+    users, dict_bytes = measure(lambda: make_users(n, rng))
+    cols, cols_bytes = measure(lambda: XPColumns.from_users(users))
+
+    start = time.perf_counter()
+    ranked = sorted(((int(uid), u['text_xp']) for uid, u in users.items()), key=lambda x: (-x[1], x[0]))
+    sort_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    page = cols.top('text_xp', PAGE)
+    top_ms = (time.perf_counter() - start) * 1000
+    if page != ranked[:PAGE]:
+        raise AssertionError(f'{n}: top() differisce dall\'ordinamento completo')
+
+    start = time.perf_counter()
+    cols.reset()
+    reset_ms = (time.perf_counter() - start) * 1000
+    if any(cols.columns['text_xp']):
+        raise AssertionError(f'{n}: reset incompleto')
+
+    return {
+        'users': n,
+        'dict_bytes_per_user': round(dict_bytes / n),
+        'columns_bytes_per_user': round(cols_bytes / n),
+        'sort_ms': round(sort_ms, 3),
+        'top_ms': round(top_ms, 3),
+        'reset_ms': round(reset_ms, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.levels_columns')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)))
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    print(json.dumps({'numpy': columns.numpy is not None, 'results': [run(n) for n in sizes]}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Microbenchmark of the level curve lookups.
+
+    python -m benchmarks.levels_curve
+
+Checks that cogs.levels.curve.level_from_xp matches the original level by
+level walk around every level boundary from 0 to 10,000, then times both at
+increasing levels: the walk grows linearly, the table/closed-form lookup
+stays flat.
+"""
+import os
+import sys
+import json
+import time
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from cogs.levels.curve import level_from_xp, level_from_xp_loop, xp_for_level
+
+MAX_LEVEL = 10_000
+PROBE_LEVELS = (0, 10, 100, 1_000, 5_000, 10_000, 50_000)
+
+
+def check(max_level: int = MAX_LEVEL) -> int:
+    rng = random.Random(7)
+    checked = 0
+    # Walk once and compare at every boundary instead of re-walking per value
+    total = 0
+    for level in range(max_level + 1):
+        needed = 5 * level * level + 50 * level + 100
+        for xp in (total, total + 1, total + rng.randrange(needed), total + needed - 1):
+            expected = (level, xp - total, needed)
+            got = level_from_xp(xp)
+            if got != expected:
+                raise AssertionError(f'xp={xp}: atteso {expected}, ottenuto {got}')
+            checked += 1
+        total += needed
+    # Spot checks straight against the reference walk
+    for level in range(0, max_level + 1, 997):
+        for xp in (xp_for_level(level) - 1, xp_for_level(level)):
+            if xp >= 0 and level_from_xp(xp) != level_from_xp_loop(xp):
+                raise AssertionError(f'xp={xp}: differisce dal ciclo originale')
+            checked += 1
+    return checked
+
+
+def per_call_ns(fn, xp: int, budget: float = 0.05) -> float:
+    calls, elapsed, batch = 0, 0.0, 1
+    while elapsed < budget:
+        start = time.perf_counter()
+        for _ in range(batch):
+            fn(xp)
+        elapsed += time.perf_counter() - start
+        calls += batch
+        batch = min(batch * 2, 4096)
+    return elapsed / calls * 1e9
+
+
+def main():
+    checked = check()
+    timings = []
+    for level in PROBE_LEVELS:
+        xp = xp_for_level(level) + 1
+        timings.append({
+            'level': level,
+            'xp': xp,
+            'lookup_ns': round(per_call_ns(level_from_xp, xp)),
+            'loop_ns': round(per_call_ns(level_from_xp_loop, xp)),
+        })
+    print(json.dumps({'checked': checked, 'timings': timings}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""Storage benchmarks on synthetic guilds.
+
+    python -m benchmarks.storage --sizes 1000,10000 --backend json --output run.json
+
+Each size runs in its own process on a temporary copy of data/, with the
+documents in the exact schemas the cogs use, so peak RSS is per size. Results
+are printed as JSON (p50/p99/mean in milliseconds) to compare backends
+(json, journal, sqlite) across runs.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json_store
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BACKENDS = ('json', 'journal', 'sqlite')
+GUILD_ID = '1350073876339490826'
+# Total operations per measurement are capped so 1M users stays bearable
+OPS_BUDGET = 2_000_000
+
+
+def make_levels(n: int, rng: random.Random, now: int) -> dict:
+    users = {}
+    for i in range(n):
+        users[str(100000000000000000 + i)] = {
+            "text_xp": rng.randint(0, 500_000),
+            "voice_xp": rng.randint(0, 200_000),
+            "last_msg_xp_at": now - rng.randint(0, 30 * 86400),
+        }
+    return {"users": users}
+
+
+def make_reputation(n: int, rng: random.Random, now: int) -> dict:
+    base = 100000000000000000
+    logs = []
+    totals: Dict[str, int] = {}
+    for i in range(n):
+        a, b = base + rng.randrange(n), base + rng.randrange(n)
+        delta = 1 if rng.random() < 0.9 else -1
+        logs.append({'from': a, 'to': b, 'delta': delta, 'reason': None,
+                     'created_at': now - (n - i) * 30})
+        totals[str(b)] = totals.get(str(b), 0) + delta
+    return {"totals": totals, "logs": logs}
+
+
+def make_reminders(n: int, rng: random.Random, now: int) -> dict:
+    items = []
+    for i in range(n):
+        items.append({
+            'id': i + 1,
+            'user_id': 100000000000000000 + rng.randrange(max(1, n * 10)),
+            'channel_id': 1351184266284896347,
+            'is_dm': rng.random() < 0.3,
+            'message': 'promemoria di prova',
+            'remind_at': now + rng.randint(-60, 7 * 86400),
+            'created_at': now - rng.randint(0, 86400),
+        })
+    return {"last_id": n, "items": items}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(samples: List[float]) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        'n': len(ms),
+        'p50_ms': round(percentile(ms, 50), 4),
+        'p99_ms': round(percentile(ms, 99), 4),
+        'mean_ms': round(sum(ms) / len(ms), 4) if ms else 0.0,
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+async def timed(fn: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        if asyncio.iscoroutine(result):
+            await result
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# Scans copied from the cogs so the numbers match what the bot does
+
+def leaderboard(users: dict, mode: str = 'text', offset: int = 0, page_size: int = 10):
+    items = []
+    for uid, u in users.items():
+        xp = int(u.get('text_xp', 0)) if mode == 'text' else int(u.get('voice_xp', 0))
+        items.append((int(uid), xp))
+    items.sort(key=lambda x: x[1], reverse=True)
+    return items[offset:offset + page_size]
+
+
+def rep_cooldown_scan(logs: list, from_id: int, to_id: int, now: int):
+    last_entry = next((log for log in reversed(logs) if log.get('from') == from_id and log.get('to') == to_id), None)
+    day_ago = now - 86400
+    given_today = sum(1 for log in logs if log.get('from') == from_id and int(log.get('created_at', 0)) >= day_ago)
+    return last_entry, given_today
+
+
+def reminder_dispatch_scan(items: list, now: int):
+    due, remaining = [], []
+    for r in items:
+        (remaining if int(r.get('remind_at', 0)) > now else due).append(r)
+    return due, remaining
+
+
+async def _run(size: int, backend: str, repeat: int, seed: int, workdir: str) -> dict:
+    rng = random.Random(seed)
+    now = int(time.time())
+    json_store.set_flush_interval(3600)
+    paths = {name: os.path.join(workdir, 'data', f'{name}.json') for name in ('levels', 'reputation', 'reminders')}
+    sqlite = None
+    if backend == 'journal':
+        for path in paths.values():
+            json_store.enable_journal(path)
+    elif backend == 'sqlite':
+        import sqlite_store
+        sqlite = sqlite_store.SQLiteBackend(os.path.join(workdir, 'data', 'valiance.db'))
+        for name, path in paths.items():
+            sqlite.register(path, sqlite_store.DATASETS[name])
+
+    gen_start = time.perf_counter()
+    docs = {
+        'levels': make_levels(size, rng, now),
+        'reputation': make_reputation(size, rng, now),
+        'reminders': make_reminders(max(1, size // 10), rng, now),
+    }
+    for name, doc in docs.items():
+        await json_store.save_shard(paths[name], GUILD_ID, doc)
+    await json_store.flush_all()
+    generated = time.perf_counter() - gen_start
+    del docs
+
+    levels_shard = json_store.shard_path(paths['levels'], GUILD_ID)
+    reps = max(3, min(repeat, OPS_BUDGET // size))
+    results: Dict[str, Any] = {}
+
+    async def load():
+        json_store.invalidate(levels_shard)
+        await json_store.load_shard(paths['levels'], GUILD_ID, {})
+
+    results['load'] = await timed(load, reps)
+    levels = await json_store.load_shard(paths['levels'], GUILD_ID, {})
+    uids = list(levels['users'])
+
+    async def save():
+        await json_store.save_shard(paths['levels'], GUILD_ID, levels)
+        await json_store.flush_all()
+
+    results['save'] = await timed(save, reps)
+
+    async def update_one():
+        uid = rng.choice(uids)
+        u = levels['users'][uid]
+        u['text_xp'] = int(u.get('text_xp', 0)) + rng.randint(5, 15)
+        u['last_msg_xp_at'] = int(time.time())
+        await json_store.save_shard(paths['levels'], GUILD_ID, levels, changes=[('users', uid)])
+        await json_store.flush_all()
+
+    results['update_one_user'] = await timed(update_one, reps)
+    results['leaderboard_sort'] = await timed(lambda: leaderboard(levels['users']), reps)
+
+    rep = await json_store.load_shard(paths['reputation'], GUILD_ID, {"totals": {}, "logs": []})
+    logs = rep['logs']
+    results['rep_cooldown_scan'] = await timed(
+        lambda: rep_cooldown_scan(logs, int(rng.choice(uids)), int(rng.choice(uids)), now), reps)
+
+    reminders = await json_store.load_shard(paths['reminders'], GUILD_ID, {"items": []})
+    results['reminder_dispatch_scan'] = await timed(lambda: reminder_dispatch_scan(reminders['items'], now), reps)
+
+    await json_store.close()
+    sizes_on_disk = 0
+    for dirpath, _, files in os.walk(os.path.join(workdir, 'data')):
+        sizes_on_disk += sum(os.path.getsize(os.path.join(dirpath, f)) for f in files)
+    return {
+        'users': size,
+        'rep_logs': size,
+        'reminders': max(1, size // 10),
+        'repeat': reps,
+        'generate_s': round(generated, 3),
+        'disk_bytes': sizes_on_disk,
+        'ops': {name: summarize(samples) for name, samples in results.items()},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_size(size: int, backend: str, repeat: int, seed: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix='valiance-bench-') as workdir:
+        return asyncio.run(_run(size, backend, repeat, seed, workdir))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.storage', description='Benchmark dello storage su gilde sintetiche')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='numero di utenti per gilda, separati da virgola')
+    parser.add_argument('--backend', choices=BACKENDS, default='json')
+    parser.add_argument('--repeat', type=int, default=50, help='ripetizioni per operazione (ridotte per le taglie grandi)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='scrive il JSON anche su questo file')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s.replace('_', '')) for s in args.sizes.split(',') if s.strip()]
+    report = {
+        'backend': args.backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'orjson': json_store.orjson is not None,
+        'started_at': int(time.time()),
+        'results': [],
+    }
+    for size in sizes:
+        print(f'[{args.backend}] {size} utenti...', file=sys.stderr)
+        # A fresh process per size keeps peak RSS meaningful
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            report['results'].append(pool.submit(run_size, size, args.backend, args.repeat, args.seed).result())
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(out + '\n')
+    print(out)
+
+
+if __name__ == '__main__':
+    main()
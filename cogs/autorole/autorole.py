@@ -5,6 +5,7 @@ from bot_utils import is_owner
 import json
 import os
 from console_logger import logger
+from json_store import write_json_nowait
 
 BASE_DIR = os.path.dirname(__file__)
 CONFIG_PATH = os.path.join(BASE_DIR, 'autorole.json')
@@ -31,16 +32,14 @@ class AutoRoleCog(commands.Cog):
                 except Exception:
                     self.autorole_config = {}
             try:
-                with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-                    json.dump(self.autorole_config, f, indent=2, ensure_ascii=False)
+                write_json_nowait(CONFIG_PATH, self.autorole_config, pretty=True)
             except Exception:
                 pass
         else:
             self.autorole_config = {}
 
     def save_config(self):
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(self.autorole_config, f, indent=2, ensure_ascii=False)
+        write_json_nowait(CONFIG_PATH, self.autorole_config, pretty=True)
 
     @app_commands.command(name='reloadautorole', description='Ricarica la configurazione di AutoRole (solo admin)')
     async def reload_autorole(self, interaction: discord.Interaction):
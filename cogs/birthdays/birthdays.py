@@ -6,7 +6,7 @@ import os
 import time
 from typing import Optional, List, Tuple
 
-from json_store import load_json, save_json
+from json_store import load_shard, save_shard
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')), 'data', 'birthdays.json')
@@ -78,39 +78,34 @@ class BirthdaysCog(commands.Cog):
             await interaction.response.send_message('Formato non valido. Usa DD/MM o DD/MM/YY', ephemeral=True)
             return
         d, m, y = parsed
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = str(interaction.user.id)
-        guild_data = data.get(gid, {})
+        guild_data = await load_shard(DATA_PATH, gid, {})
         users = guild_data.get('users', {})
         users[uid] = {"day": d, "month": m, "year": y}
         guild_data['users'] = users
-        data[gid] = guild_data
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, guild_data, changes=[('users', uid)])
         await interaction.response.send_message(self.config['messages']['set'].format(user=interaction.user.mention, date=date))
 
     @bday.command(name='remove', description='Rimuovi il tuo compleanno')
     async def birthday_remove(self, interaction: discord.Interaction):
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = str(interaction.user.id)
-        guild_data = data.get(gid, {})
+        guild_data = await load_shard(DATA_PATH, gid, {})
         users = guild_data.get('users', {})
         if uid in users:
             users.pop(uid, None)
             guild_data['users'] = users
-            data[gid] = guild_data
-            await save_json(DATA_PATH, data)
+            await save_shard(DATA_PATH, gid, guild_data, changes=[('users', uid)])
         await interaction.response.send_message(self.config['messages']['removed'], ephemeral=True)
 
     @bday.command(name='when', description='Mostra il compleanno di un utente')
     @app_commands.describe(user='Utente (opzionale)')
     async def birthday_when(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
         member = user or interaction.user
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = str(member.id)
-        users = data.get(gid, {}).get('users', {})
+        users = (await load_shard(DATA_PATH, gid, {})).get('users', {})
         info = users.get(uid)
         if not info:
             await interaction.response.send_message('Non trovato.', ephemeral=True)
@@ -122,9 +117,8 @@ class BirthdaysCog(commands.Cog):
     @bday.command(name='next', description='Mostra i prossimi compleanni')
     async def birthday_next(self, interaction: discord.Interaction):
         import datetime
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
-        users = data.get(gid, {}).get('users', {})
+        users = (await load_shard(DATA_PATH, gid, {})).get('users', {})
         if not users:
             await interaction.response.send_message('Nessun compleanno registrato.', ephemeral=True)
             return
@@ -160,9 +154,8 @@ class BirthdaysCog(commands.Cog):
                 return
             # Send wishes once
             for guild in self.bot.guilds:
-                data = await load_json(DATA_PATH, {})
                 gid = str(guild.id)
-                users = data.get(gid, {}).get('users', {})
+                users = (await load_shard(DATA_PATH, gid, {})).get('users', {})
                 todays = [int(uid) for uid, info in users.items() if int(info.get('day', 0)) == today.day and int(info.get('month', 0)) == today.month]
                 if not todays:
                     continue
@@ -5,6 +5,7 @@ import json
 import os
 from console_logger import logger
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
+from json_store import write_json_nowait
 
 BASE_DIR = os.path.dirname(__file__)
 CONFIG_FILE = os.path.join(BASE_DIR, 'cw.json')
@@ -23,8 +24,7 @@ class CWCog(commands.Cog):
             with open('cw.json', 'r', encoding='utf-8') as f:
                 self.config = json.load(f)
             try:
-                with open(self.config_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.config, f, indent=2, ensure_ascii=False)
+                write_json_nowait(self.config_file, self.config, pretty=True)
             except Exception:
                 pass
         else:
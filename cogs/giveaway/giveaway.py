@@ -8,6 +8,7 @@ from typing import Optional, List, Tuple
 from datetime import datetime, timedelta, timezone
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
 from console_logger import logger
+from json_store import load_json, save_json
 
 DATA_DIR = os.path.join('cogs', 'giveaway', 'data')
 BLACKLIST_PATH = os.path.join('cogs', 'giveaway', 'blacklist.json')
@@ -70,24 +71,17 @@ def _render_template(template: str, prize: str, duration_text: Optional[str], ex
     return result
 
 
-def _load_blacklist() -> dict:
-    if not os.path.exists(BLACKLIST_PATH):
-        return {}
-    try:
-        with open(BLACKLIST_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
+async def _load_blacklist() -> dict:
+    data = await load_json(BLACKLIST_PATH, {})
+    return data if isinstance(data, dict) else {}
 
 
-def _save_blacklist(data: dict):
-    os.makedirs(os.path.dirname(BLACKLIST_PATH), exist_ok=True)
-    with open(BLACKLIST_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+async def _save_blacklist(data: dict):
+    await save_json(BLACKLIST_PATH, data)
 
 
-def _eligible_entrants(guild_id: int, entrants: List[int]) -> List[int]:
-    bl = _load_blacklist()
+async def _eligible_entrants(guild_id: int, entrants: List[int]) -> List[int]:
+    bl = await _load_blacklist()
     blocked = set(bl.get(str(guild_id), []))
     return [uid for uid in entrants if uid not in blocked]
 
@@ -175,7 +169,7 @@ class GiveawayView(discord.ui.View):
     @discord.ui.button(label='🎉 Partecipa', style=discord.ButtonStyle.green, custom_id='gw_join')
     async def join_leave(self, interaction: discord.Interaction, button: discord.ui.Button):
         try:
-            data = self.cog.load_giveaway(self.message_id)
+            data = await self.cog.load_giveaway(self.message_id)
             if data is None:
                 await interaction.response.send_message('❌ Giveaway non trovato o non inizializzato.', ephemeral=True)
                 return
@@ -185,7 +179,7 @@ class GiveawayView(discord.ui.View):
                 return
 
             # Blacklist check
-            bl = _load_blacklist()
+            bl = await _load_blacklist()
             guild_key = str(interaction.guild_id)
             if str(interaction.user.id) in set(map(str, bl.get(guild_key, []))):
                 await interaction.response.send_message('🚫 Sei in blacklist e non puoi partecipare ai giveaway.', ephemeral=True)
@@ -205,7 +199,7 @@ class GiveawayView(discord.ui.View):
 
             data['entrants'] = entrants
             data['updated_at'] = _utcnow_iso()
-            self.cog.save_giveaway(self.message_id, data)
+            await self.cog.save_giveaway(self.message_id, data)
 
             # Update main message embed counter if possible
             try:
@@ -248,7 +242,7 @@ class GiveawayView(discord.ui.View):
 
     @discord.ui.button(label='👥 Mostra iscritti', style=discord.ButtonStyle.blurple, custom_id='gw_show')
     async def show_list(self, interaction: discord.Interaction, button: discord.ui.Button):
-        data = self.cog.load_giveaway(self.message_id)
+        data = await self.cog.load_giveaway(self.message_id)
         if data is None:
             await interaction.response.send_message('❌ Giveaway non trovato o non inizializzato.', ephemeral=True)
             return
@@ -305,20 +299,12 @@ class GiveawayCog(commands.Cog):
                 pass
         self._temp_files.clear()
 
-    def load_giveaway(self, message_id: int):
-        path = _file_path(message_id)
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception:
-            return None
+    async def load_giveaway(self, message_id: int):
+        # Cached by json_store, so a save is visible to the next load right away
+        return await load_json(_file_path(message_id), None)
 
-    def save_giveaway(self, message_id: int, data: dict):
-        path = _file_path(message_id)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    async def save_giveaway(self, message_id: int, data: dict):
+        await save_json(_file_path(message_id), data)
 
     def _build_embed(self, guild: Optional[discord.Guild], data: dict) -> discord.Embed:
         # Build embed from global config merged with per-giveaway overrides
@@ -445,7 +431,7 @@ class GiveawayCog(commands.Cog):
         view = GiveawayView(self, message_id=0)
         msg = await interaction.channel.send(embed=emb, view=view)
         base['message_id'] = msg.id
-        self.save_giveaway(msg.id, base)
+        await self.save_giveaway(msg.id, base)
 
         # Swap view to bind message id
         await msg.edit(view=GiveawayView(self, message_id=msg.id))
@@ -453,7 +439,7 @@ class GiveawayCog(commands.Cog):
         await interaction.followup.send(f'✅ Giveaway creato in {interaction.channel.mention} (ID: `{msg.id}`) — termina {_format_discord_time(expire_epoch)}', ephemeral=True)
 
     async def _end_giveaway(self, message_id: int) -> Tuple[List[int], Optional[discord.Message]]:
-        data = self.load_giveaway(message_id)
+        data = await self.load_giveaway(message_id)
         if not data or data.get('status') != 'active':
             return [], None
         guild = self.bot.get_guild(data['guild_id'])
@@ -467,13 +453,13 @@ class GiveawayCog(commands.Cog):
             msg = None
         # Determine winners
         entrants = data.get('entrants', [])
-        pool = _eligible_entrants(data['guild_id'], entrants)
+        pool = await _eligible_entrants(data['guild_id'], entrants)
         winners_count = min(len(pool), int(data.get('number_winners', 1)))
         winners = random.sample(pool, winners_count) if winners_count > 0 else []
         data['winners'] = list(dict.fromkeys(data.get('winners', []) + winners))  # append unique
         data['status'] = 'ended'
         data['updated_at'] = _utcnow_iso()
-        self.save_giveaway(message_id, data)
+        await self.save_giveaway(message_id, data)
 
         # Edit original message: mark as ended and remove buttons
         if msg:
@@ -521,7 +507,7 @@ class GiveawayCog(commands.Cog):
                     mid = int(os.path.splitext(fname)[0])
                 except ValueError:
                     continue
-                data = self.load_giveaway(mid)
+                data = await self.load_giveaway(mid)
                 if not data:
                     continue
                 if data.get('status', 'active') != 'active':
@@ -545,7 +531,7 @@ class GiveawayCog(commands.Cog):
         except ValueError:
             await interaction.response.send_message('❌ message_id non valido.', ephemeral=True)
             return
-        data = self.load_giveaway(mid)
+        data = await self.load_giveaway(mid)
         if not data:
             await interaction.response.send_message('❌ Giveaway non trovato.', ephemeral=True)
             return
@@ -562,7 +548,7 @@ class GiveawayCog(commands.Cog):
         except ValueError:
             await interaction.response.send_message('❌ message_id non valido.', ephemeral=True)
             return
-        data = self.load_giveaway(mid)
+        data = await self.load_giveaway(mid)
         if not data:
             await interaction.response.send_message('❌ Giveaway non trovato.', ephemeral=True)
             return
@@ -576,7 +562,7 @@ class GiveawayCog(commands.Cog):
             changed = True
         if changed:
             data['updated_at'] = _utcnow_iso()
-            self.save_giveaway(mid, data)
+            await self.save_giveaway(mid, data)
             await interaction.response.send_message(f'✅ Rimosso {user.mention} dal giveaway `{mid}`.', ephemeral=True)
         else:
             await interaction.response.send_message('ℹ️ Utente non presente tra gli iscritti/vincitori.', ephemeral=True)
@@ -587,24 +573,24 @@ class GiveawayCog(commands.Cog):
     @gwblacklist.command(name='add', description='Aggiungi un utente in blacklist')
     @owner_or_has_permissions(Administrator=True)
     async def gwblacklist_add(self, interaction: discord.Interaction, user: discord.Member):
-        bl = _load_blacklist()
+        bl = await _load_blacklist()
         key = str(interaction.guild_id)
         users = set(map(int, bl.get(key, [])))
         users.add(int(user.id))
         bl[key] = list(users)
-        _save_blacklist(bl)
+        await _save_blacklist(bl)
         await interaction.response.send_message(f'✅ {user.mention} aggiunto in blacklist per i giveaway.', ephemeral=True)
 
     @gwblacklist.command(name='remove', description='Rimuovi un utente dalla blacklist')
     @owner_or_has_permissions(Administrator=True)
     async def gwblacklist_remove(self, interaction: discord.Interaction, user: discord.Member):
-        bl = _load_blacklist()
+        bl = await _load_blacklist()
         key = str(interaction.guild_id)
         users = set(map(int, bl.get(key, [])))
         if int(user.id) in users:
             users.remove(int(user.id))
             bl[key] = list(users)
-            _save_blacklist(bl)
+            await _save_blacklist(bl)
             await interaction.response.send_message(f'✅ {user.mention} rimosso dalla blacklist.', ephemeral=True)
         else:
             await interaction.response.send_message('ℹ️ Utente non in blacklist.', ephemeral=True)
@@ -612,7 +598,7 @@ class GiveawayCog(commands.Cog):
     @gwblacklist.command(name='list', description='Mostra la blacklist corrente')
     @owner_or_has_permissions(Administrator=True)
     async def gwblacklist_list(self, interaction: discord.Interaction):
-        bl = _load_blacklist()
+        bl = await _load_blacklist()
         key = str(interaction.guild_id)
         ids = list(map(int, bl.get(key, [])))
         if not ids:
@@ -634,13 +620,13 @@ class GiveawayCog(commands.Cog):
         except ValueError:
             await interaction.response.send_message('❌ message_id non valido.', ephemeral=True)
             return
-        data = self.load_giveaway(mid)
+        data = await self.load_giveaway(mid)
         if not data:
             await interaction.response.send_message('❌ Giveaway non trovato.', ephemeral=True)
             return
         entrants = data.get('entrants', [])
         existing = set(data.get('winners', []))
-        pool = [uid for uid in _eligible_entrants(data['guild_id'], entrants) if uid not in existing]
+        pool = [uid for uid in await _eligible_entrants(data['guild_id'], entrants) if uid not in existing]
         if not pool:
             await interaction.response.send_message('ℹ️ Nessun altro partecipante idoneo da estrarre.', ephemeral=True)
             return
@@ -648,7 +634,7 @@ class GiveawayCog(commands.Cog):
         new_winners = random.sample(pool, k)
         data['winners'] = list(existing.union(new_winners))
         data['updated_at'] = _utcnow_iso()
-        self.save_giveaway(mid, data)
+        await self.save_giveaway(mid, data)
 
         # Announce
         guild = interaction.guild
@@ -688,7 +674,7 @@ class GiveawayCog(commands.Cog):
                     mid = int(os.path.splitext(fname)[0])
                 except ValueError:
                     continue
-                data = self.load_giveaway(mid) or {}
+                data = await self.load_giveaway(mid) or {}
                 status = data.get('status', 'active')
                 if status == 'active':
                     # Attach persistent view
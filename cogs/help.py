@@ -89,7 +89,8 @@ categories = {
         'commands': [
             '`/logs` - Visualizza file di log',
             '`/dellogs` - Elimina file di log',
-            '`/setlogchannel` - Imposta canali di log'
+            '`/setlogchannel` - Imposta canali di log',
+            '`/logqueue` - Stato delle code di log'
         ]
     },
     'reload': {
@@ -102,6 +103,7 @@ categories = {
             '`/reloadcw` - Ricarica config di CW',
             '`/reloadautorole` - Ricarica config di AutoRole',
             '`/reloadregole` - Ricarica config di regole',
+            '`/reloadlevels` - Ricarica config dei livelli',
             '`/reloadconfig` - Ricarica config generale',
             '`/reloadall` - Ricarica tutte le configurazioni'
         ]
@@ -0,0 +1,73 @@
+import math
+from bisect import bisect_right
+from typing import List, Tuple
+
+# Level curve: going from level l to l+1 costs 5*l^2 + 50*l + 100 XP.
+# Reaching level n therefore takes the cubic
+#   xp_for_level(n) = 5*(n-1)*n*(2n-1)/6 + 25*n*(n-1) + 100*n
+# Levels up to TABLE_LEVELS are looked up with bisect in a precomputed table
+# of those totals; beyond it the cubic is inverted in closed form.
+
+TABLE_LEVELS = 10_000
+
+
+def xp_to_next(level: int) -> int:
+    """XP needed to go from level to level + 1."""
+    return 5 * level * level + 50 * level + 100
+
+
+def xp_for_level(level: int) -> int:
+    """Total XP needed to reach level (0 for level 0)."""
+    n = max(0, int(level))
+    return (5 * (n - 1) * n * (2 * n - 1)) // 6 + 25 * n * (n - 1) + 100 * n
+
+
+_TABLE: List[int] = [xp_for_level(n) for n in range(TABLE_LEVELS + 1)]
+
+
+def _level_closed_form(xp: int) -> int:
+    # xp_for_level(n) = 5/3 n^3 + 45/2 n^2 + 455/6 n; a few Newton steps on
+    # the float cubic land within one level, the integer totals settle it
+    n = (xp * 0.6) ** (1.0 / 3.0)
+    for _ in range(3):
+        f = ((5 / 3 * n + 22.5) * n + 455 / 6) * n - xp
+        df = (5 * n + 45) * n + 455 / 6
+        n -= f / df
+    level = max(0, int(n))
+    while level > 0 and xp_for_level(level) > xp:
+        level -= 1
+    while xp_for_level(level + 1) <= xp:
+        level += 1
+    return level
+
+
+def level_of(xp: int) -> int:
+    xp = max(0, int(xp))
+    if xp < _TABLE[-1]:
+        return bisect_right(_TABLE, xp) - 1
+    return _level_closed_form(xp)
+
+
+def level_from_xp(total_xp: int) -> Tuple[int, int, int]:
+    """(level, XP into the current level, XP needed for the next one)."""
+    level = level_of(total_xp)
+    base = _TABLE[level] if level <= TABLE_LEVELS else xp_for_level(level)
+    return level, int(total_xp) - base, xp_to_next(level)
+
+
+def progress(total_xp: int) -> Tuple[int, int, int, float]:
+    """level_from_xp plus the fraction of the current level completed."""
+    level, cur, needed = level_from_xp(total_xp)
+    return level, cur, needed, cur / needed if needed else 1.0
+
+
+def level_from_xp_loop(total_xp: int) -> Tuple[int, int, int]:
+    # The original walk, kept as the reference for benchmarks.levels_curve
+    level = 0
+    xp = total_xp
+    while True:
+        needed = 5 * level * level + 50 * level + 100
+        if xp < needed:
+            return level, xp, needed
+        xp -= needed
+        level += 1
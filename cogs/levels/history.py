@@ -0,0 +1,162 @@
+import time
+import asyncio
+import calendar
+from typing import Dict, List, Optional, Tuple
+
+from json_store import load_shard, save_shard
+
+DAY = 86400
+
+
+def day_of(ts: float) -> int:
+    """Days since the epoch (UTC)."""
+    return int(ts // DAY)
+
+
+def month_of(day: int) -> str:
+    return time.strftime('%Y-%m', time.gmtime(day * DAY))
+
+
+def week_start(now: Optional[float] = None) -> int:
+    """First day (Monday, UTC) of the current week."""
+    day = day_of(time.time() if now is None else now)
+    return day - time.gmtime(day * DAY).tm_wday
+
+
+def month_start(now: Optional[float] = None) -> int:
+    t = time.gmtime(time.time() if now is None else now)
+    return day_of(calendar.timegm((t.tm_year, t.tm_mon, 1, 0, 0, 0)))
+
+
+class XPHistory:
+    """Per-guild XP earned per day, for weekly/monthly rankings and graphs.
+
+    Each guild document of data/levels_history keeps
+        {"daily": {"<day>": {"<uid>": [text, voice]}},
+         "monthly": {"YYYY-MM": {"<uid>": [text, voice]}}}
+    Daily buckets older than daily_days are folded into their month, months
+    older than monthly_months are dropped. record() is called as XP is
+    credited and keeps it under the day it was earned; flush() adds the
+    pending days to their buckets with one save_shard per guild. Windows
+    are sums of buckets, never raw events.
+    """
+
+    def __init__(self, data_path: str, daily_days: int = 62, monthly_months: int = 24):
+        self.data_path = data_path
+        self.daily_days = max(31, int(daily_days))
+        self.monthly_months = max(1, int(monthly_months))
+        # gid -> day -> uid -> [text, voice]
+        self._pending: Dict[str, Dict[int, Dict[str, List[int]]]] = {}
+        self._ranked: Dict[Tuple[str, str, int], List[Tuple[int, int]]] = {}
+        self._lock = asyncio.Lock()
+
+    def record(self, gid: str, uid: str, text: int, voice: int, now: Optional[float] = None):
+        """Count XP credited to uid, in the bucket of the day it was earned."""
+        if not text and not voice:
+            return
+        day = day_of(time.time() if now is None else now)
+        self._add(gid, day, uid, text, voice)
+
+    def _add(self, gid: str, day: int, uid: str, text: int, voice: int):
+        bucket = self._pending.setdefault(gid, {}).setdefault(day, {})
+        entry = bucket.get(uid)
+        if entry is None:
+            bucket[uid] = [text, voice]
+        else:
+            entry[0] += text
+            entry[1] += voice
+
+    async def flush(self, gid: Optional[str] = None):
+        async with self._lock:
+            gids = [gid] if gid is not None else list(self._pending)
+            for g in gids:
+                days = self._pending.pop(g, None)
+                if not days:
+                    continue
+                try:
+                    # Work on copies of what changes (days touched, months
+                    # rolled into) so the cached doc is only replaced once the
+                    # save went through
+                    doc = dict(await load_shard(self.data_path, g, {}))
+                    daily = doc['daily'] = dict(doc.get('daily', {}))
+                    changes = []
+                    for day, users in days.items():
+                        bucket = daily[str(day)] = dict(daily.get(str(day), {}))
+                        for uid, (text, voice) in users.items():
+                            entry = bucket.get(uid) or [0, 0]
+                            bucket[uid] = [entry[0] + text, entry[1] + voice]
+                            changes.append(('daily', str(day), uid))
+                    if self._roll_up(doc, max(days)):
+                        changes = None
+                    await save_shard(self.data_path, g, doc, changes=changes)
+                except Exception:
+                    # Keep the deltas for the next flush
+                    for day, users in days.items():
+                        for uid, (text, voice) in users.items():
+                            self._add(g, day, uid, text, voice)
+                    continue
+                self._forget(g)
+
+    def _roll_up(self, doc: dict, today: int) -> bool:
+        """Fold old days into months; doc['monthly'] and the months written
+        to are replaced by copies, never changed in place."""
+        daily = doc.get('daily', {})
+        monthly = doc['monthly'] = dict(doc.get('monthly', {}))
+        old = [d for d in daily if int(d) <= today - self.daily_days]
+        copied = set()
+        for d in old:
+            key = month_of(int(d))
+            if key not in copied:
+                monthly[key] = dict(monthly.get(key, {}))
+                copied.add(key)
+            month = monthly[key]
+            for uid, (text, voice) in daily.pop(d).items():
+                entry = month.get(uid) or [0, 0]
+                month[uid] = [entry[0] + text, entry[1] + voice]
+        months = sorted(monthly)
+        for m in months[:-self.monthly_months]:
+            del monthly[m]
+        return bool(old) or len(months) > self.monthly_months
+
+    def _forget(self, gid: str):
+        for key in [k for k in self._ranked if k[0] == gid]:
+            del self._ranked[key]
+
+    # Queries
+
+    async def totals(self, gid: str, since_day: int, mode: str = 'text') -> Dict[int, int]:
+        """uid -> XP earned from since_day (inclusive) to now."""
+        col = 0 if mode == 'text' else 1
+        doc = await load_shard(self.data_path, gid, {})
+        totals: Dict[int, int] = {}
+        buckets = [users for d, users in doc.get('daily', {}).items() if int(d) >= since_day]
+        oldest = min((int(d) for d in doc.get('daily', {})), default=None)
+        if oldest is None or since_day < oldest:
+            # Older than the daily buckets: whole months that start in the window
+            first = month_of(since_day)
+            buckets += [users for m, users in doc.get('monthly', {}).items()
+                        if m > first or (m == first and month_of(since_day - 1) != first)]
+        for users in buckets:
+            for uid, values in users.items():
+                if values[col]:
+                    totals[int(uid)] = totals.get(int(uid), 0) + values[col]
+        return totals
+
+    async def ranked(self, gid: str, since_day: int, mode: str = 'text') -> List[Tuple[int, int]]:
+        """(uid, xp) by xp desc for the window, cached until the next flush."""
+        key = (gid, mode, since_day)
+        ranked = self._ranked.get(key)
+        if ranked is None:
+            totals = await self.totals(gid, since_day, mode)
+            ranked = self._ranked[key] = sorted(totals.items(), key=lambda x: (-x[1], x[0]))
+        return ranked
+
+    async def series(self, gid: str, uid, days: int = 30, now: Optional[float] = None) -> List[Tuple[int, int, int]]:
+        """(day, text, voice) for each of the last `days` days, for graphs."""
+        today = day_of(time.time() if now is None else now)
+        daily = (await load_shard(self.data_path, gid, {})).get('daily', {})
+        out = []
+        for day in range(today - days + 1, today + 1):
+            text, voice = (daily.get(str(day)) or {}).get(str(uid)) or (0, 0)
+            out.append((day, text, voice))
+        return out
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from json_store import load_shard, save_shard
+
+
+class XPLedger:
+    """In-memory XP deltas per (guild, user), written to levels in batches.
+
+    Crediting XP is a dict update; flush() folds the pending deltas of a
+    guild into its levels shard with a single save_shard. Cooldowns are kept
+    here too, seeded from the stored last_msg_xp_at the first time a user is
+    seen. Call flush(gid) before reading a guild's totals.
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        # gid -> uid -> [text_xp, voice_xp, last_msg_xp_at]
+        self._pending: Dict[str, Dict[str, List[int]]] = {}
+        self._last_msg: Dict[Tuple[str, str], int] = {}
+        self._flush_lock = asyncio.Lock()
+        # cb(gid, doc, deltas) after a guild's deltas (uid -> [text, voice,
+        # last_msg_xp_at]) were folded into doc
+        self._listeners: List[Callable[[str, dict, Dict[str, List[int]]], None]] = []
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._pending.values())
+
+    def subscribe(self, cb: Callable[[str, dict, Dict[str, List[int]]], None]):
+        self._listeners.append(cb)
+
+    def _entry(self, gid: str, uid: str) -> List[int]:
+        users = self._pending.get(gid)
+        if users is None:
+            users = self._pending[gid] = {}
+        entry = users.get(uid)
+        if entry is None:
+            entry = users[uid] = [0, 0, 0]
+        return entry
+
+    async def last_message_at(self, gid: str, uid: str) -> int:
+        last = self._last_msg.get((gid, uid))
+        if last is None:
+            # First message since start (or since pruned): ask the cached shard
+            users = (await load_shard(self.data_path, gid, {})).get('users', {})
+            last = int((users.get(uid) or {}).get('last_msg_xp_at', 0) or 0)
+            self._last_msg[(gid, uid)] = last
+        return last
+
+    def add_text(self, gid: str, uid: str, amount: int, now: int):
+        entry = self._entry(gid, uid)
+        entry[0] += int(amount)
+        entry[2] = now
+        self._last_msg[(gid, uid)] = now
+
+    def add_voice(self, gid: str, uid: str, amount: int):
+        self._entry(gid, uid)[1] += int(amount)
+
+    def pending(self, gid: str, uid: str) -> Tuple[int, int]:
+        entry = self._pending.get(gid, {}).get(uid)
+        return (entry[0], entry[1]) if entry else (0, 0)
+
+    def prune_cooldowns(self, now: int, cooldown: int):
+        """Forget cooldowns that have expired; they are re-read on demand."""
+        expired = [key for key, last in self._last_msg.items() if now - last >= cooldown]
+        for key in expired:
+            del self._last_msg[key]
+
+    async def flush(self, gid: Optional[str] = None):
+        async with self._flush_lock:
+            gids = [gid] if gid is not None else list(self._pending)
+            for g in gids:
+                deltas = self._pending.pop(g, None)
+                if not deltas:
+                    continue
+                users = None
+                previous: Dict[str, Optional[dict]] = {}
+                try:
+                    doc = await load_shard(self.data_path, g, {})
+                    users = doc.get('users', {})
+                    for uid, (text, voice, last) in deltas.items():
+                        previous[uid] = users.get(uid)
+                        u = dict(users.get(uid) or {"text_xp": 0, "voice_xp": 0, "last_msg_xp_at": 0})
+                        u['text_xp'] = int(u.get('text_xp', 0)) + text
+                        u['voice_xp'] = int(u.get('voice_xp', 0)) + voice
+                        if last:
+                            u['last_msg_xp_at'] = max(int(u.get('last_msg_xp_at', 0) or 0), last)
+                        users[uid] = u
+                    doc['users'] = users
+                    await save_shard(self.data_path, g, doc, changes=[('users', uid) for uid in deltas])
+                except Exception:
+                    # Undo what was applied to the cached doc so the deltas
+                    # are counted once, on the next flush
+                    if users is not None:
+                        for uid, old in previous.items():
+                            if old is None:
+                                users.pop(uid, None)
+                            else:
+                                users[uid] = old
+                    self._merge_back(g, deltas)
+                    continue
+                for cb in self._listeners:
+                    try:
+                        cb(g, doc, deltas)
+                    except Exception:
+                        pass
+
+    def _merge_back(self, gid: str, deltas: Dict[str, List[int]]):
+        for uid, (text, voice, last) in deltas.items():
+            entry = self._entry(gid, uid)
+            entry[0] += text
+            entry[1] += voice
+            entry[2] = max(entry[2], last)
@@ -6,15 +6,27 @@ import os
 import random
 import time
 import io
-from typing import Optional, Tuple
-import io
-from PIL import Image, ImageDraw, ImageFont
+import asyncio
+from typing import Optional
 
+from console_logger import logger
 from bot_utils import owner_or_has_permissions
-from json_store import load_json, save_json
+from json_store import load_shard, save_shard
+from cogs.levels.columns import XPColumns
+from cogs.levels.curve import level_from_xp, level_of
+from cogs.levels.history import XPHistory, month_start, week_start
+from cogs.levels.ledger import XPLedger
+from cogs.levels.members import MemberResolver
+from cogs.levels.rankcard import RankCardRenderer
+from cogs.levels.ranking import Leaderboards
+from cogs.levels.rolesync import RoleSyncQueue
+from cogs.levels.rules import compile_rewards, compile_rules
+from cogs.levels.voice import VoiceTracker
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')), 'data', 'levels.json')
+NAMES_PATH = os.path.join(os.path.dirname(DATA_PATH), 'member_names.json')
+HISTORY_PATH = os.path.join(os.path.dirname(DATA_PATH), 'levels_history.json')
 
 
 def load_config():
@@ -24,56 +36,92 @@ def load_config():
     except Exception:
         return {
             "enabled": True,
-            "text_xp": {"min": 5, "max": 15, "cooldown_seconds": 60, "excluded_channel_ids": [], "excluded_role_ids": [], "multiplier_roles": {}},
-            "voice_xp": {"enabled": True, "per_min_min": 2, "per_min_max": 5, "exclude_muted": True, "exclude_deaf": True, "exclude_afk_channel_ids": [], "excluded_role_ids": [], "multiplier_roles": {}},
-            "leaderboard": {"page_size": 10},
+            "flush_seconds": 30,
+            "text_xp": {"min": 5, "max": 15, "cooldown_seconds": 60, "excluded_channel_ids": [], "excluded_role_ids": [], "multiplier_roles": {}, "multiplier_channels": {}, "boosts": []},
+            "voice_xp": {"enabled": True, "checkpoint_minutes": 5, "per_min_min": 2, "per_min_max": 5, "exclude_muted": True, "exclude_deaf": True, "exclude_afk_channel_ids": [], "excluded_role_ids": [], "multiplier_roles": {}, "multiplier_channels": {}, "boosts": []},
+            "leaderboard": {"page_size": 10, "image": True, "fetch_concurrency": 5},
+            "history": {"daily_days": 62, "monthly_months": 24},
+            "level_up": {"announce": True, "channel_id": None, "message": "🎉 {mention} ha raggiunto il livello **{level}** ({mode})!"},
+            "rewards": {"stack": True, "sync_interval_seconds": 1.0, "text": {}, "voice": {}},
             "rank_card": {"width": 934, "height": 282, "background": "assets/rankcard/rank_black.png", "bar_color": "#14ff72", "bar_bg": "#1f1f1f", "text_color": "#ffffff", "font_path": "assets/rankcard/Roboto-Bold.ttf"}
         }
 
 
-def user_has_excluded_role(member: discord.Member, role_ids):
-    return any(str(r.id) in set(map(str, role_ids)) for r in member.roles)
-
-
-def get_multiplier(member: discord.Member, mapping: dict) -> float:
-    mult = 1.0
-    for rid, factor in mapping.items():
-        try:
-            if any(str(r.id) == str(rid) for r in member.roles):
-                mult = max(mult, float(factor))
-        except Exception:
-            continue
-    return mult
-
-
-def level_from_xp(total_xp: int) -> Tuple[int, int, int]:
-    # Simple curve: next = 5*lvl^2 + 50*lvl + 100
-    level = 0
-    xp = total_xp
-    while True:
-        needed = 5 * level * level + 50 * level + 100
-        if xp < needed:
-            return level, xp, needed
-        xp -= needed
-        level += 1
+def role_ids(member) -> list:
+    return [r.id for r in getattr(member, 'roles', [])]
 
 
 class LevelsCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.config = load_config()
+        self._compile_rules()
+        self.ledger = XPLedger(DATA_PATH)
+        self.leaderboards = Leaderboards(DATA_PATH)
+        self.ledger.subscribe(self.leaderboards.update_users)
+        hcfg = self.config.get('history', {})
+        self.history = XPHistory(HISTORY_PATH, hcfg.get('daily_days', 62), hcfg.get('monthly_months', 24))
+        self.role_sync = RoleSyncQueue(bot, self.config.get('rewards', {}).get('sync_interval_seconds', 1.0))
+        self.ledger.subscribe(self._on_flushed)
+        # Last channel each user earned text XP in, for level-up messages
+        self._last_channel = {}
+        self._tasks = set()
+        self.voice = VoiceTracker()
+        self.renderer = RankCardRenderer(self.config.get('rank_card', {}))
+        self.members = MemberResolver(NAMES_PATH, self.config.get('leaderboard', {}).get('fetch_concurrency', 5))
+        self.flush_loop.change_interval(seconds=max(1, int(self.config.get('flush_seconds', 30))))
+        self.flush_loop.start()
+        self.voice_loop.change_interval(minutes=max(1, int(self.config.get('voice_xp', {}).get('checkpoint_minutes', 5))))
         self.voice_loop.start()
 
-    def cog_unload(self):
+    async def cog_unload(self):
+        for loop in (self.voice_loop, self.flush_loop):
+            try:
+                loop.cancel()
+            except Exception:
+                pass
+        now = time.time()
+        for key in self.voice:
+            self._credit_voice(key, self.voice.stop(key, now))
+        # Runs before json_store.close() on shutdown, so nothing pending is lost
+        await self.ledger.flush()
+        await self.history.flush()
+        self.renderer.close()
+        self.role_sync.close()
+
+    def _compile_rules(self):
+        self.text_rules = compile_rules(self.config.get('text_xp', {}))
+        self.voice_rules = compile_rules(self.config.get('voice_xp', {}), voice=True)
+        self.rewards = compile_rewards(self.config.get('rewards', {}))
+
+    def reload_config(self):
+        self.config = load_config()
+        self._compile_rules()
+        self.flush_loop.change_interval(seconds=max(1, int(self.config.get('flush_seconds', 30))))
+        self.voice_loop.change_interval(minutes=max(1, int(self.config.get('voice_xp', {}).get('checkpoint_minutes', 5))))
+        self.renderer.reload(self.config.get('rank_card', {}))
+        self.members.concurrency = max(1, int(self.config.get('leaderboard', {}).get('fetch_concurrency', 5)))
+        self.role_sync.interval = max(0.0, float(self.config.get('rewards', {}).get('sync_interval_seconds', 1.0)))
+
+    @tasks.loop(seconds=30)
+    async def flush_loop(self):
         try:
-            self.voice_loop.cancel()
+            await self.ledger.flush()
+            await self.history.flush()
+            cooldown = int(self.config.get('text_xp', {}).get('cooldown_seconds', 60))
+            self.ledger.prune_cooldowns(int(time.time()), cooldown)
         except Exception:
             pass
 
     @commands.Cog.listener()
     async def on_ready(self):
-        # No DB init needed with JSON storage
-        pass
+        # Members already in voice when the bot (re)connects
+        now = time.time()
+        for guild in self.bot.guilds:
+            for vc in guild.voice_channels:
+                for m in vc.members:
+                    if self._voice_eligible(m, m.voice):
+                        self.voice.start((guild.id, m.id), now)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -81,70 +129,131 @@ class LevelsCog(commands.Cog):
             return
         if not self.config.get('enabled', True):
             return
-        text_cfg = self.config.get('text_xp', {})
-        if str(message.channel.id) in set(map(str, text_cfg.get('excluded_channel_ids', []))):
-            return
-        if isinstance(message.author, discord.Member) and user_has_excluded_role(message.author, text_cfg.get('excluded_role_ids', [])):
+        rules = self.text_rules
+        roles = role_ids(message.author)
+        if rules.excluded(roles, message.channel.id):
             return
 
         now = int(time.time())
-        cooldown = int(text_cfg.get('cooldown_seconds', 60))
-        data = await load_json(DATA_PATH, {})
+        cooldown = rules.cooldown
         gid = str(message.guild.id)
         uid = str(message.author.id)
-        g = data.get(gid, {})
-        users = g.get('users', {})
-        u = users.get(uid, {"text_xp": 0, "voice_xp": 0, "last_msg_xp_at": 0})
-        last = int(u.get('last_msg_xp_at', 0) or 0)
+        last = await self.ledger.last_message_at(gid, uid)
         if last and now - last < cooldown:
             return
 
-        amount = random.randint(int(text_cfg.get('min', 5)), int(text_cfg.get('max', 15)))
-        mult = get_multiplier(message.author, text_cfg.get('multiplier_roles', {}))
-        amount = int(amount * mult)
+        amount = int(random.randint(*rules.amount) * rules.multiplier(roles, message.channel.id, now))
+        self.ledger.add_text(gid, uid, amount, now)
+        self.history.record(gid, uid, amount, 0, now)
+        self._last_channel[(gid, uid)] = message.channel.id
 
-        u['text_xp'] = int(u.get('text_xp', 0)) + amount
-        u['last_msg_xp_at'] = now
-        users[uid] = u
-        g['users'] = users
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+    # Level ups
+
+    def _sync_rewards(self, gid: str, uid: str, u: dict):
+        if not self.rewards.roles:
+            return
+        wanted = self.rewards.roles_for(level_of(u.get('text_xp', 0)), level_of(u.get('voice_xp', 0)))
+        self.role_sync.request(int(gid), int(uid), add=wanted, remove=self.rewards.roles - wanted)
+
+    def _on_flushed(self, gid: str, doc: dict, deltas: dict):
+        # Ledger listener: only users whose level moved need any work
+        users = doc.get('users', {})
+        for uid, (text, voice, _) in deltas.items():
+            u = users.get(uid)
+            if u is None:
+                continue
+            text_xp, voice_xp = int(u.get('text_xp', 0)), int(u.get('voice_xp', 0))
+            ups = []
+            for mode, xp, delta in (('text', text_xp, text), ('voice', voice_xp, voice)):
+                if delta and level_of(xp) != level_of(xp - delta):
+                    ups.append((mode, level_of(xp), level_of(xp) > level_of(xp - delta)))
+            if not ups:
+                continue
+            self._sync_rewards(gid, uid, u)
+            for mode, level, up in ups:
+                if up:
+                    self._spawn(self._announce(gid, uid, mode, level))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _announce(self, gid: str, uid: str, mode: str, level: int):
+        cfg = self.config.get('level_up', {})
+        if not cfg.get('announce', True):
+            return
+        guild = self.bot.get_guild(int(gid))
+        if guild is None:
+            return
+        channel_id = cfg.get('channel_id') or self._last_channel.get((gid, uid))
+        channel = guild.get_channel(int(channel_id)) if channel_id else None
+        if channel is None:
+            return
+        text = cfg.get('message', '🎉 {mention} ha raggiunto il livello **{level}** ({mode})!')
+        try:
+            await channel.send(text.format(mention=f'<@{uid}>', level=level, mode='testo' if mode == 'text' else 'voce'))
+        except Exception:
+            pass
+
+    def _voice_eligible(self, member: discord.Member, state: Optional[discord.VoiceState]) -> bool:
+        rules = self.voice_rules
+        if not self.config.get('enabled', True) or not rules.enabled:
+            return False
+        if member.bot or state is None or state.channel is None:
+            return False
+        channel = state.channel
+        if member.guild.afk_channel and channel.id == member.guild.afk_channel.id:
+            return False
+        if rules.exclude_muted and (state.self_mute or state.mute):
+            return False
+        if rules.exclude_deaf and (state.self_deaf or state.deaf):
+            return False
+        return not rules.excluded(role_ids(member), channel.id)
+
+    def _credit_voice(self, key, minutes: int, channel=None):
+        if minutes <= 0:
+            return
+        guild = self.bot.get_guild(key[0])
+        member = guild.get_member(key[1]) if guild else None
+        if member is None:
+            return
+        rules = self.voice_rules
+        # Same per-minute roll as before, just added up for the whole interval
+        total = sum(random.randint(*rules.amount) for _ in range(minutes))
+        if channel is None and member.voice:
+            channel = member.voice.channel
+        amount = int(total * rules.multiplier(role_ids(member), channel.id if channel else None))
+        self.ledger.add_voice(str(key[0]), str(key[1]), amount)
+        self.history.record(str(key[0]), str(key[1]), 0, amount)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        key = (member.guild.id, member.id)
+        now = time.time()
+        eligible = self._voice_eligible(member, after)
+        moved = getattr(before.channel, 'id', None) != getattr(after.channel, 'id', None)
+        # Camera, stream, suppress... change nothing for XP: keep the session
+        if key in self.voice and eligible and not moved:
+            return
+        # Close the interval under the old state, then reopen if still eligible
+        self._credit_voice(key, self.voice.stop(key, now), before.channel)
+        if eligible:
+            self.voice.start(key, now)
 
-    @tasks.loop(minutes=1)
+    @tasks.loop(minutes=5)
     async def voice_loop(self):
-        await self.bot.wait_until_ready()
-        # Simple per-minute scan across voice channels for connected members
+        # Checkpoint: credit open sessions so long calls show up before they end
         try:
-            if not self.config.get('voice_xp', {}).get('enabled', True):
-                return
-            vcfg = self.config.get('voice_xp', {})
-            per_min = random.randint(int(vcfg.get('per_min_min', 2)), int(vcfg.get('per_min_max', 5)))
-            for guild in self.bot.guilds:
-                for vc in guild.voice_channels:
-                    if str(vc.id) in set(map(str, vcfg.get('exclude_afk_channel_ids', []))):
-                        continue
-                    members = [m for m in vc.members if not m.bot]
-                    for m in members:
-                        if isinstance(m, discord.Member):
-                            if vcfg.get('exclude_muted', True) and (m.voice.self_mute or m.voice.mute):
-                                continue
-                            if vcfg.get('exclude_deaf', True) and (m.voice.self_deaf or m.voice.deaf):
-                                continue
-                            if user_has_excluded_role(m, vcfg.get('excluded_role_ids', [])):
-                                continue
-                            mult = get_multiplier(m, vcfg.get('multiplier_roles', {}))
-                            amount = int(per_min * mult)
-                            data = await load_json(DATA_PATH, {})
-                            gid = str(guild.id)
-                            uid = str(m.id)
-                            g = data.get(gid, {})
-                            users = g.get('users', {})
-                            u = users.get(uid, {"text_xp": 0, "voice_xp": 0, "last_msg_xp_at": 0})
-                            u['voice_xp'] = int(u.get('voice_xp', 0)) + amount
-                            users[uid] = u
-                            g['users'] = users
-                            data[gid] = g
-                            await save_json(DATA_PATH, data)
+            now = time.time()
+            for key in self.voice:
+                guild = self.bot.get_guild(key[0])
+                member = guild.get_member(key[1]) if guild else None
+                if member is None or not self._voice_eligible(member, member.voice):
+                    # Missed event (e.g. a disconnect during a gateway resume)
+                    self._credit_voice(key, self.voice.stop(key, now))
+                else:
+                    self._credit_voice(key, self.voice.settle(key, now))
         except Exception:
             pass
 
@@ -153,74 +262,17 @@ class LevelsCog(commands.Cog):
         await self.bot.wait_until_ready()
 
     async def generate_rank_card(self, member: discord.Member, mode: str = 'text') -> Optional[discord.File]:
-        cfg = self.config.get('rank_card', {})
-        width = int(cfg.get('width', 934))
-        height = int(cfg.get('height', 282))
-        bg_path = cfg.get('background')
-        bar_color = cfg.get('bar_color', '#14ff72')
-        bar_bg = cfg.get('bar_bg', '#1f1f1f')
-        text_color = cfg.get('text_color', '#ffffff')
-        font_path = cfg.get('font_path')
         try:
-            bg = Image.open(bg_path).convert('RGBA') if bg_path and os.path.exists(bg_path) else Image.new('RGBA', (width, height), (0, 0, 0, 255))
-            if bg.size != (width, height):
-                bg = bg.resize((width, height))
-            draw = ImageDraw.Draw(bg)
-            try:
-                font_large = ImageFont.truetype(font_path, 42) if font_path and os.path.exists(font_path) else ImageFont.load_default()
-                font_small = ImageFont.truetype(font_path, 24) if font_path and os.path.exists(font_path) else ImageFont.load_default()
-            except Exception:
-                font_large = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-
-            # Fetch XP from JSON
-            data = await load_json(DATA_PATH, {})
             gid = str(member.guild.id)
             uid = str(member.id)
-            users = data.get(gid, {}).get('users', {})
+            await self.ledger.flush(gid)
+            users = (await load_shard(DATA_PATH, gid, {})).get('users', {})
             u = users.get(uid, {"text_xp": 0, "voice_xp": 0})
-            text_xp = int(u.get('text_xp', 0))
-            voice_xp = int(u.get('voice_xp', 0))
-            xp = text_xp if mode == 'text' else voice_xp
+            xp = int(u.get('text_xp', 0)) if mode == 'text' else int(u.get('voice_xp', 0))
             level, cur_xp, needed = level_from_xp(xp)
-
-            # Avatar circle
-            try:
-                avatar_asset = member.display_avatar.replace(size=256)
-                avatar_bytes = await avatar_asset.read()
-                avatar = Image.open(io.BytesIO(avatar_bytes)).convert('RGBA')
-            except Exception:
-                avatar = Image.new('RGBA', (256, 256), (40, 40, 40, 255))
-            avatar = avatar.resize((220, 220))
-            mask = Image.new('L', (220, 220), 0)
-            mask_draw = ImageDraw.Draw(mask)
-            mask_draw.ellipse((0, 0, 220, 220), fill=255)
-            bg.paste(avatar, (30, 31), mask)
-
-            # Text right side
-            username = f"{member.display_name}"
-            draw.text((270, 40), username, font=font_large, fill=text_color)
-            mode_text = 'Text' if mode == 'text' else 'Voice'
-            draw.text((270, 95), f"Livello {level} • {mode_text}", font=font_small, fill=text_color)
-
-            # Progress bar
-            bar_x, bar_y, bar_w, bar_h = 270, 150, 620, 30
-            draw.rounded_rectangle([bar_x, bar_y, bar_x + bar_w, bar_y + bar_h], radius=15, fill=bar_bg)
-            if needed > 0:
-                progress = max(0.0, min(1.0, cur_xp / needed))
-            else:
-                progress = 1.0
-            fill_w = int(bar_w * progress)
-            if fill_w > 0:
-                draw.rounded_rectangle([bar_x, bar_y, bar_x + fill_w, bar_y + bar_h], radius=15, fill=bar_color)
-            draw.text((270, 190), f"XP: {xp} • Mancano {needed - cur_xp} XP", font=font_small, fill=text_color)
-
-            # Save to bytes
-            import io
-            buf = io.BytesIO()
-            bg.save(buf, format='PNG')
-            buf.seek(0)
-            return discord.File(buf, filename='rank.png')
+            rank = (await self.leaderboards.get(gid, mode)).rank_of(uid)
+            png = await self.renderer.render(member, mode, xp, level, cur_xp, needed, rank)
+            return discord.File(io.BytesIO(png), filename='rank.png')
         except Exception:
             return None
 
@@ -238,31 +290,45 @@ class LevelsCog(commands.Cog):
         await interaction.response.send_message(file=file, ephemeral=False)
 
     @app_commands.command(name='leaderboard', description='Mostra la classifica XP')
-    @app_commands.describe(mode='text o voice', page='Pagina (da 1)')
-    async def slash_leaderboard(self, interaction: discord.Interaction, mode: Optional[str] = 'text', page: Optional[int] = 1):
+    @app_commands.describe(mode='text o voice', page='Pagina (da 1)', period='all, week (settimana) o month (mese)')
+    async def slash_leaderboard(self, interaction: discord.Interaction, mode: Optional[str] = 'text', page: Optional[int] = 1, period: Optional[str] = 'all'):
         await interaction.response.defer()
-        mode = (mode or 'text').lower()
+        mode = 'voice' if (mode or 'text').lower() == 'voice' else 'text'
+        period = (period or 'all').lower()
         page = max(1, int(page or 1))
         page_size = int(self.config.get('leaderboard', {}).get('page_size', 10))
         offset = (page - 1) * page_size
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
-        users = data.get(gid, {}).get('users', {})
-        items = []
-        for uid, u in users.items():
-            xp = int(u.get('text_xp', 0)) if mode == 'text' else int(u.get('voice_xp', 0))
-            items.append((int(uid), xp))
-        items.sort(key=lambda x: x[1], reverse=True)
-        slice_items = items[offset:offset + page_size]
+        await self.ledger.flush(gid)
+        index = await self.leaderboards.get(gid, mode)
+        title = f"Classifica {mode.capitalize()}"
+        if period in ('week', 'month'):
+            await self.history.flush(gid)
+            since = week_start() if period == 'week' else month_start()
+            slice_items = (await self.history.ranked(gid, since, mode))[offset:offset + page_size]
+            title += ' • Settimana' if period == 'week' else ' • Mese'
+        else:
+            slice_items = index.top(page_size, offset)
         if not slice_items:
             await interaction.followup.send('Nessun dato in classifica.')
             return
+        resolved = await self.members.resolve(interaction.guild, [uid for uid, _ in slice_items])
         desc = []
-        rank_start = offset + 1
-        for i, (uid, xp) in enumerate(slice_items, start=rank_start):
-            user = interaction.guild.get_member(uid) or await interaction.guild.fetch_member(uid)
-            desc.append(f"**#{i}** {user.mention if user else uid} — {xp} XP")
-        embed = discord.Embed(title=f"Classifica {mode.capitalize()}", description='\n'.join(desc), color=0x14ff72)
+        rows = []
+        for i, (uid, xp) in enumerate(slice_items, start=offset + 1):
+            member, name = resolved[uid]
+            desc.append(f"**#{i}** {member.mention if member else name} — {xp} XP")
+            # Level is always the lifetime one, also on weekly/monthly pages
+            rows.append((i, member, name, xp, level_from_xp(index.xp_of(uid))[0]))
+        embed = discord.Embed(title=title, description='\n'.join(desc), color=0x14ff72)
+        if self.config.get('leaderboard', {}).get('image', True):
+            try:
+                png = await self.renderer.render_leaderboard(f"{title} • Pagina {page}", rows)
+                embed.set_image(url='attachment://leaderboard.png')
+                await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(png), filename='leaderboard.png'))
+                return
+            except Exception:
+                pass
         await interaction.followup.send(embed=embed)
 
     @app_commands.command(name='givexp', description='Dai XP a un utente (solo admin)')
@@ -270,17 +336,18 @@ class LevelsCog(commands.Cog):
     @app_commands.describe(user='Utente', amount='Quantità', mode='text o voice')
     async def slash_givexp(self, interaction: discord.Interaction, user: discord.Member, amount: int, mode: Optional[str] = 'text'):
         col = 'text_xp' if (mode or 'text').lower() == 'text' else 'voice_xp'
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = str(user.id)
-        g = data.get(gid, {})
+        await self.ledger.flush(gid)
+        g = await load_shard(DATA_PATH, gid, {})
         users = g.get('users', {})
         u = users.get(uid, {"text_xp": 0, "voice_xp": 0, "last_msg_xp_at": 0})
         u[col] = int(u.get(col, 0)) + int(amount)
         users[uid] = u
         g['users'] = users
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('users', uid)])
+        self.leaderboards.update_users(gid, g, [uid])
+        self._sync_rewards(gid, uid, u)
         await interaction.response.send_message(f'Aggiunti {amount} XP {"testo" if col=="text_xp" else "voice"} a {user.mention}.', ephemeral=True)
 
     @app_commands.command(name='setxp', description='Setta gli XP di un utente (solo admin)')
@@ -288,19 +355,49 @@ class LevelsCog(commands.Cog):
     @app_commands.describe(user='Utente', amount='Quantità', mode='text o voice')
     async def slash_setxp(self, interaction: discord.Interaction, user: discord.Member, amount: int, mode: Optional[str] = 'text'):
         col = 'text_xp' if (mode or 'text').lower() == 'text' else 'voice_xp'
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = str(user.id)
-        g = data.get(gid, {})
+        await self.ledger.flush(gid)
+        g = await load_shard(DATA_PATH, gid, {})
         users = g.get('users', {})
         u = users.get(uid, {"text_xp": 0, "voice_xp": 0, "last_msg_xp_at": 0})
         u[col] = int(amount)
         users[uid] = u
         g['users'] = users
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('users', uid)])
+        self.leaderboards.update_users(gid, g, [uid])
+        self._sync_rewards(gid, uid, u)
         await interaction.response.send_message(f'Settati {amount} XP {"testo" if col=="text_xp" else "voice"} per {user.mention}.', ephemeral=True)
 
+    @app_commands.command(name='reloadlevels', description='Ricarica la configurazione dei livelli (solo admin)')
+    @owner_or_has_permissions(administrator=True)
+    async def slash_reloadlevels(self, interaction: discord.Interaction):
+        try:
+            self.reload_config()
+            await interaction.response.send_message('✅ Configurazione livelli ricaricata con successo!', ephemeral=True)
+            logger.info(f'Configurazione livelli ricaricata da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}')
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Errore nel ricaricare la configurazione livelli: {e}", ephemeral=True)
+            logger.error(f"Errore reloadlevels da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}: {e}")
+
+    @app_commands.command(name='resetxp', description='Azzera gli XP di tutto il server (nuova stagione, solo admin)')
+    @owner_or_has_permissions(administrator=True)
+    @app_commands.describe(mode='text, voice o all')
+    async def slash_resetxp(self, interaction: discord.Interaction, mode: Optional[str] = 'all'):
+        mode = (mode or 'all').lower()
+        fields = {'text': ('text_xp',), 'voice': ('voice_xp',)}.get(mode, ('text_xp', 'voice_xp'))
+        gid = str(interaction.guild.id)
+        await self.ledger.flush(gid)
+        g = await load_shard(DATA_PATH, gid, {})
+        cols = XPColumns.from_users(g.get('users', {}))
+        cols.reset(fields)
+        g['users'] = cols.to_users()
+        await save_shard(DATA_PATH, gid, g)
+        self.leaderboards.forget(gid)
+        for uid, u in g['users'].items():
+            self._sync_rewards(gid, uid, u)
+        await interaction.response.send_message(f'XP azzerati per {len(cols)} utenti ({", ".join(fields)}).', ephemeral=True)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(LevelsCog(bot))
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Dict, Iterable, Optional, Tuple
+
+import discord
+
+from json_store import load_shard, save_shard
+
+
+class MemberResolver:
+    """Resolves leaderboard user ids to (member or None, display name).
+
+    Cached members come straight from the guild; the missing ones are
+    fetched concurrently, at most `concurrency` at a time, so a page costs
+    about one API round trip instead of one per row. Names are remembered
+    per guild in data/member_names so users who left (or can't be fetched)
+    still show a name instead of an id.
+    """
+
+    def __init__(self, names_path: str, concurrency: int = 5):
+        self.names_path = names_path
+        self.concurrency = max(1, int(concurrency))
+
+    async def _fetch(self, guild: discord.Guild, uid: int, sem: asyncio.Semaphore) -> Optional[discord.Member]:
+        async with sem:
+            try:
+                return await guild.fetch_member(uid)
+            except Exception:
+                return None
+
+    async def resolve(self, guild: discord.Guild, uids: Iterable[int]) -> Dict[int, Tuple[Optional[discord.Member], str]]:
+        uids = [int(u) for u in uids]
+        members: Dict[int, Optional[discord.Member]] = {uid: guild.get_member(uid) for uid in uids}
+        missing = [uid for uid, m in members.items() if m is None]
+        if missing:
+            sem = asyncio.Semaphore(self.concurrency)
+            fetched = await asyncio.gather(*(self._fetch(guild, uid, sem) for uid in missing))
+            members.update(zip(missing, fetched))
+
+        gid = str(guild.id)
+        doc = await load_shard(self.names_path, gid, {})
+        names = doc.setdefault('names', {})
+        changed = []
+        result = {}
+        for uid in uids:
+            member = members.get(uid)
+            if member is not None:
+                name = member.display_name
+                if names.get(str(uid)) != name:
+                    names[str(uid)] = name
+                    changed.append(('names', str(uid)))
+            else:
+                name = names.get(str(uid)) or str(uid)
+            result[uid] = (member, name)
+        if changed:
+            await save_shard(self.names_path, gid, doc, changes=changed)
+        return result
@@ -0,0 +1,229 @@
+import io
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+AVATAR_SIZE = 220
+AVATAR_POS = (30, 31)
+# Leaderboard page layout
+LB_HEADER = 70
+LB_ROW = 80
+LB_AVATAR = 64
+
+
+class LRU:
+    """Tiny LRU mapping on an OrderedDict."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class RankCardRenderer:
+    """Draws rank cards from assets loaded once per (re)load.
+
+    Background, circular mask and placeholder avatar are prepared in
+    reload(); fonts are opened once per worker thread (FreeType faces are not
+    shared between threads). The Pillow work runs on a small dedicated
+    thread pool so the event loop only awaits the PNG bytes. Avatars are
+    kept decoded and resized in an LRU keyed by avatar hash, finished cards
+    in a smaller LRU keyed by everything drawn on them, and identical renders
+    already in flight are awaited instead of started again.
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = 0
+        self._local = threading.local()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.reload(cfg)
+
+    def reload(self, cfg: Dict[str, Any]):
+        self.cfg = dict(cfg or {})
+        self.width = int(self.cfg.get('width', 934))
+        self.height = int(self.cfg.get('height', 282))
+        self.bar_color = self.cfg.get('bar_color', '#14ff72')
+        self.bar_bg = self.cfg.get('bar_bg', '#1f1f1f')
+        self.text_color = self.cfg.get('text_color', '#ffffff')
+        self.font_path = self.cfg.get('font_path')
+        # Part of the output cache key: a reload with another theme misses
+        self.theme = hash(json.dumps(self.cfg, sort_keys=True, default=str))
+        self.background = self._load_background(self.cfg.get('background'))
+        self.mask = Image.new('L', (AVATAR_SIZE, AVATAR_SIZE), 0)
+        ImageDraw.Draw(self.mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+        self.placeholder = Image.new('RGBA', (AVATAR_SIZE, AVATAR_SIZE), (40, 40, 40, 255))
+        self.small_mask = self.mask.resize((LB_AVATAR, LB_AVATAR))
+        # Leaderboard backgrounds by page height, built on first use
+        self._lb_backgrounds: Dict[int, Image.Image] = {}
+        self.avatars = LRU(self.cfg.get('avatar_cache_size', 256))
+        self.outputs = LRU(self.cfg.get('output_cache_size', 64))
+        self._fonts_generation = getattr(self, '_fonts_generation', 0) + 1
+        workers = max(1, int(self.cfg.get('render_workers', 2)))
+        if self._executor is None or self._workers != workers:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rankcard')
+            self._workers = workers
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _load_background(self, path: Optional[str]) -> Image.Image:
+        try:
+            if path and os.path.exists(path):
+                bg = Image.open(path).convert('RGBA')
+                if bg.size != (self.width, self.height):
+                    bg = bg.resize((self.width, self.height))
+                return bg
+        except Exception:
+            pass
+        return Image.new('RGBA', (self.width, self.height), (0, 0, 0, 255))
+
+    def _fonts(self):
+        local = self._local
+        if getattr(local, 'generation', None) != self._fonts_generation:
+            try:
+                if self.font_path and os.path.exists(self.font_path):
+                    local.fonts = (ImageFont.truetype(self.font_path, 42), ImageFont.truetype(self.font_path, 24))
+                else:
+                    local.fonts = (ImageFont.load_default(), ImageFont.load_default())
+            except Exception:
+                local.fonts = (ImageFont.load_default(), ImageFont.load_default())
+            local.generation = self._fonts_generation
+        return local.fonts
+
+    # Avatars
+
+    def _decode_avatar(self, raw: bytes) -> Image.Image:
+        return Image.open(io.BytesIO(raw)).convert('RGBA').resize((AVATAR_SIZE, AVATAR_SIZE))
+
+    async def avatar(self, member) -> Tuple[str, Image.Image]:
+        """(avatar hash, decoded avatar) of member, downloaded once per hash."""
+        try:
+            asset = member.display_avatar
+            key = asset.key
+        except Exception:
+            return '', self.placeholder
+        cached = self.avatars.get(key)
+        if cached is not None:
+            return key, cached
+        try:
+            raw = await asset.replace(size=256).read()
+            image = await asyncio.get_running_loop().run_in_executor(self._executor, self._decode_avatar, raw)
+        except Exception:
+            return key, self.placeholder
+        self.avatars.put(key, image)
+        return key, image
+
+    async def _no_avatar(self) -> Tuple[str, Image.Image]:
+        return '', self.placeholder
+
+    # Cards
+
+    def _draw(self, name: str, level: int, mode: str, rank: Optional[int], xp: int, cur_xp: int, needed: int, avatar: Image.Image) -> bytes:
+        font_large, font_small = self._fonts()
+        bg = self.background.copy()
+        draw = ImageDraw.Draw(bg)
+        bg.paste(avatar, AVATAR_POS, self.mask)
+
+        draw.text((270, 40), name, font=font_large, fill=self.text_color)
+        mode_text = 'Text' if mode == 'text' else 'Voice'
+        rank_text = f" • #{rank}" if rank else ''
+        draw.text((270, 95), f"Livello {level} • {mode_text}{rank_text}", font=font_small, fill=self.text_color)
+
+        bar_x, bar_y, bar_w, bar_h = 270, 150, 620, 30
+        draw.rounded_rectangle([bar_x, bar_y, bar_x + bar_w, bar_y + bar_h], radius=15, fill=self.bar_bg)
+        progress = max(0.0, min(1.0, cur_xp / needed)) if needed > 0 else 1.0
+        fill_w = int(bar_w * progress)
+        if fill_w > 0:
+            draw.rounded_rectangle([bar_x, bar_y, bar_x + fill_w, bar_y + bar_h], radius=15, fill=self.bar_color)
+        draw.text((270, 190), f"XP: {xp} • Mancano {needed - cur_xp} XP", font=font_small, fill=self.text_color)
+
+        buf = io.BytesIO()
+        bg.save(buf, format='PNG')
+        return buf.getvalue()
+
+    async def render(self, member, mode: str, xp: int, level: int, cur_xp: int, needed: int, rank: Optional[int] = None) -> bytes:
+        """PNG bytes of member's rank card."""
+        avatar_key, avatar = await self.avatar(member)
+        name = f"{member.display_name}"
+        key = (member.id, mode, xp, level, rank, name, avatar_key, self.theme)
+        png = self.outputs.get(key)
+        if png is not None:
+            return png
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._draw, name, level, mode, rank, xp, cur_xp, needed, avatar)
+        self._inflight[key] = future
+        try:
+            png = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+        self.outputs.put(key, png)
+        return png
+
+    # Leaderboard pages
+
+    def _lb_background(self, height: int) -> Image.Image:
+        bg = self._lb_backgrounds.get(height)
+        if bg is None:
+            bg = self._lb_backgrounds[height] = self.background.resize((self.width, height))
+        return bg
+
+    def _draw_leaderboard(self, title: str, rows) -> bytes:
+        font_large, font_small = self._fonts()
+        height = LB_HEADER + LB_ROW * max(1, len(rows))
+        bg = self._lb_background(height).copy()
+        draw = ImageDraw.Draw(bg)
+        draw.text((20, 14), title, font=font_large, fill=self.text_color)
+        for i, (rank, name, xp, level, avatar) in enumerate(rows):
+            y = LB_HEADER + i * LB_ROW
+            if i % 2 == 0:
+                draw.rounded_rectangle([10, y + 4, self.width - 10, y + LB_ROW - 4], radius=12, fill=self.bar_bg)
+            bg.paste(avatar.resize((LB_AVATAR, LB_AVATAR)), (20, y + (LB_ROW - LB_AVATAR) // 2), self.small_mask)
+            text_y = y + (LB_ROW - 24) // 2
+            draw.text((100, text_y), f"#{rank}", font=font_small, fill=self.bar_color)
+            draw.text((170, text_y), name, font=font_small, fill=self.text_color)
+            draw.text((self.width - 300, text_y), f"Lv {level} • {xp} XP", font=font_small, fill=self.text_color)
+        buf = io.BytesIO()
+        bg.save(buf, format='PNG')
+        return buf.getvalue()
+
+    async def render_leaderboard(self, title: str, rows) -> bytes:
+        """PNG bytes of a leaderboard page; rows are (rank, member or None,
+        name, xp, level). Avatars are fetched concurrently through the avatar
+        cache, then the page is drawn in one pass on the render pool."""
+        avatars = await asyncio.gather(*(self.avatar(m) if m is not None else self._no_avatar() for _, m, _, _, _ in rows))
+        drawn = [(rank, name, xp, level, avatar) for (rank, _, name, xp, level), (_, avatar) in zip(rows, avatars)]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._draw_leaderboard, title, drawn)
@@ -0,0 +1,128 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from json_store import load_shard
+
+MODES = ('text', 'voice')
+
+
+class RankIndex:
+    """Users of one guild ordered by XP (desc), ties by user id.
+
+    Kept as a sorted list of (-xp, uid) keys: rank_of() is a bisect, top()
+    a slice of k keys, and an update bisects out the old key and inserts the
+    new one, so nothing is ever re-sorted after the first build.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []
+        self._xp: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, uid: int) -> bool:
+        return int(uid) in self._xp
+
+    def xp_of(self, uid: int) -> int:
+        return self._xp.get(int(uid), 0)
+
+    def update(self, uid: int, xp: int):
+        uid, xp = int(uid), int(xp)
+        old = self._xp.get(uid)
+        if old == xp:
+            return
+        if old is not None:
+            self._discard((-old, uid))
+        self._xp[uid] = xp
+        insort(self._keys, (-xp, uid))
+
+    def remove(self, uid: int):
+        uid = int(uid)
+        old = self._xp.pop(uid, None)
+        if old is not None:
+            self._discard((-old, uid))
+
+    def _discard(self, key: Tuple[int, int]):
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def top(self, k: int, offset: int = 0) -> List[Tuple[int, int]]:
+        """(uid, xp) pairs ranked offset+1 .. offset+k."""
+        offset = max(0, int(offset))
+        return [(uid, -neg) for neg, uid in self._keys[offset:offset + max(0, int(k))]]
+
+    def rank_of(self, uid: int) -> Optional[int]:
+        """1-based position of uid, None if the user has no XP entry."""
+        uid = int(uid)
+        xp = self._xp.get(uid)
+        if xp is None:
+            return None
+        return bisect_left(self._keys, (-xp, uid)) + 1
+
+    @classmethod
+    def build(cls, pairs) -> 'RankIndex':
+        index = cls()
+        index._xp = {int(uid): int(xp) for uid, xp in pairs}
+        index._keys = sorted((-xp, uid) for uid, xp in index._xp.items())
+        return index
+
+
+class Leaderboards:
+    """Text and voice RankIndex per guild over the levels shards.
+
+    An index is built from the shard the first time a guild is asked for and
+    then kept current by update_users() (called by the ledger flush and by
+    the admin commands). If the shard document is replaced under us (reload
+    from disk after another process wrote it) the index is rebuilt.
+    """
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self._indexes: Dict[str, Dict[str, RankIndex]] = {}
+        self._docs: Dict[str, dict] = {}
+
+    async def get(self, gid: str, mode: str = 'text') -> RankIndex:
+        doc = await load_shard(self.data_path, gid, {})
+        if self._docs.get(gid) is not doc:
+            self._rebuild(gid, doc)
+        return self._indexes[gid][mode if mode in MODES else 'text']
+
+    def _rebuild(self, gid: str, doc: dict):
+        users = doc.get('users', {})
+        self._indexes[gid] = {
+            mode: RankIndex.build((uid, _xp(u, mode)) for uid, u in users.items())
+            for mode in MODES
+        }
+        self._docs[gid] = doc
+
+    def update_users(self, gid: str, doc: dict, uids):
+        indexes = self._indexes.get(gid)
+        if indexes is None or self._docs.get(gid) is not doc:
+            # Not built yet (or stale): the next get() builds it from doc
+            return
+        users = doc.get('users', {})
+        for uid in uids:
+            u = users.get(uid)
+            for mode in MODES:
+                if u is None:
+                    indexes[mode].remove(uid)
+                else:
+                    indexes[mode].update(uid, _xp(u, mode))
+
+    def forget(self, gid: Optional[str] = None):
+        if gid is None:
+            self._indexes.clear()
+            self._docs.clear()
+        else:
+            self._indexes.pop(gid, None)
+            self._docs.pop(gid, None)
+
+
+def _xp(u: dict, mode: str) -> int:
+    try:
+        return int(u.get(f'{mode}_xp', 0) or 0)
+    except Exception:
+        return 0
+
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Dict, Optional, Set, Tuple
+
+import discord
+
+from console_logger import logger
+
+
+class RoleSyncQueue:
+    """Per-guild queue of reward role changes, one member edit at a time.
+
+    request() merges into whatever is already pending for the member (an
+    add cancels an earlier remove of the same role and vice versa), so any
+    number of threshold crossings before the worker gets there cost a single
+    member.edit(roles=...). Each guild drains in its own task, spacing edits
+    by `interval` seconds and backing off on 429s on top of discord.py's own
+    rate limit handling.
+    """
+
+    def __init__(self, bot: discord.Client, interval: float = 1.0, reason: str = 'Ricompense livelli'):
+        self.bot = bot
+        self.interval = max(0.0, float(interval))
+        self.reason = reason
+        # gid -> uid -> (roles to add, roles to remove)
+        self._pending: Dict[int, Dict[int, Tuple[Set[int], Set[int]]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return sum(len(members) for members in self._pending.values())
+
+    def request(self, guild_id: int, user_id: int, add=(), remove=()):
+        add, remove = set(add), set(remove) - set(add)
+        if not add and not remove:
+            return
+        members = self._pending.setdefault(guild_id, {})
+        pending = members.get(user_id)
+        if pending is None:
+            members[user_id] = (add, remove)
+        else:
+            p_add, p_remove = pending
+            p_add.difference_update(remove)
+            p_remove.difference_update(add)
+            p_add.update(add)
+            p_remove.update(remove)
+        worker = self._workers.get(guild_id)
+        if worker is None or worker.done():
+            self._workers[guild_id] = asyncio.create_task(self._drain(guild_id))
+
+    async def _drain(self, guild_id: int):
+        members = self._pending.get(guild_id)
+        while members:
+            user_id, (add, remove) = members.popitem()
+            try:
+                if await self._apply(guild_id, user_id, add, remove):
+                    await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    # Put it back under whatever was queued since, so newer
+                    # requests still win, and wait it out
+                    retry = float(getattr(e, 'retry_after', None) or 5)
+                    newer = members.pop(user_id, None)
+                    self.request(guild_id, user_id, add, remove)
+                    if newer is not None:
+                        self.request(guild_id, user_id, *newer)
+                    await asyncio.sleep(retry)
+                else:
+                    logger.error(f'Sync ruoli livelli fallito per {user_id} in {guild_id}: {e}')
+            except Exception as e:
+                logger.error(f'Sync ruoli livelli fallito per {user_id} in {guild_id}: {e}')
+        self._pending.pop(guild_id, None)
+        self._workers.pop(guild_id, None)
+
+    async def _apply(self, guild_id: int, user_id: int, add: Set[int], remove: Set[int]) -> bool:
+        """Edit the member if anything actually changes; True when it did."""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return False
+        member: Optional[discord.Member] = guild.get_member(user_id)
+        if member is None:
+            return False
+        current = {r.id for r in member.roles if not r.is_default()}
+        wanted = (current - remove) | {rid for rid in add if guild.get_role(rid) is not None}
+        if wanted == current:
+            return False
+        roles = [guild.get_role(rid) for rid in wanted]
+        await member.edit(roles=[r for r in roles if r is not None], reason=self.reason)
+        return True
+
+    def close(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+        self._pending.clear()
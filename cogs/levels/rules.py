@@ -0,0 +1,166 @@
+import time
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, FrozenSet, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+
+class Boost(NamedTuple):
+    """XP event: factor applies between start and end (unix seconds),
+    optionally only in some channels."""
+    start: float
+    end: float
+    factor: float
+    channel_ids: FrozenSet[int] = frozenset()
+
+    def active(self, channel_id: Optional[int], now: float) -> bool:
+        if not (self.start <= now < self.end):
+            return False
+        return not self.channel_ids or channel_id in self.channel_ids
+
+
+class XPRules(NamedTuple):
+    """text_xp / voice_xp config section compiled once per load or reload.
+
+    IDs are ints in frozensets, so exclusion is a set test and the role
+    multiplier is one dict lookup per member role. The multiplier of a
+    message or voice minute is the best role factor (at least 1) times the
+    channel factor times every active boost.
+    """
+    enabled: bool
+    amount: Tuple[int, int]
+    cooldown: int
+    excluded_channels: FrozenSet[int]
+    excluded_roles: FrozenSet[int]
+    role_multipliers: Mapping[int, float]
+    channel_multipliers: Mapping[int, float]
+    boosts: Tuple[Boost, ...]
+    exclude_muted: bool
+    exclude_deaf: bool
+
+    def excluded(self, role_ids: Iterable[int], channel_id: Optional[int] = None) -> bool:
+        if channel_id is not None and channel_id in self.excluded_channels:
+            return True
+        return bool(self.excluded_roles) and not self.excluded_roles.isdisjoint(role_ids)
+
+    def multiplier(self, role_ids: Iterable[int], channel_id: Optional[int] = None, now: Optional[float] = None) -> float:
+        mult = 1.0
+        if self.role_multipliers:
+            for rid in role_ids:
+                factor = self.role_multipliers.get(rid)
+                if factor is not None and factor > mult:
+                    mult = factor
+        if channel_id is not None:
+            mult *= self.channel_multipliers.get(channel_id, 1.0)
+        if self.boosts:
+            now = time.time() if now is None else now
+            for boost in self.boosts:
+                if boost.active(channel_id, now):
+                    mult *= boost.factor
+        return mult
+
+
+def _ids(values: Any) -> FrozenSet[int]:
+    out = set()
+    for v in values or []:
+        try:
+            out.add(int(v))
+        except (TypeError, ValueError):
+            continue
+    return frozenset(out)
+
+
+def _factors(mapping: Any) -> Mapping[int, float]:
+    out = {}
+    for key, factor in (mapping or {}).items():
+        try:
+            out[int(key)] = float(factor)
+        except (TypeError, ValueError):
+            continue
+    return MappingProxyType(out)
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    dt = datetime.fromisoformat(str(value))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _boosts(entries: Any) -> Tuple[Boost, ...]:
+    out = []
+    for entry in entries or []:
+        try:
+            out.append(Boost(_timestamp(entry['start']), _timestamp(entry['end']),
+                             float(entry.get('factor', 1)), _ids(entry.get('channel_ids'))))
+        except Exception:
+            continue
+    return tuple(out)
+
+
+def compile_rules(section: Mapping[str, Any], voice: bool = False) -> XPRules:
+    """Compile a text_xp (or, with voice=True, voice_xp) config section.
+
+    Voice uses per_min_min/per_min_max as the amount and also excludes the
+    exclude_afk_channel_ids; boosts take ISO dates (UTC when naive) or unix
+    timestamps.
+    """
+    section = section or {}
+    if voice:
+        amount = (int(section.get('per_min_min', 2)), int(section.get('per_min_max', 5)))
+        excluded_channels = _ids(section.get('excluded_channel_ids')) | _ids(section.get('exclude_afk_channel_ids'))
+    else:
+        amount = (int(section.get('min', 5)), int(section.get('max', 15)))
+        excluded_channels = _ids(section.get('excluded_channel_ids'))
+    return XPRules(
+        enabled=bool(section.get('enabled', True)),
+        amount=amount,
+        cooldown=int(section.get('cooldown_seconds', 60)),
+        excluded_channels=excluded_channels,
+        excluded_roles=_ids(section.get('excluded_role_ids')),
+        role_multipliers=_factors(section.get('multiplier_roles')),
+        channel_multipliers=_factors(section.get('multiplier_channels')),
+        boosts=_boosts(section.get('boosts')),
+        exclude_muted=bool(section.get('exclude_muted', True)),
+        exclude_deaf=bool(section.get('exclude_deaf', True)),
+    )
+
+
+class Rewards(NamedTuple):
+    """Level -> role rewards, compiled from the "rewards" config section.
+
+    With stack every reached threshold's role is kept, otherwise only the
+    highest one. roles_for() is the full set of reward roles a member should
+    have; anything else in `roles` should be taken away.
+    """
+    text: Tuple[Tuple[int, int], ...]
+    voice: Tuple[Tuple[int, int], ...]
+    stack: bool
+    roles: FrozenSet[int]
+
+    def _reached(self, table: Tuple[Tuple[int, int], ...], level: int) -> FrozenSet[int]:
+        reached = [rid for threshold, rid in table if threshold <= level]
+        if not self.stack:
+            reached = reached[-1:]
+        return frozenset(reached)
+
+    def roles_for(self, text_level: int, voice_level: int) -> FrozenSet[int]:
+        return self._reached(self.text, text_level) | self._reached(self.voice, voice_level)
+
+
+def _reward_table(mapping: Any) -> Tuple[Tuple[int, int], ...]:
+    out = []
+    for level, rid in (mapping or {}).items():
+        try:
+            out.append((int(level), int(rid)))
+        except (TypeError, ValueError):
+            continue
+    return tuple(sorted(out))
+
+
+def compile_rewards(section: Mapping[str, Any]) -> Rewards:
+    section = section or {}
+    text = _reward_table(section.get('text'))
+    voice = _reward_table(section.get('voice'))
+    return Rewards(text, voice, bool(section.get('stack', True)), frozenset(rid for _, rid in text + voice))
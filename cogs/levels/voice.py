@@ -0,0 +1,56 @@
+from typing import Dict, Iterator, Tuple
+
+Key = Tuple[int, int]
+
+
+class VoiceSession:
+    __slots__ = ('since', 'carry')
+
+    def __init__(self, since: float, carry: float = 0.0):
+        self.since = since
+        # Seconds not yet worth a full minute, kept for the next settlement
+        self.carry = carry
+
+
+class VoiceTracker:
+    """Open voice sessions per (guild_id, user_id) of members earning XP.
+
+    A session starts when a member becomes eligible (joins, unmutes, leaves
+    the AFK channel) and is settled when they stop being eligible or at a
+    checkpoint; settling returns the whole minutes earned since the last one.
+    The leftover seconds of a stopped session are kept and count towards the
+    member's next one, so nothing is lost to channel moves or mute toggles.
+    """
+
+    def __init__(self):
+        self.sessions: Dict[Key, VoiceSession] = {}
+        self.carry: Dict[Key, float] = {}
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self.sessions
+
+    def __iter__(self) -> Iterator[Key]:
+        return iter(list(self.sessions))
+
+    def start(self, key: Key, now: float):
+        if key not in self.sessions:
+            self.sessions[key] = VoiceSession(now, self.carry.pop(key, 0.0))
+
+    def settle(self, key: Key, now: float) -> int:
+        session = self.sessions.get(key)
+        if session is None:
+            return 0
+        elapsed = max(0.0, now - session.since) + session.carry
+        minutes, session.carry = divmod(elapsed, 60)
+        session.since = now
+        return int(minutes)
+
+    def stop(self, key: Key, now: float) -> int:
+        minutes = self.settle(key, now)
+        session = self.sessions.pop(key, None)
+        if session is not None and session.carry:
+            self.carry[key] = session.carry
+        return minutes
@@ -0,0 +1,258 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import discord
+
+from console_logger import logger
+from json_store import dumps, loads, run_io
+
+DISCORD_EPOCH_MS = 1420070400000
+# Rough per-record overhead (tuple, ints, dict slots) on top of the strings
+RECORD_OVERHEAD = 200
+
+
+class ArchivedMessage(NamedTuple):
+    id: int
+    channel_id: int
+    author_id: int
+    content: str
+    attachments: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> 'ArchivedMessage':
+        return cls(message.id, message.channel.id, message.author.id, message.content or '',
+                   tuple(a.filename for a in message.attachments))
+
+    def size(self) -> int:
+        return RECORD_OVERHEAD + len(self.content) + sum(len(name) for name in self.attachments)
+
+    def to_json(self) -> list:
+        return [self.id, self.channel_id, self.author_id, self.content, list(self.attachments)]
+
+    @classmethod
+    def from_json(cls, row: list) -> 'ArchivedMessage':
+        return cls(int(row[0]), int(row[1]), int(row[2]), row[3] or '', tuple(row[4] or ()))
+
+
+def created_ms(message_id: int) -> int:
+    return (message_id >> 22) + DISCORD_EPOCH_MS
+
+
+def segment_of(message_id: int) -> str:
+    """Hourly segment holding a message, from its snowflake creation time."""
+    return time.strftime('%Y%m%d%H', time.gmtime(created_ms(message_id) / 1000))
+
+
+class MessageArchive:
+    """Recent message content for deletes/edits discord.py no longer caches.
+
+    In memory every channel keeps a ring of its last `per_channel` messages
+    and the whole archive is held under `max_bytes` (estimated), dropping
+    the oldest messages first. With `disk` on, records are also appended
+    (batched every `flush_interval` seconds) to hourly NDJSON segments in
+    <data_dir>/<guild_id>/<YYYYMMDDHH>.ndjson. The segment is derived from
+    the message's snowflake, so an uncached lookup reads a single file, and
+    segments older than `ttl` seconds are deleted. Later lines for the same
+    id (edits) win.
+    """
+
+    def __init__(self, data_dir: str, per_channel: int = 500, max_bytes: int = 32 * 1024 * 1024,
+                 disk: bool = False, ttl: float = 72 * 3600, flush_interval: float = 5.0):
+        self.data_dir = data_dir
+        self._channels: Dict[int, 'OrderedDict[int, ArchivedMessage]'] = {}
+        # (channel_id, message_id) in insertion order, for the global cap
+        self._order: Deque[Tuple[int, int]] = deque()
+        self.bytes = 0
+        self.count = 0
+        # (guild_id, segment) -> pending NDJSON lines
+        self._pending: Dict[Tuple[int, str], List[bytes]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._pruned_at = 0.0
+        self.configure(per_channel, max_bytes, disk, ttl, flush_interval)
+
+    def configure(self, per_channel: int, max_bytes: int, disk: bool, ttl: float, flush_interval: float):
+        self.per_channel = max(1, int(per_channel))
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk = bool(disk)
+        self.ttl = max(0.0, float(ttl))
+        self.flush_interval = max(0.5, float(flush_interval))
+        for channel_id in list(self._channels):
+            ring = self._channels[channel_id]
+            while len(ring) > self.per_channel:
+                self._drop(channel_id, next(iter(ring)))
+        self._enforce_cap()
+
+    # -- memory -----------------------------------------------------------
+
+    def _drop(self, channel_id: int, message_id: int) -> Optional[ArchivedMessage]:
+        ring = self._channels.get(channel_id)
+        if ring is None:
+            return None
+        record = ring.pop(message_id, None)
+        if record is not None:
+            self.bytes -= record.size()
+            self.count -= 1
+            if not ring:
+                del self._channels[channel_id]
+        return record
+
+    def _enforce_cap(self):
+        while self.bytes > self.max_bytes and self._order:
+            self._drop(*self._order.popleft())
+        # Entries already dropped by the rings stay in _order; compact it now
+        # and then so it can't outgrow the live records
+        if len(self._order) > 2 * self.count + 1024:
+            self._order = deque(key for key in self._order
+                                if key[1] in self._channels.get(key[0], ()))
+
+    def _put(self, record: ArchivedMessage):
+        ring = self._channels.setdefault(record.channel_id, OrderedDict())
+        old = ring.pop(record.id, None)
+        if old is not None:
+            self.bytes -= old.size()
+            self.count -= 1
+        else:
+            self._order.append((record.channel_id, record.id))
+        ring[record.id] = record
+        self.bytes += record.size()
+        self.count += 1
+        while len(ring) > self.per_channel:
+            self._drop(record.channel_id, next(iter(ring)))
+        self._enforce_cap()
+
+    def add(self, guild_id: int, record: ArchivedMessage):
+        self._put(record)
+        self._spill(guild_id, record)
+
+    def pop(self, channel_id: int, message_id: int) -> Optional[ArchivedMessage]:
+        return self._drop(channel_id, message_id)
+
+    # -- disk -------------------------------------------------------------
+
+    def _spill(self, guild_id: int, record: ArchivedMessage):
+        if not self.disk or not guild_id:
+            return
+        self._pending.setdefault((guild_id, segment_of(record.id)), []).append(dumps(record.to_json()))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flusher())
+
+    def _guild_dir(self, guild_id: int) -> str:
+        return os.path.join(self.data_dir, str(guild_id))
+
+    @staticmethod
+    def _append(path: str, lines: List[bytes]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(b'\n'.join(lines) + b'\n')
+
+    @staticmethod
+    def _read(path: str, wanted: frozenset) -> Dict[int, ArchivedMessage]:
+        found = {}
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = ArchivedMessage.from_json(loads(line))
+                    except Exception:
+                        continue
+                    if record.id in wanted:
+                        found[record.id] = record
+        except FileNotFoundError:
+            pass
+        return found
+
+    def _prune_files(self, now: float):
+        cutoff = time.strftime('%Y%m%d%H', time.gmtime(now - self.ttl))
+        if not os.path.isdir(self.data_dir):
+            return
+        for gid in os.listdir(self.data_dir):
+            gdir = os.path.join(self.data_dir, gid)
+            if not os.path.isdir(gdir):
+                continue
+            for name in os.listdir(gdir):
+                if name.endswith('.ndjson') and name[:-len('.ndjson')] < cutoff:
+                    try:
+                        os.remove(os.path.join(gdir, name))
+                    except OSError:
+                        pass
+            try:
+                if not os.listdir(gdir):
+                    os.rmdir(gdir)
+            except OSError:
+                pass
+
+    async def flush(self):
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        for (guild_id, segment), lines in pending.items():
+            gdir = self._guild_dir(guild_id)
+            try:
+                await run_io(gdir, self._append, os.path.join(gdir, segment + '.ndjson'), lines)
+            except Exception as e:
+                logger.error(f'Errore scrittura archivio messaggi {gdir}: {e}')
+        now = time.time()
+        if now - self._pruned_at >= 3600:
+            self._pruned_at = now
+            try:
+                await run_io(self.data_dir, self._prune_files, now)
+            except Exception as e:
+                logger.error(f'Errore pulizia archivio messaggi: {e}')
+
+    async def _flusher(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def get_many(self, guild_id: Optional[int], channel_id: int, message_ids: Iterable[int]) -> Dict[int, ArchivedMessage]:
+        """Archived versions of these messages, from memory, then from disk."""
+        ring = self._channels.get(channel_id, {})
+        found, missing = {}, []
+        for mid in message_ids:
+            record = ring.get(mid)
+            if record is not None:
+                found[mid] = record
+            else:
+                missing.append(mid)
+        if not missing or not self.disk or not guild_id:
+            return found
+        # Segments past the TTL are gone anyway (one hour of slack for pruning)
+        horizon = (time.time() - self.ttl - 3600) * 1000
+        missing = [mid for mid in missing if created_ms(mid) >= horizon]
+        if not missing:
+            return found
+        # Also waits for a flush already in progress
+        await self.flush()
+        by_segment: Dict[str, List[int]] = {}
+        for mid in missing:
+            by_segment.setdefault(segment_of(mid), []).append(mid)
+        gdir = self._guild_dir(guild_id)
+        for segment, ids in by_segment.items():
+            try:
+                records = await run_io(gdir, self._read, os.path.join(gdir, segment + '.ndjson'), frozenset(ids))
+            except Exception as e:
+                logger.error(f'Errore lettura archivio messaggi {gdir}: {e}')
+                continue
+            for mid, record in records.items():
+                if record.channel_id == channel_id:
+                    found[mid] = record
+        return found
+
+    async def get(self, guild_id: Optional[int], channel_id: int, message_id: int) -> Optional[ArchivedMessage]:
+        return (await self.get_many(guild_id, channel_id, [message_id])).get(message_id)
+
+    def stats(self) -> dict:
+        return {'messages': self.count, 'bytes': self.bytes, 'channels': len(self._channels),
+                'pending': sum(len(lines) for lines in self._pending.values())}
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._pending:
+            await self.flush()
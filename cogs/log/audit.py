@@ -0,0 +1,147 @@
+import time
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+import discord
+
+Key = Tuple[int, object, int]
+
+# Changes Discord often makes without an audit entry (own nickname, boost
+# roles, thread auto-archive, channel positions shifting, boost level...):
+# lookups for these don't wait for the entry to show up
+OPTIONAL_ACTIONS = frozenset(
+    getattr(discord.AuditLogAction, name) for name in (
+        'member_update', 'member_role_update', 'thread_update', 'channel_update', 'guild_update', 'message_delete',
+    ) if hasattr(discord.AuditLogAction, name)
+)
+
+
+class AuditCache:
+    """Recent audit log entries per (guild, action, target), from the gateway.
+
+    LogCog feeds it from on_audit_log_entry_create, so "who did it" for a
+    log embed is a dict lookup instead of a guild.audit_logs() request.
+    Entries live `ttl` seconds. Since the entry often arrives just after the
+    event it explains, lookup() can wait up to `wait` seconds for it; only
+    when it still has not come (e.g. missing View Audit Log permission) and
+    fallback_http is on does it fall back to one audit_logs() query.
+    OPTIONAL_ACTIONS skip the wait, and a key that came up empty is
+    remembered for `negative_ttl` seconds (unless its entry arrives), so
+    repeated events without an entry cost neither the wait nor the query.
+    """
+
+    def __init__(self, ttl: float = 30.0, wait: float = 1.5, fallback_http: bool = True, negative_ttl: float = 10.0):
+        self.configure(ttl, wait, fallback_http, negative_ttl)
+        # (guild_id, action, target_id) -> [(arrived_at, entry)], oldest first
+        self._entries: Dict[Key, List[Tuple[float, discord.AuditLogEntry]]] = {}
+        self._waiters: Dict[Key, List[asyncio.Future]] = {}
+        # key -> until when a lookup returns None right away
+        self._negative: Dict[Key, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, ttl: float, wait: float, fallback_http: bool, negative_ttl: float = 10.0):
+        self.ttl = float(ttl)
+        self.wait = float(wait)
+        self.fallback_http = bool(fallback_http)
+        self.negative_ttl = max(0.0, float(negative_ttl))
+
+    def add(self, entry: discord.AuditLogEntry):
+        target_id = getattr(entry.target, 'id', None)
+        if target_id is None:
+            return
+        now = time.monotonic()
+        key = (entry.guild.id, entry.action, target_id)
+        self._trim(key, now)
+        self._entries.setdefault(key, []).append((now, entry))
+        self._negative.pop(key, None)
+        if len(self._entries) > 2000 or len(self._negative) > 2000:
+            self.prune(now)
+        for future in self._waiters.pop(key, []):
+            if not future.done():
+                future.set_result(entry)
+
+    def prune(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        for key in list(self._entries):
+            fresh = [item for item in self._entries[key] if now - item[0] < self.ttl]
+            if fresh:
+                self._entries[key] = fresh
+            else:
+                del self._entries[key]
+        for key in [k for k, until in self._negative.items() if until <= now]:
+            del self._negative[key]
+
+    def _trim(self, key: Key, now: float) -> List[Tuple[float, discord.AuditLogEntry]]:
+        """Drop the key's expired entries (the oldest, at the front)."""
+        items = self._entries.get(key)
+        if not items:
+            return []
+        expired = 0
+        while expired < len(items) and now - items[expired][0] >= self.ttl:
+            expired += 1
+        if expired == len(items):
+            del self._entries[key]
+            return []
+        if expired:
+            del items[:expired]
+        return items
+
+    def _find(self, key: Key, predicate: Optional[Callable]) -> Optional[discord.AuditLogEntry]:
+        for arrived, entry in reversed(self._trim(key, time.monotonic())):
+            if predicate is None or predicate(entry):
+                return entry
+        return None
+
+    async def lookup(self, guild: discord.Guild, action: discord.AuditLogAction, target_id: int,
+                     predicate: Optional[Callable] = None, wait: Optional[float] = None) -> Optional[discord.AuditLogEntry]:
+        """Newest fresh entry for (action, target_id) matching predicate."""
+        key = (guild.id, action, target_id)
+        entry = self._find(key, predicate)
+        # Predicate lookups ask a narrower question than a remembered miss
+        until = self._negative.get(key)
+        if until is not None and until <= time.monotonic():
+            del self._negative[key]
+        elif entry is None and predicate is None and until is not None:
+            self.misses += 1
+            return None
+        if wait is None:
+            wait = 0.0 if action in OPTIONAL_ACTIONS else self.wait
+        deadline = time.monotonic() + wait
+        while entry is None and time.monotonic() < deadline:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(key, []).append(future)
+            try:
+                await asyncio.wait_for(future, deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                waiters = self._waiters.get(key)
+                if waiters and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[key]
+            entry = self._find(key, predicate)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        if self.fallback_http:
+            try:
+                async for e in guild.audit_logs(action=action, limit=5):
+                    if getattr(e.target, 'id', None) == target_id and (predicate is None or predicate(e)):
+                        return e
+            except Exception:
+                pass
+        if self.negative_ttl and predicate is None:
+            self._negative[key] = time.monotonic() + self.negative_ttl
+        return None
+
+
+def entry_user_mention(entry: Optional[discord.AuditLogEntry]) -> str:
+    if entry is None:
+        return 'Sistema'
+    if entry.user is not None:
+        return entry.user.mention
+    user_id = getattr(entry, 'user_id', None)
+    return f'<@{user_id}>' if user_id else 'Sistema'
@@ -0,0 +1,215 @@
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+from console_logger import logger
+
+# Discord limits for a single message
+MAX_EMBEDS = 10
+MAX_CHARS = 6000
+
+# Lower sends first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class _Channel:
+    def __init__(self, channel):
+        self.channel = channel
+        # (priority, seq, enqueued_at, embed)
+        self.heap: List[Tuple[int, int, float, discord.Embed]] = []
+        self.wakeup = asyncio.Event()
+        self.space = asyncio.Condition()
+        self.worker: Optional[asyncio.Task] = None
+        self.dropped: Dict[int, int] = {}
+        self.dropped_total = 0
+        self.sent = 0
+        self.messages = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+
+
+class LogDispatcher:
+    """Per-channel log queues packing up to 10 embeds per message.
+
+    submit() puts an embed in the channel's bounded priority queue. The
+    channel worker waits `window` seconds after the first embed to let a
+    burst pile up, then sends the highest priority ones (moderation before
+    message edits, oldest first) in one channel.send(embeds=[...]), within
+    Discord's 10 embeds / 6000 characters per message. When a queue is full
+    submit() waits up to `backpressure` seconds for room, then evicts a lower
+    priority embed or drops the new one; drops are counted and reported in
+    the channel as a single summary embed. stats() exposes queue depth,
+    drops and delivery lag per channel.
+    """
+
+    def __init__(self, window: float = 0.75, max_queue: int = 200, backpressure: float = 2.0):
+        self.window = max(0.0, float(window))
+        self.max_queue = max(MAX_EMBEDS, int(max_queue))
+        self.backpressure = max(0.0, float(backpressure))
+        self._channels: Dict[int, _Channel] = {}
+        self._seq = itertools.count()
+
+    def configure(self, window: float, max_queue: int, backpressure: float):
+        self.window = max(0.0, float(window))
+        self.max_queue = max(MAX_EMBEDS, int(max_queue))
+        self.backpressure = max(0.0, float(backpressure))
+
+    async def submit(self, channel, embed: discord.Embed, priority: int = PRIORITY_NORMAL):
+        state = self._channels.get(channel.id)
+        if state is None:
+            state = self._channels[channel.id] = _Channel(channel)
+        state.channel = channel
+        if len(state.heap) >= self.max_queue and self.backpressure:
+            async with state.space:
+                try:
+                    await asyncio.wait_for(state.space.wait_for(lambda: len(state.heap) < self.max_queue), self.backpressure)
+                except asyncio.TimeoutError:
+                    pass
+        if len(state.heap) >= self.max_queue:
+            worst = max(state.heap)
+            state.dropped_total += 1
+            if worst[0] <= priority:
+                state.dropped[priority] = state.dropped.get(priority, 0) + 1
+                state.wakeup.set()
+                self._ensure_worker(state)
+                return
+            state.heap.remove(worst)
+            heapq.heapify(state.heap)
+            state.dropped[worst[0]] = state.dropped.get(worst[0], 0) + 1
+        heapq.heappush(state.heap, (priority, next(self._seq), time.monotonic(), embed))
+        state.wakeup.set()
+        self._ensure_worker(state)
+
+    def _ensure_worker(self, state: _Channel):
+        if state.worker is None or state.worker.done():
+            state.worker = asyncio.create_task(self._run(state))
+
+    def _take_batch(self, state: _Channel) -> List[Tuple[int, int, float, discord.Embed]]:
+        batch, chars = [], 0
+        while state.heap and len(batch) < MAX_EMBEDS:
+            size = len(state.heap[0][3])
+            if batch and chars + size > MAX_CHARS:
+                break
+            batch.append(heapq.heappop(state.heap))
+            chars += size
+        return batch
+
+    def _summary(self, state: _Channel) -> Optional[discord.Embed]:
+        if not state.dropped:
+            return None
+        total = sum(state.dropped.values())
+        names = {PRIORITY_HIGH: 'alta', PRIORITY_NORMAL: 'normale', PRIORITY_LOW: 'bassa'}
+        detail = ', '.join(f"{n} a priorità {names.get(p, p)}" for p, n in sorted(state.dropped.items()))
+        state.dropped = {}
+        return discord.Embed(title='⚠️ Log in sovraccarico',
+                             description=f'{total} eventi non inviati ({detail}).', color=0xffa500)
+
+    async def _run(self, state: _Channel):
+        # The window only applies to the first embed of a burst; while a
+        # backlog is queued the next batch goes out right away
+        idle = True
+        while True:
+            if not state.heap:
+                summary = self._summary(state)
+                if summary is None:
+                    idle = True
+                    state.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(state.wakeup.wait(), 60)
+                    except asyncio.TimeoutError:
+                        if not state.heap:
+                            return
+                    continue
+                state.heap.append((PRIORITY_HIGH, next(self._seq), time.monotonic(), summary))
+            # Let the burst pile up before packing it
+            if idle and self.window:
+                await asyncio.sleep(self.window)
+            idle = False
+            batch = self._take_batch(state)
+            async with state.space:
+                state.space.notify_all()
+            if not batch:
+                continue
+            try:
+                await state.channel.send(embeds=[item[3] for item in batch])
+                self._delivered(state, batch, 1)
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self._requeue(state, batch)
+                    await asyncio.sleep(float(getattr(e, 'retry_after', None) or 5))
+                    continue
+                if len(batch) == 1:
+                    logger.error(f'Errore invio log nel canale {state.channel.id}: {e}')
+                    continue
+                # One bad embed fails the whole message: send them one by
+                # one so only that one is lost
+                await self._send_each(state, batch)
+            except Exception as e:
+                logger.error(f'Errore invio log nel canale {state.channel.id}: {e}')
+                continue
+            summary = self._summary(state)
+            if summary is not None:
+                heapq.heappush(state.heap, (PRIORITY_HIGH, next(self._seq), time.monotonic(), summary))
+
+    async def _send_each(self, state: _Channel, batch: List[Tuple[int, int, float, discord.Embed]]):
+        for i, item in enumerate(batch):
+            try:
+                await state.channel.send(embeds=[item[3]])
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self._requeue(state, batch[i:])
+                    await asyncio.sleep(float(getattr(e, 'retry_after', None) or 5))
+                    return
+                logger.error(f'Errore invio log nel canale {state.channel.id}: {e}')
+                continue
+            except Exception as e:
+                logger.error(f'Errore invio log nel canale {state.channel.id}: {e}')
+                continue
+            self._delivered(state, [item], 1)
+
+    def _requeue(self, state: _Channel, items: List[Tuple[int, int, float, discord.Embed]]):
+        for item in items:
+            heapq.heappush(state.heap, item)
+
+    def _delivered(self, state: _Channel, items: List[Tuple[int, int, float, discord.Embed]], messages: int):
+        now = time.monotonic()
+        state.messages += messages
+        state.sent += len(items)
+        for item in items:
+            lag = now - item[2]
+            state.lag_total += lag
+            state.lag_max = max(state.lag_max, lag)
+
+    def stats(self) -> Dict[int, dict]:
+        out = {}
+        now = time.monotonic()
+        for cid, state in self._channels.items():
+            oldest = min((item[2] for item in state.heap), default=None)
+            out[cid] = {
+                'depth': len(state.heap),
+                'sent': state.sent,
+                'messages': state.messages,
+                'dropped': state.dropped_total,
+                'lag_avg_ms': round(state.lag_total / state.sent * 1000) if state.sent else 0,
+                'lag_max_ms': round(state.lag_max * 1000),
+                'oldest_ms': round((now - oldest) * 1000) if oldest is not None else 0,
+            }
+        return out
+
+    async def drain(self, timeout: float = 5.0):
+        """Give queued embeds a chance to go out (e.g. on unload)."""
+        deadline = time.monotonic() + timeout
+        while any(s.heap for s in self._channels.values()) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    def close(self):
+        for state in self._channels.values():
+            if state.worker is not None:
+                state.worker.cancel()
+        self._channels.clear()
@@ -1,22 +1,52 @@
 import discord
 from discord.ext import commands
+from discord import app_commands
 import json
 import os
 import asyncio
 from datetime import datetime, timezone, timedelta
 from console_logger import logger
+from bot_utils import owner_or_has_permissions
+from json_store import write_json_nowait
+from config_store import get_config
+from cogs.log.archive import ArchivedMessage, MessageArchive
+from cogs.log.audit import AuditCache, entry_user_mention
+from cogs.log.dispatcher import LogDispatcher, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL
+from cogs.log.permissions import overwrites_diff, permissions_diff
+from cogs.log.templates import EmbedTemplate, Lazy, compile_templates, resolve
 
 
 BASE_DIR = os.path.dirname(__file__)
 LOG_JSON = os.path.join(BASE_DIR, 'log.json')
+ARCHIVE_DIR = os.path.join(os.path.abspath(os.path.join(BASE_DIR, '..', '..')), 'data', 'message_archive')
+
+# Which log messages go first when a channel is flooded (a "priority" key in
+# the message config overrides this); anything not listed is normal
+PRIORITIES = {
+    'ban_message': PRIORITY_HIGH,
+    'unban_message': PRIORITY_HIGH,
+    'kick_message': PRIORITY_HIGH,
+    'mute_message': PRIORITY_HIGH,
+    'unmute_message': PRIORITY_HIGH,
+    'warn_message': PRIORITY_HIGH,
+    'unwarn_message': PRIORITY_HIGH,
+    'clearwarns_message': PRIORITY_HIGH,
+    'automod_mute_message': PRIORITY_HIGH,
+    'automod_warn_message': PRIORITY_HIGH,
+    'role_permission_update_message': PRIORITY_HIGH,
+    'channel_permission_update_message': PRIORITY_HIGH,
+    'message_delete_message': PRIORITY_LOW,
+    'message_edit_message': PRIORITY_LOW,
+    'vc_join_message': PRIORITY_LOW,
+    'vc_leave_message': PRIORITY_LOW,
+    'vc_move_message': PRIORITY_LOW,
+}
 
 class LogCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.config = {}
+        self.config = get_config()
         self.log_config = {}
-        with open('./config.json', 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
         if os.path.exists(LOG_JSON):
             try:
                 with open(LOG_JSON, 'r', encoding='utf-8') as f:
@@ -28,12 +58,70 @@ class LogCog(commands.Cog):
                 with open('log.json', 'r', encoding='utf-8') as f:
                     self.log_config = json.load(f)
                 try:
-                    with open(LOG_JSON, 'w', encoding='utf-8') as f:
-                        json.dump(self.log_config, f, indent=2, ensure_ascii=False)
+                    write_json_nowait(LOG_JSON, self.log_config, pretty=True)
                 except Exception:
                     pass
             except Exception:
                 self.log_config = {}
+        self.dispatcher = LogDispatcher()
+        self.audit = AuditCache()
+        self.archive = MessageArchive(ARCHIVE_DIR)
+        self._configure_dispatcher()
+        self.templates = compile_templates(self.log_config)
+
+    async def cog_unload(self):
+        await self.dispatcher.drain()
+        self.dispatcher.close()
+        await self.archive.close()
+
+    def _configure_dispatcher(self):
+        cfg = self.log_config.get('dispatcher', {})
+        try:
+            self.dispatcher.configure(cfg.get('window_ms', 750) / 1000, cfg.get('max_queue', 200), cfg.get('backpressure_seconds', 2))
+        except Exception as e:
+            logger.error(f'Configurazione dispatcher log non valida: {e}')
+        cfg = self.log_config.get('audit_cache', {})
+        try:
+            self.audit.configure(cfg.get('ttl_seconds', 30), cfg.get('wait_seconds', 1.5), cfg.get('fallback_http', True),
+                                 cfg.get('negative_ttl_seconds', 10))
+        except Exception as e:
+            logger.error(f'Configurazione audit_cache log non valida: {e}')
+        cfg = self.log_config.get('message_archive', {})
+        try:
+            self.archive.configure(cfg.get('per_channel', 500), cfg.get('max_memory_mb', 32) * 1024 * 1024, cfg.get('disk', False),
+                                   cfg.get('ttl_hours', 72) * 3600, cfg.get('flush_seconds', 5))
+        except Exception as e:
+            logger.error(f'Configurazione message_archive log non valida: {e}')
+
+    @commands.Cog.listener()
+    async def on_audit_log_entry_create(self, entry: discord.AuditLogEntry):
+        try:
+            self.audit.add(entry)
+        except Exception:
+            pass
+
+    @app_commands.command(name='logqueue', description='Mostra lo stato delle code dei canali di log (solo admin)')
+    @owner_or_has_permissions(administrator=True)
+    async def slash_logqueue(self, interaction: discord.Interaction):
+        stats = self.dispatcher.stats()
+        if not stats:
+            await interaction.response.send_message('Nessun log inviato finora.', ephemeral=True)
+            return
+        lines = []
+        for cid, st in stats.items():
+            lines.append(f"<#{cid}> — in coda {st['depth']} (più vecchio {st['oldest_ms']} ms), inviati {st['sent']} in {st['messages']} messaggi, "
+                         f"scartati {st['dropped']}, ritardo medio {st['lag_avg_ms']} ms / max {st['lag_max_ms']} ms")
+        embed = discord.Embed(title='Code dei log', description='\n'.join(lines)[:4000], color=0x00ff00)
+        archive = self.archive.stats()
+        embed.set_footer(text=f'Audit log: {self.audit.hits} dalla cache, {self.audit.misses} mancati | '
+                              f"Archivio messaggi: {archive['messages']} ({archive['bytes'] // 1024} KB)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    def _priority(self, name, cfg):
+        try:
+            return int(cfg.get('priority', PRIORITIES.get(name, PRIORITY_NORMAL)))
+        except Exception:
+            return PRIORITY_NORMAL
 
     def reload_config(self):
         try:
@@ -46,6 +134,8 @@ class LogCog(commands.Cog):
         except Exception as e:
             logger.error(f'Errore nel caricamento di log.json: {e}')
             self.log_config = {}
+        self._configure_dispatcher()
+        self.templates = compile_templates(self.log_config)
 
     def _format_datetime(self, dt: datetime):
         if not dt:
@@ -77,18 +167,22 @@ class LogCog(commands.Cog):
         except Exception:
             return 'N/A'
 
-    def _render_template(self, template: str, **kwargs):
-        s = template
-        for k, v in kwargs.items():
-            s = s.replace('{' + k + '}', str(v))
-        return s
+    def _template(self, embed_config) -> EmbedTemplate:
+        # embed_config is the name of a message in log.json (or the dict itself)
+        if isinstance(embed_config, str):
+            tpl = self.templates.get(embed_config)
+            if tpl is None:
+                tpl = self.templates[embed_config] = EmbedTemplate(self.log_config.get(embed_config, {}))
+            return tpl
+        return EmbedTemplate(embed_config or {})
+
+    def _needs(self, name: str, *fields: str) -> bool:
+        """Whether the message's template uses any of these placeholders."""
+        return self._template(name).needs(*fields)
 
     async def _get_audit_user(self, action, target_id, guild):
         try:
-            async for entry in guild.audit_logs(action=action, limit=5):
-                if entry.target.id == target_id:
-                    return entry.user.mention if entry.user else 'Sistema'
-            return 'Sistema'
+            return entry_user_mention(await self.audit.lookup(guild, action, target_id))
         except Exception:
             return 'Sistema'
 
@@ -99,56 +193,12 @@ class LogCog(commands.Cog):
           Returns: multiline string describing changes.
         - Role/Member permissions: discord.Permissions vs discord.Permissions
           Returns: tuple (added_perms_str, removed_perms_str)
+        Both are computed on the raw permission bits (see cogs.log.permissions).
         """
-        # Case 1: channel overwrites (dict of PermissionOverwrite)
         if isinstance(before_overwrites, dict) and isinstance(after_overwrites, dict):
-            changes = []
-            all_targets = set(before_overwrites.keys()) | set(after_overwrites.keys())
-            for target in all_targets:
-                b_over = before_overwrites.get(target)
-                a_over = after_overwrites.get(target)
-                if b_over is None and a_over is not None:
-                    try:
-                        allow, deny = a_over.pair()  # both are discord.Permissions
-                    except Exception:
-                        # Fallback: treat as empty
-                        allow, deny = discord.Permissions.none(), discord.Permissions.none()
-                    allow_perms = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(allow, p)]
-                    deny_perms = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(deny, p)]
-                    if allow_perms or deny_perms:
-                        changes.append(f"Aggiunto overwrite per {getattr(target, 'mention', str(target))}: Allow {', '.join(allow_perms) or 'Nessuno'}, Deny {', '.join(deny_perms) or 'Nessuno'}")
-                elif a_over is None and b_over is not None:
-                    changes.append(f"Rimosso overwrite per {getattr(target, 'mention', str(target))}")
-                else:
-                    try:
-                        b_allow, b_deny = b_over.pair()
-                        a_allow, a_deny = a_over.pair()
-                    except Exception:
-                        b_allow = b_deny = discord.Permissions.none()
-                        a_allow = a_deny = discord.Permissions.none()
-                    added_allow = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(a_allow, p) and not getattr(b_allow, p)]
-                    removed_allow = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(b_allow, p) and not getattr(a_allow, p)]
-                    added_deny = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(a_deny, p) and not getattr(b_deny, p)]
-                    removed_deny = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(b_deny, p) and not getattr(a_deny, p)]
-                    if added_allow or removed_allow or added_deny or removed_deny:
-                        change_parts = []
-                        if added_allow:
-                            change_parts.append(f"Allow aggiunti: {', '.join(added_allow)}")
-                        if removed_allow:
-                            change_parts.append(f"Allow rimossi: {', '.join(removed_allow)}")
-                        if added_deny:
-                            change_parts.append(f"Deny aggiunti: {', '.join(added_deny)}")
-                        if removed_deny:
-                            change_parts.append(f"Deny rimossi: {', '.join(removed_deny)}")
-                        changes.append(f"Modificato overwrite per {getattr(target, 'mention', str(target))}: {'; '.join(change_parts)}")
-            return '\n'.join(changes) if changes else ''
-
-        # Case 2: plain Permissions comparison for roles
+            return overwrites_diff(before_overwrites, after_overwrites)
         if isinstance(before_overwrites, discord.Permissions) and isinstance(after_overwrites, discord.Permissions):
-            added = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(after_overwrites, p) and not getattr(before_overwrites, p)]
-            removed = [p.replace('_', ' ') for p in discord.Permissions.VALID_FLAGS if getattr(before_overwrites, p) and not getattr(after_overwrites, p)]
-            return (', '.join(added) or 'Nessuno', ', '.join(removed) or 'Nessuno')
-
+            return permissions_diff(before_overwrites, after_overwrites)
         # Unknown types
         return ''
 
@@ -172,37 +222,40 @@ class LogCog(commands.Cog):
             if not channel:
                 return
 
-            cfg = embed_config
-            title = self._render_template(cfg.get('title', ''), **kwargs)
-            description = self._render_template(cfg.get('description', ''), **kwargs)
+            name = embed_config if isinstance(embed_config, str) else None
+            tpl = self._template(embed_config)
+            # Only what the template references gets computed (see templates.Lazy)
+            values = tpl.values(kwargs)
+            title = tpl.title.render(values)
+            description = tpl.description.render(values)
 
-            embed = discord.Embed(title=title or None, description=description or None, color=cfg.get('color', 0x00ff00))
+            embed = discord.Embed(title=title or None, description=description or None, color=tpl.color)
             embed.timestamp = datetime.now(timezone.utc)
-            if cfg.get('thumbnail'):
-                thumb = self._render_template(cfg.get('thumbnail'), **kwargs)
-                embed.set_thumbnail(url=thumb)
-            if cfg.get('author_header'):
+            if tpl.thumbnail:
+                thumb = tpl.thumbnail.render(values)
+                if thumb:
+                    embed.set_thumbnail(url=thumb)
+            if tpl.author_header:
                 try:
-                    icon_url = kwargs.get('author_icon', '')
+                    icon_url = resolve(kwargs.get('author_icon', ''))
                     if guild and guild.icon and not icon_url:
                         icon_url = guild.icon.url
-                    embed.set_author(name=kwargs.get('author_name', ''), icon_url=icon_url)
+                    embed.set_author(name=resolve(kwargs.get('author_name', '')), icon_url=icon_url)
                 except Exception:
                     pass
             elif guild and guild.icon:
                 embed.set_author(name=guild.name, icon_url=guild.icon.url)
-            if cfg.get('footer'):
-                footer = self._render_template(cfg.get('footer'), **kwargs)
-                embed.set_footer(text=footer)
+            if tpl.footer:
+                embed.set_footer(text=tpl.footer.render(values))
 
-            await channel.send(embed=embed)
+            await self.dispatcher.submit(channel, embed, self._priority(name, tpl.cfg))
         except Exception as e:
             logger.error(f'Errore in _send_log_embed: {e}')
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
         try:
-            cfg = self.log_config.get('join_message', {})
+            tpl = self._template('join_message')
             channel_id = self.log_config.get('join_log_channel_id') or self.config.get('join_log_channel_id')
             if not channel_id:
                 return
@@ -210,37 +263,36 @@ class LogCog(commands.Cog):
             if not channel:
                 return
 
-            joined_at = self._format_datetime(member.joined_at)
-            created_at = self._format_datetime(member.created_at)
-            mention = member.mention
-
-            title = cfg.get('title', '').replace('{mention}', mention).replace('{username}', member.name)
-            description = self._render_template(cfg.get('description', ''), mention=mention, joined_at=joined_at, created_at=created_at, username=member.name, total_members=str(member.guild.member_count))
-
-            embed = discord.Embed(title=title or None, description=description or None, color=cfg.get('color', 0x00ff00))
-            if cfg.get('thumbnail'):
-                thumb = cfg.get('thumbnail')
-                thumb = thumb.replace('{avatar}', member.display_avatar.url)
-                embed.set_thumbnail(url=thumb)
-            if cfg.get('author_header'):
+            values = tpl.values(dict(
+                mention=member.mention,
+                username=member.name,
+                id=member.id,
+                avatar=member.display_avatar.url,
+                total_members=member.guild.member_count,
+                joined_at=Lazy(lambda: self._format_datetime(member.joined_at)),
+                created_at=Lazy(lambda: self._format_datetime(member.created_at)),
+            ))
+
+            embed = discord.Embed(title=tpl.title.render(values) or None, description=tpl.description.render(values) or None, color=tpl.color)
+            if tpl.thumbnail:
+                embed.set_thumbnail(url=tpl.thumbnail.render(values))
+            if tpl.author_header:
                 try:
                     embed.set_author(name=member.name, icon_url=member.display_avatar.url)
                 except Exception:
                     pass
-            if cfg.get('footer'):
-                footer = cfg.get('footer')
-                footer = footer.replace('{id}', str(member.id)).replace('{total_members}', str(member.guild.member_count))
-                embed.set_footer(text=footer)
+            if tpl.footer:
+                embed.set_footer(text=tpl.footer.render(values))
 
             await asyncio.sleep(5)
-            await channel.send(embed=embed)
+            await self.dispatcher.submit(channel, embed, self._priority('join_message', tpl.cfg))
         except Exception as e:
             logger.error(f'Errore in on_member_join log cog: {e}')
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
         try:
-            cfg = self.log_config.get('leave_message', {})
+            tpl = self._template('leave_message')
             channel_id = self.log_config.get('leave_log_channel_id') or self.config.get('leave_log_channel_id')
             if not channel_id:
                 return
@@ -250,8 +302,6 @@ class LogCog(commands.Cog):
 
             left_dt = datetime.now(timezone.utc)
             left_at = self._format_datetime(left_dt)
-            created_at = self._format_datetime(member.created_at)
-            mention = member.mention
             roles = self._get_roles_str(member)
 
             time_in_server = 'Unknown'
@@ -265,23 +315,29 @@ class LogCog(commands.Cog):
             except Exception:
                 time_in_server = 'Unknown'
 
-            title = cfg.get('title', '').replace('{mention}', mention).replace('{username}', member.name)
-            description = self._render_template(cfg.get('description', ''), mention=mention, left_at=left_at, created_at=created_at, roles=roles, username=member.name, id=member.id, time_in_server=time_in_server)
-
-            embed = discord.Embed(title=title or None, description=description or None, color=cfg.get('color', 0xff0000))
-            if cfg.get('thumbnail'):
-                thumb = cfg.get('thumbnail')
-                thumb = thumb.replace('{avatar}', member.display_avatar.url)
-                embed.set_thumbnail(url=thumb)
-            if cfg.get('author_header'):
+            values = tpl.values(dict(
+                mention=member.mention,
+                username=member.name,
+                id=member.id,
+                avatar=member.display_avatar.url,
+                total_members=member.guild.member_count,
+                left_at=left_at,
+                created_at=Lazy(lambda: self._format_datetime(member.created_at)),
+                roles=roles,
+                time_in_server=time_in_server,
+            ))
+
+            embed = discord.Embed(title=tpl.title.render(values) or None, description=tpl.description.render(values) or None,
+                                  color=tpl.cfg.get('color', 0xff0000))
+            if tpl.thumbnail:
+                embed.set_thumbnail(url=tpl.thumbnail.render(values))
+            if tpl.author_header:
                 try:
                     embed.set_author(name=member.name, icon_url=member.display_avatar.url)
                 except Exception:
                     pass
-            if cfg.get('footer'):
-                footer = cfg.get('footer')
-                footer = footer.replace('{id}', str(member.id)).replace('{total_members}', str(member.guild.member_count))
-                embed.set_footer(text=footer)
+            if tpl.footer:
+                embed.set_footer(text=tpl.footer.render(values))
 
             embed.add_field(name='Ruoli', value=roles, inline=False)
             embed.add_field(name='ID Utente', value=str(member.id), inline=True)
@@ -289,25 +345,21 @@ class LogCog(commands.Cog):
             embed.add_field(name='Tempo nel server', value=time_in_server, inline=True)
 
             await asyncio.sleep(5)
-            await channel.send(embed=embed)
+            await self.dispatcher.submit(channel, embed, self._priority('leave_message', tpl.cfg))
         except Exception as e:
             logger.error(f'Errore in on_member_remove log cog: {e}')
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, user: discord.User):
         try:
-            staffer = await self._get_audit_user(discord.AuditLogAction.ban, user.id, guild)
-            async for entry in guild.audit_logs(action=discord.AuditLogAction.ban, limit=1):
-                if entry.target.id == user.id:
-                    reason = entry.reason or 'Nessuna ragione'
-                    break
-            else:
-                reason = 'Nessuna ragione'
+            entry = await self.audit.lookup(guild, discord.AuditLogAction.ban, user.id)
+            staffer = entry_user_mention(entry)
+            reason = (entry.reason if entry else None) or 'Nessuna ragione'
 
             logger.info(f'Member banned: {user.name} ({user.id}) by {staffer} - Reason: {reason}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('ban_message', {}),
+                'ban_message',
                 guild=guild,
                 mention=user.mention,
                 id=user.id,
@@ -329,7 +381,7 @@ class LogCog(commands.Cog):
             logger.info(f'Member unbanned: {user.name} ({user.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('unban_message', {}),
+                'unban_message',
                 guild=guild,
                 mention=user.mention,
                 id=user.id,
@@ -380,7 +432,7 @@ class LogCog(commands.Cog):
 
                 await self._send_log_embed(
                     self.log_config.get("moderation_log_channel_id"),
-                    self.log_config.get("channel_update_message", {}),
+                    "channel_update_message",
                     guild=after.guild,
                     channel=after.mention,
                     id=after.id,
@@ -397,11 +449,16 @@ class LogCog(commands.Cog):
         try:
             if before.permissions != after.permissions:
                 staffer = await self._get_audit_user(discord.AuditLogAction.role_update, after.id, after.guild)
-                added_perms, removed_perms = self._format_permissions_diff(before.permissions, after.permissions)
-                logger.info(f'Role permissions updated: {after.name} ({after.id}) by {staffer} - Added: {added_perms}, Removed: {removed_perms}')
+                added_perms = removed_perms = ''
+                # The diff only matters if the message shows it
+                if self._needs('role_permission_update_message', 'added_perms', 'removed_perms'):
+                    added_perms, removed_perms = self._format_permissions_diff(before.permissions, after.permissions)
+                    logger.info(f'Role permissions updated: {after.name} ({after.id}) by {staffer} - Added: {added_perms}, Removed: {removed_perms}')
+                else:
+                    logger.info(f'Role permissions updated: {after.name} ({after.id}) by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('role_permission_update_message', {}),
+                    'role_permission_update_message',
                     guild=after.guild,
                     role=after.mention,
                     id=after.id,
@@ -418,23 +475,23 @@ class LogCog(commands.Cog):
         try:
             if before.is_timed_out() != after.is_timed_out():
                 if after.is_timed_out():
-                    staffer = await self._get_audit_user(discord.AuditLogAction.member_update, after.id, after.guild)
-                    async for entry in after.guild.audit_logs(action=discord.AuditLogAction.member_update, limit=5):
-                        if entry.target.id == after.id and entry.after.timed_out_until is not None:
-                            reason = entry.reason or 'Nessuna ragione'
-                            duration = 'Unknown'
-                            if entry.after.timed_out_until:
-                                delta = entry.after.timed_out_until - datetime.now(timezone.utc)
-                                duration = self._format_timedelta(delta)
-                            break
-                    else:
-                        reason = 'Nessuna ragione'
-                        duration = 'Unknown'
+                    entry = await self.audit.lookup(
+                        after.guild, discord.AuditLogAction.member_update, after.id,
+                        predicate=lambda e: getattr(e.after, 'timed_out_until', None) is not None,
+                        # A timeout always has an entry, unlike other member updates
+                        wait=self.audit.wait
+                    )
+                    staffer = entry_user_mention(entry)
+                    reason = (entry.reason if entry else None) or 'Nessuna ragione'
+                    duration = 'Unknown'
+                    if entry is not None:
+                        delta = entry.after.timed_out_until - datetime.now(timezone.utc)
+                        duration = self._format_timedelta(delta)
 
                     logger.info(f'Member muted: {after.name} ({after.id}) by {staffer} - Reason: {reason}, Duration: {duration}')
                     await self._send_log_embed(
                         self.log_config.get('moderation_log_channel_id'),
-                        self.log_config.get('mute_message', {}),
+                        'mute_message',
                         guild=after.guild,
                         mention=after.mention,
                         id=after.id,
@@ -451,7 +508,7 @@ class LogCog(commands.Cog):
                     logger.info(f'Member unmuted: {after.name} ({after.id}) by {staffer}')
                     await self._send_log_embed(
                         self.log_config.get('moderation_log_channel_id'),
-                        self.log_config.get('unmute_message', {}),
+                        'unmute_message',
                         guild=after.guild,
                         mention=after.mention,
                         id=after.id,
@@ -467,7 +524,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Member nickname changed: {after.name} ({after.id}) by {staffer} - New nick: {new_nick}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('nick_message', {}),
+                    'nick_message',
                     guild=after.guild,
                     mention=after.mention,
                     id=after.id,
@@ -489,7 +546,7 @@ class LogCog(commands.Cog):
                     logger.info(f'Member roles changed: {after.name} ({after.id}) by {staffer} - Added: {added_str}, Removed: {removed_str}')
                     await self._send_log_embed(
                         self.log_config.get('moderation_log_channel_id'),
-                        self.log_config.get('role_change_message', {}),
+                        'role_change_message',
                         guild=after.guild,
                         mention=after.mention,
                         id=after.id,
@@ -505,7 +562,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Member boosted: {after.name} ({after.id})')
                 await self._send_log_embed(
                     self.log_config.get('boost_log_channel_id'),
-                    self.log_config.get('boost_message', {}),
+                    'boost_message',
                     guild=after.guild,
                     mention=after.mention,
                     id=after.id,
@@ -522,11 +579,12 @@ class LogCog(commands.Cog):
         try:
             if message.author.bot:
                 return
+            self.archive.pop(message.channel.id, message.id)
             content = message.content or 'Nessun contenuto'
             logger.info(f'Message deleted: {message.author.name} ({message.author.id}) in {message.channel.name} - Content: {content[:100]}...')
             await self._send_log_embed(
                 self.log_config.get('message_log_channel_id'),
-                self.log_config.get('message_delete_message', {}),
+                'message_delete_message',
                 guild=message.guild,
                 mention=message.author.mention,
                 id=message.author.id,
@@ -550,7 +608,7 @@ class LogCog(commands.Cog):
             logger.info(f'Message edited: {before.author.name} ({before.author.id}) in {before.channel.name} - Old: {old_content[:50]}..., New: {new_content[:50]}...')
             await self._send_log_embed(
                 self.log_config.get('message_log_channel_id'),
-                self.log_config.get('message_edit_message', {}),
+                'message_edit_message',
                 guild=before.guild,
                 mention=before.author.mention,
                 id=before.author.id,
@@ -565,10 +623,147 @@ class LogCog(commands.Cog):
         except Exception as e:
             logger.error(f'Errore in on_message_edit: {e}')
 
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild is None or message.author.bot:
+            return
+        try:
+            self.archive.add(message.guild.id, ArchivedMessage.from_message(message))
+        except Exception:
+            pass
+
+    def _archived_author(self, guild: discord.Guild, author_id: int):
+        """(mention, name, avatar) of an archived message's author."""
+        user = guild.get_member(author_id) or self.bot.get_user(author_id)
+        if user is None:
+            return f'<@{author_id}>', str(author_id), ''
+        return user.mention, user.name, user.display_avatar.url
+
+    def _archived_content(self, record: ArchivedMessage, limit: int) -> str:
+        content = record.content or 'Nessun contenuto'
+        content = content[:limit] + ('...' if len(content) > limit else '')
+        if record.attachments:
+            content += '\n📎 ' + ', '.join(record.attachments)
+        return content
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        # Cached messages are logged by on_message_delete
+        if payload.cached_message is not None or payload.guild_id is None:
+            return
+        try:
+            guild = self.bot.get_guild(payload.guild_id)
+            record = await self.archive.get(payload.guild_id, payload.channel_id, payload.message_id)
+            self.archive.pop(payload.channel_id, payload.message_id)
+            if guild is None or record is None:
+                return
+            mention, name, avatar = self._archived_author(guild, record.author_id)
+            logger.info(f'Message deleted (uncached): {name} ({record.author_id}) in {payload.channel_id} - Content: {record.content[:100]}...')
+            await self._send_log_embed(
+                self.log_config.get('message_log_channel_id'),
+                'message_delete_message',
+                guild=guild,
+                mention=mention,
+                id=record.author_id,
+                avatar=avatar,
+                author_name=name,
+                author_icon=avatar,
+                total_members=guild.member_count,
+                channel=f'<#{payload.channel_id}>',
+                content=self._archived_content(record, 1000)
+            )
+        except Exception as e:
+            logger.error(f'Errore in on_raw_message_delete: {e}')
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # Embed-only updates carry no content
+        if payload.guild_id is None or 'content' not in payload.data:
+            return
+        try:
+            new_content = payload.data.get('content') or ''
+            cached = payload.cached_message
+            if cached is not None:
+                # on_message_edit logs it; just keep the archive current
+                if not cached.author.bot:
+                    self.archive.add(payload.guild_id, ArchivedMessage.from_message(cached)._replace(content=new_content))
+                return
+            if (payload.data.get('author') or {}).get('bot'):
+                return
+            record = await self.archive.get(payload.guild_id, payload.channel_id, payload.message_id)
+            if record is None or record.content == new_content:
+                return
+            self.archive.add(payload.guild_id, record._replace(content=new_content))
+            guild = self.bot.get_guild(payload.guild_id)
+            if guild is None:
+                return
+            mention, name, avatar = self._archived_author(guild, record.author_id)
+            old_content = record.content or 'Nessun contenuto'
+            new_content = new_content or 'Nessun contenuto'
+            logger.info(f'Message edited (uncached): {name} ({record.author_id}) in {payload.channel_id} - Old: {old_content[:50]}..., New: {new_content[:50]}...')
+            await self._send_log_embed(
+                self.log_config.get('message_log_channel_id'),
+                'message_edit_message',
+                guild=guild,
+                mention=mention,
+                id=record.author_id,
+                avatar=avatar,
+                author_name=name,
+                author_icon=avatar,
+                total_members=guild.member_count,
+                channel=f'<#{payload.channel_id}>',
+                old_content=old_content[:500] + ('...' if len(old_content) > 500 else ''),
+                new_content=new_content[:500] + ('...' if len(new_content) > 500 else '')
+            )
+        except Exception as e:
+            logger.error(f'Errore in on_raw_message_edit: {e}')
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id is None:
+            return
+        try:
+            records = {m.id: ArchivedMessage.from_message(m) for m in payload.cached_messages if not m.author.bot}
+            cached_ids = {m.id for m in payload.cached_messages}
+            missing = [mid for mid in payload.message_ids if mid not in cached_ids]
+            records.update(await self.archive.get_many(payload.guild_id, payload.channel_id, missing))
+            for mid in payload.message_ids:
+                self.archive.pop(payload.channel_id, mid)
+            guild = self.bot.get_guild(payload.guild_id)
+            if guild is None:
+                return
+
+            lines, size = [], 0
+            for mid in sorted(records):
+                record = records[mid]
+                line = f'<@{record.author_id}>: {self._archived_content(record, 100)}'
+                if size + len(line) > 3500:
+                    break
+                lines.append(line)
+                size += len(line) + 1
+            if len(lines) < len(records):
+                lines.append(f'... e altri {len(records) - len(lines)}')
+            unknown = len(payload.message_ids) - len(records) - len(cached_ids - records.keys())
+            if unknown > 0:
+                lines.append(f'{unknown} messaggi senza contenuto in archivio')
+
+            logger.info(f'Bulk delete: {len(payload.message_ids)} messages in {payload.channel_id}, {len(records)} with content')
+            await self._send_log_embed(
+                self.log_config.get('message_log_channel_id'),
+                'bulk_delete_message',
+                guild=guild,
+                count=len(payload.message_ids),
+                channel=f'<#{payload.channel_id}>',
+                total_members=guild.member_count,
+                messages='\n'.join(lines)
+            )
+        except Exception as e:
+            logger.error(f'Errore in on_raw_bulk_message_delete: {e}')
+
     async def log_warn(self, member: discord.Member, reason: str, staffer: str, total_warns: int):
         await self._send_log_embed(
             self.log_config.get('moderation_log_channel_id'),
-            self.log_config.get('warn_message', {}),
+            'warn_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -583,7 +778,7 @@ class LogCog(commands.Cog):
     async def log_unwarn(self, member: discord.Member, warn_id: int, staffer: str):
         await self._send_log_embed(
             self.log_config.get('moderation_log_channel_id'),
-            self.log_config.get('unwarn_message', {}),
+            'unwarn_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -597,7 +792,7 @@ class LogCog(commands.Cog):
     async def log_clearwarns(self, member: discord.Member, count: int, staffer: str):
         await self._send_log_embed(
             self.log_config.get('moderation_log_channel_id'),
-            self.log_config.get('clearwarns_message', {}),
+            'clearwarns_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -611,7 +806,7 @@ class LogCog(commands.Cog):
     async def log_ticket_open(self, member: discord.Member, channel: str, number: str, category: str):
         await self._send_log_embed(
             self.log_config.get('ticket_log_channel_id'),
-            self.log_config.get('ticket_open_message', {}),
+            'ticket_open_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -626,7 +821,7 @@ class LogCog(commands.Cog):
     async def log_ticket_close(self, channel_name: str, opener: str, staffer: str, number: str):
         await self._send_log_embed(
             self.log_config.get('ticket_log_channel_id'),
-            self.log_config.get('ticket_close_message', {}),
+            'ticket_close_message',
             name=channel_name,
             opener=opener,
             staffer=staffer,
@@ -637,7 +832,7 @@ class LogCog(commands.Cog):
     async def log_ticket_rename(self, channel_mention: str, new_name: str, number: str, staffer: str):
         await self._send_log_embed(
             self.log_config.get('ticket_log_channel_id'),
-            self.log_config.get('ticket_rename_message', {}),
+            'ticket_rename_message',
             channel=channel_mention,
             new_name=new_name,
             number=number,
@@ -648,7 +843,7 @@ class LogCog(commands.Cog):
     async def log_ticket_add(self, member: discord.Member, channel: str, number: str, staffer: str):
         await self._send_log_embed(
             self.log_config.get('ticket_log_channel_id'),
-            self.log_config.get('ticket_add_message', {}),
+            'ticket_add_message',
             member=member.mention,
             channel=channel,
             number=number,
@@ -663,7 +858,7 @@ class LogCog(commands.Cog):
     async def log_ticket_remove(self, member: discord.Member, channel: str, number: str, staffer: str):
         await self._send_log_embed(
             self.log_config.get('ticket_log_channel_id'),
-            self.log_config.get('ticket_remove_message', {}),
+            'ticket_remove_message',
             member=member.mention,
             channel=channel,
             number=number,
@@ -678,7 +873,7 @@ class LogCog(commands.Cog):
     async def log_autorole_add(self, member: discord.Member, role: discord.Role):
         await self._send_log_embed(
             self.log_config.get('autorole_log_channel_id'),
-            self.log_config.get('autorole_add_message', {}),
+            'autorole_add_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -691,7 +886,7 @@ class LogCog(commands.Cog):
     async def log_autorole_remove(self, member: discord.Member, role: discord.Role):
         await self._send_log_embed(
             self.log_config.get('autorole_log_channel_id'),
-            self.log_config.get('autorole_remove_message', {}),
+            'autorole_remove_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -704,7 +899,7 @@ class LogCog(commands.Cog):
     async def log_automod_mute(self, member: discord.Member, duration: str, reason: str):
         await self._send_log_embed(
             self.log_config.get('automod_log_channel_id'),
-            self.log_config.get('automod_mute_message', {}),
+            'automod_mute_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -718,7 +913,7 @@ class LogCog(commands.Cog):
     async def log_automod_warn(self, member: discord.Member, word: str):
         await self._send_log_embed(
             self.log_config.get('automod_log_channel_id'),
-            self.log_config.get('automod_warn_message', {}),
+            'automod_warn_message',
             mention=member.mention,
             id=member.id,
             avatar=member.display_avatar.url,
@@ -735,7 +930,7 @@ class LogCog(commands.Cog):
             logger.info(f'Channel created: {channel.name} ({channel.id}) by {staffer} - Type: {self._get_channel_type_name(channel)}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('channel_create_message', {}),
+                'channel_create_message',
                 guild=channel.guild,
                 channel=channel.mention,
                 id=channel.id,
@@ -753,7 +948,7 @@ class LogCog(commands.Cog):
             logger.info(f'Channel deleted: {channel.name} ({channel.id}) by {staffer} - Type: {self._get_channel_type_name(channel)}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('channel_delete_message', {}),
+                'channel_delete_message',
                 guild=channel.guild,
                 name=channel.name,
                 id=channel.id,
@@ -771,7 +966,7 @@ class LogCog(commands.Cog):
             logger.info(f'Thread created: {thread.name} ({thread.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('thread_create_message', {}),
+                'thread_create_message',
                 guild=thread.guild,
                 thread=thread.mention,
                 id=thread.id,
@@ -788,7 +983,7 @@ class LogCog(commands.Cog):
             logger.info(f'Thread deleted: {thread.name} ({thread.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('thread_delete_message', {}),
+                'thread_delete_message',
                 guild=thread.guild,
                 name=thread.name,
                 id=thread.id,
@@ -814,7 +1009,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Thread updated: {after.name} ({after.id}) by {staffer} - Changes: {", ".join(changes)}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('thread_update_message', {}),
+                    'thread_update_message',
                     guild=after.guild,
                     thread=after.mention,
                     id=after.id,
@@ -832,7 +1027,7 @@ class LogCog(commands.Cog):
             logger.info(f'Webhook created: {webhook.name} ({webhook.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('webhook_create_message', {}),
+                'webhook_create_message',
                 guild=webhook.guild,
                 name=webhook.name,
                 id=webhook.id,
@@ -849,7 +1044,7 @@ class LogCog(commands.Cog):
             logger.info(f'Webhook deleted: {webhook.name} ({webhook.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('webhook_delete_message', {}),
+                'webhook_delete_message',
                 guild=webhook.guild,
                 name=webhook.name,
                 id=webhook.id,
@@ -873,7 +1068,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Webhook updated: {after.name} ({after.id}) by {staffer} - Changes: {", ".join(changes)}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('webhook_update_message', {}),
+                    'webhook_update_message',
                     guild=after.guild,
                     name=after.name,
                     id=after.id,
@@ -896,7 +1091,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Emoji added: {", ".join([e.name for e in added])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('emoji_create_message', {}),
+                    'emoji_create_message',
                     guild=guild,
                     emojis=', '.join([str(e) for e in added]),
                     staffer=staffer,
@@ -907,7 +1102,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Emoji removed: {", ".join([e.name for e in removed])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('emoji_delete_message', {}),
+                    'emoji_delete_message',
                     guild=guild,
                     emojis=', '.join([e.name for e in removed]),
                     staffer=staffer,
@@ -918,7 +1113,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Emoji updated: {", ".join([e.name for e in updated])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('emoji_update_message', {}),
+                    'emoji_update_message',
                     guild=guild,
                     emojis=', '.join([str(e) for e in updated]),
                     staffer=staffer,
@@ -939,7 +1134,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Sticker added: {", ".join([s.name for s in added])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('sticker_create_message', {}),
+                    'sticker_create_message',
                     guild=guild,
                     stickers=', '.join([s.name for s in added]),
                     staffer=staffer,
@@ -950,7 +1145,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Sticker removed: {", ".join([s.name for s in removed])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('sticker_delete_message', {}),
+                    'sticker_delete_message',
                     guild=guild,
                     stickers=', '.join([s.name for s in removed]),
                     staffer=staffer,
@@ -961,7 +1156,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Sticker updated: {", ".join([s.name for s in updated])} by {staffer}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('sticker_update_message', {}),
+                    'sticker_update_message',
                     guild=guild,
                     stickers=', '.join([s.name for s in updated]),
                     staffer=staffer,
@@ -977,7 +1172,7 @@ class LogCog(commands.Cog):
             logger.info(f'Role created: {role.name} ({role.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('role_create_message', {}),
+                'role_create_message',
                 guild=role.guild,
                 role=role.mention,
                 id=role.id,
@@ -994,7 +1189,7 @@ class LogCog(commands.Cog):
             logger.info(f'Role deleted: {role.name} ({role.id}) by {staffer}')
             await self._send_log_embed(
                 self.log_config.get('moderation_log_channel_id'),
-                self.log_config.get('role_delete_message', {}),
+                'role_delete_message',
                 guild=role.guild,
                 name=role.name,
                 id=role.id,
@@ -1028,7 +1223,7 @@ class LogCog(commands.Cog):
                 logger.info(f'Guild updated: {after.name} ({after.id}) by {staffer} - Changes: {", ".join(changes)}')
                 await self._send_log_embed(
                     self.log_config.get('moderation_log_channel_id'),
-                    self.log_config.get('guild_update_message', {}),
+                    'guild_update_message',
                     guild=after,
                     name=after.name,
                     id=after.id,
@@ -1047,7 +1242,7 @@ class LogCog(commands.Cog):
                     logger.info(f'Voice join: {member.name} ({member.id}) joined {after.channel.name}')
                     await self._send_log_embed(
                         self.log_config.get('voice_log_channel_id'),
-                        self.log_config.get('vc_join_message', {}),
+                        'vc_join_message',
                         guild=member.guild,
                         mention=member.mention,
                         id=member.id,
@@ -1061,7 +1256,7 @@ class LogCog(commands.Cog):
                     logger.info(f'Voice leave: {member.name} ({member.id}) left {before.channel.name}')
                     await self._send_log_embed(
                         self.log_config.get('voice_log_channel_id'),
-                        self.log_config.get('vc_leave_message', {}),
+                        'vc_leave_message',
                         guild=member.guild,
                         mention=member.mention,
                         id=member.id,
@@ -1075,7 +1270,7 @@ class LogCog(commands.Cog):
                     logger.info(f'Voice move: {member.name} ({member.id}) moved from {before.channel.name} to {after.channel.name}')
                     await self._send_log_embed(
                         self.log_config.get('voice_log_channel_id'),
-                        self.log_config.get('vc_move_message', {}),
+                        'vc_move_message',
                         guild=member.guild,
                         mention=member.mention,
                         id=member.id,
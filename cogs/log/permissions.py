@@ -0,0 +1,102 @@
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import discord
+
+# Max lines in an overwrite summary before the rest is collapsed
+MAX_LINES = 15
+
+_NAMES: Optional[Dict[int, str]] = None
+
+
+def _names() -> Dict[int, str]:
+    """bit -> readable flag name, built once from discord.Permissions."""
+    global _NAMES
+    if _NAMES is None:
+        names = {}
+        for flag, bit in discord.Permissions.VALID_FLAGS.items():
+            # Aliases share a bit; keep the first (canonical) name
+            names.setdefault(bit, flag.replace('_', ' '))
+        _NAMES = names
+    return _NAMES
+
+
+def flag_names(value: int) -> List[str]:
+    """Names of the set bits of a permission value, lowest bit first."""
+    names = _names()
+    out = []
+    while value:
+        low = value & -value
+        name = names.get(low)
+        if name is not None:
+            out.append(name)
+        value ^= low
+    return out
+
+
+def _joined(value: int) -> str:
+    return ', '.join(flag_names(value)) or 'Nessuno'
+
+
+def diff(before: int, after: int) -> Tuple[int, int]:
+    """(added, removed) bits between two permission values."""
+    changed = before ^ after
+    return changed & after, changed & before
+
+
+def _pair(overwrite) -> Tuple[int, int]:
+    try:
+        allow, deny = overwrite.pair()
+        return allow.value, deny.value
+    except Exception:
+        return 0, 0
+
+
+def permissions_diff(before: discord.Permissions, after: discord.Permissions) -> Tuple[str, str]:
+    """Role permission change as (added, removed) name lists."""
+    added, removed = diff(before.value, after.value)
+    return _joined(added), _joined(removed)
+
+
+def overwrites_diff(before: Mapping, after: Mapping) -> str:
+    """Summary of a channel's permission overwrite changes.
+
+    Each target costs two int compares when nothing changed. Targets with
+    the very same change (typical of a category sync) share one line, and
+    the summary stops at MAX_LINES.
+    """
+    grouped: Dict[str, List[str]] = {}
+    for target in sorted(set(before) | set(after), key=lambda t: getattr(t, 'id', 0)):
+        b_over = before.get(target)
+        a_over = after.get(target)
+        if b_over is None and a_over is None:
+            continue
+        if b_over is None:
+            allow, deny = _pair(a_over)
+            if not allow and not deny:
+                continue
+            key = f'Aggiunto overwrite per {{}}: Allow {_joined(allow)}, Deny {_joined(deny)}'
+        elif a_over is None:
+            key = 'Rimosso overwrite per {}'
+        else:
+            b_allow, b_deny = _pair(b_over)
+            a_allow, a_deny = _pair(a_over)
+            if b_allow == a_allow and b_deny == a_deny:
+                continue
+            added_allow, removed_allow = diff(b_allow, a_allow)
+            added_deny, removed_deny = diff(b_deny, a_deny)
+            parts = []
+            if added_allow:
+                parts.append(f'Allow aggiunti: {_joined(added_allow)}')
+            if removed_allow:
+                parts.append(f'Allow rimossi: {_joined(removed_allow)}')
+            if added_deny:
+                parts.append(f'Deny aggiunti: {_joined(added_deny)}')
+            if removed_deny:
+                parts.append(f'Deny rimossi: {_joined(removed_deny)}')
+            key = 'Modificato overwrite per {}: ' + '; '.join(parts)
+        grouped.setdefault(key, []).append(getattr(target, 'mention', str(target)))
+
+    lines = [key.format(', '.join(targets)) for key, targets in grouped.items()]
+    if len(lines) > MAX_LINES:
+        lines = lines[:MAX_LINES] + [f'... e altre {len(lines) - MAX_LINES} modifiche']
+    return '\n'.join(lines)
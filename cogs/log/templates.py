@@ -0,0 +1,88 @@
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple, Union
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+
+
+class Lazy:
+    """Template value computed only if a template actually references it."""
+    __slots__ = ('fn',)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+
+def resolve(value: Any) -> Any:
+    return value.fn() if isinstance(value, Lazy) else value
+
+
+class Template:
+    """A log.json string split once into literals and {placeholder} slots.
+
+    render() joins the pieces in one pass. Placeholders without a value are
+    left as written (like the old per-key str.replace did), and a string
+    with no placeholders is returned as is.
+    """
+    __slots__ = ('text', 'parts', 'fields')
+
+    def __init__(self, text: Optional[str]):
+        self.text = text or ''
+        parts: List[Union[str, Tuple[str]]] = []
+        pos = 0
+        for m in _PLACEHOLDER.finditer(self.text):
+            if m.start() > pos:
+                parts.append(self.text[pos:m.start()])
+            parts.append((m.group(1),))
+            pos = m.end()
+        if pos < len(self.text):
+            parts.append(self.text[pos:])
+        self.parts = parts
+        self.fields: FrozenSet[str] = frozenset(p[0] for p in parts if isinstance(p, tuple))
+
+    def __bool__(self) -> bool:
+        return bool(self.text)
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        if not self.fields:
+            return self.text
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part[0] in values:
+                out.append(str(values[part[0]]))
+            else:
+                out.append('{' + part[0] + '}')
+        return ''.join(out)
+
+
+class EmbedTemplate:
+    """Compiled embed config of one log message (title, description, ...)."""
+
+    TEXT_KEYS = ('title', 'description', 'thumbnail', 'footer')
+
+    def __init__(self, cfg: Mapping[str, Any]):
+        cfg = cfg or {}
+        self.cfg = cfg
+        self.title = Template(cfg.get('title'))
+        self.description = Template(cfg.get('description'))
+        self.thumbnail = Template(cfg.get('thumbnail'))
+        self.footer = Template(cfg.get('footer'))
+        self.color = cfg.get('color', 0x00ff00)
+        self.author_header = bool(cfg.get('author_header'))
+        self.fields: FrozenSet[str] = frozenset().union(*(getattr(self, k).fields for k in self.TEXT_KEYS))
+
+    def needs(self, *names: str) -> bool:
+        return any(name in self.fields for name in names)
+
+    def values(self, kwargs: Mapping[str, Any]) -> Dict[str, Any]:
+        """The kwargs this template uses, with Lazy ones computed once."""
+        return {name: resolve(kwargs[name]) for name in self.fields if name in kwargs}
+
+
+def compile_templates(log_config: Mapping[str, Any]) -> Dict[str, EmbedTemplate]:
+    return {
+        name: EmbedTemplate(cfg)
+        for name, cfg in (log_config or {}).items()
+        if isinstance(cfg, dict) and any(k in cfg for k in EmbedTemplate.TEXT_KEYS)
+    }
@@ -7,9 +7,10 @@ import re
 from discord import app_commands
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
 from console_logger import logger
+from json_store import write_json_nowait
+from config_store import get_config
 
 BASE_DIR = os.path.dirname(__file__)
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'config.json')
 MOD_JSON = os.path.join(BASE_DIR, 'moderation.json')
 WARNS_JSON = os.path.join(BASE_DIR, 'warns.json')
 USER_WORDS_JSON = os.path.join(BASE_DIR, 'user_words.json')
@@ -17,8 +18,7 @@ USER_WORDS_JSON = os.path.join(BASE_DIR, 'user_words.json')
 class ModerationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
+        self.config = get_config()
         # Load moderation.json (fall back to root if migrating)
         if os.path.exists(MOD_JSON):
             with open(MOD_JSON, 'r', encoding='utf-8') as f:
@@ -27,8 +27,7 @@ class ModerationCog(commands.Cog):
             with open('moderation.json', 'r', encoding='utf-8') as f:
                 self.moderation_words = json.load(f)
             try:
-                with open(MOD_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.moderation_words, f, indent=2, ensure_ascii=False)
+                write_json_nowait(MOD_JSON, self.moderation_words, pretty=True)
             except Exception:
                 pass
         else:
@@ -43,8 +42,7 @@ class ModerationCog(commands.Cog):
             with open('warns.json', 'r', encoding='utf-8') as f:
                 self.warns_data = json.load(f)
             try:
-                with open(WARNS_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.warns_data, f, indent=2, ensure_ascii=False)
+                write_json_nowait(WARNS_JSON, self.warns_data)
             except Exception:
                 pass
 
@@ -57,28 +55,23 @@ class ModerationCog(commands.Cog):
             with open('user_words.json', 'r', encoding='utf-8') as f:
                 self.user_words = json.load(f)
             try:
-                with open(USER_WORDS_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.user_words, f, indent=2, ensure_ascii=False)
+                write_json_nowait(USER_WORDS_JSON, self.user_words)
             except Exception:
                 pass
 
     def save_warns(self):
-        with open(WARNS_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.warns_data, f, indent=2, ensure_ascii=False)
+        write_json_nowait(WARNS_JSON, self.warns_data)
 
     def save_user_words(self):
-        with open(USER_WORDS_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.user_words, f, indent=2, ensure_ascii=False)
+        write_json_nowait(USER_WORDS_JSON, self.user_words)
 
     def reload_mod(self):
         with open(MOD_JSON, 'r', encoding='utf-8') as f:
             self.moderation_words = json.load(f)
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
 
     def reload_config(self):
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
+        # config.json is shared through the ConfigStore and reloaded by index.py
+        self.config = get_config()
 
     def get_user_warns(self, user_id):
         return [w for w in self.warns_data["warns"].values() if w["user_id"] == str(user_id)]
@@ -5,6 +5,7 @@ import json
 import os
 from console_logger import logger
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
+from json_store import write_json_nowait
 
 BASE_DIR = os.path.dirname(__file__)
 RULES_JSON = os.path.join(BASE_DIR, 'regole.json')
@@ -34,8 +35,7 @@ class RulesCog(commands.Cog):
             with open('regole.json', 'r', encoding='utf-8') as f:
                 self.rules_config = json.load(f)
             try:
-                with open(self.config_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.rules_config, f, indent=2, ensure_ascii=False)
+                write_json_nowait(self.config_file, self.rules_config, pretty=True)
             except Exception:
                 pass
         else:
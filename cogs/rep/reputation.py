@@ -6,7 +6,7 @@ import os
 import time
 from typing import Optional
 
-from json_store import load_json, save_json
+from json_store import load_shard, save_shard
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')), 'data', 'reputation.json')
@@ -80,9 +80,8 @@ class ReputationCog(commands.Cog):
             # Apply rep with same JSON logic as slash
             now = int(time.time())
             cfg = self.config
-            data = await load_json(DATA_PATH, {})
             gid = str(message.guild.id)
-            g = data.get(gid, {"totals": {}, "logs": []})
+            g = await load_shard(DATA_PATH, gid, {"totals": {}, "logs": []})
             logs = g.get('logs', [])
             cooldown = int(cfg.get('cooldown_seconds', 43200))
             last_entry = next((log for log in reversed(logs) if log.get('from') == int(message.author.id) and log.get('to') == int(target.id)), None)
@@ -107,8 +106,7 @@ class ReputationCog(commands.Cog):
                 'created_at': now
             })
             g['logs'] = logs
-            data[gid] = g
-            await save_json(DATA_PATH, data)
+            await save_shard(DATA_PATH, gid, g, changes=[('totals', str(target.id)), ('logs', len(logs) - 1)])
             msg = cfg['messages']['given'].format(from_user=message.author.mention, delta=('+' if delta>0 else '')+str(delta), to_user=target.mention, reason=(reason or 'nessun motivo'), total=new_total)
             await message.reply(msg)
             ch_id = cfg.get('log_channel_id')
@@ -142,9 +140,8 @@ class ReputationCog(commands.Cog):
     @app_commands.describe(user='Utente (opzionale)')
     async def rep_show(self, interaction: discord.Interaction, user: Optional[discord.Member] = None):
         member = user or interaction.user
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
-        totals = data.get(gid, {}).get('totals', {})
+        totals = (await load_shard(DATA_PATH, gid, {})).get('totals', {})
         total = int(totals.get(str(member.id), 0))
         await interaction.response.send_message(self.config['messages']['show'].format(user=member.mention, total=total))
 
@@ -154,9 +151,8 @@ class ReputationCog(commands.Cog):
             return
         now = int(time.time())
         cfg = self.config
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
-        g = data.get(gid, {"totals": {}, "logs": []})
+        g = await load_shard(DATA_PATH, gid, {"totals": {}, "logs": []})
         logs = g.get('logs', [])
         # cooldown per coppia (from -> to)
         cooldown = int(cfg.get('cooldown_seconds', 43200))
@@ -184,8 +180,7 @@ class ReputationCog(commands.Cog):
             'created_at': now
         })
         g['logs'] = logs
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('totals', str(user.id)), ('logs', len(logs) - 1)])
         msg = cfg['messages']['given'].format(from_user=interaction.user.mention, delta=('+' if delta>0 else '')+str(delta), to_user=user.mention, reason=(reason or 'nessun motivo'), total=new_total)
         await interaction.response.send_message(msg)
         # log channel
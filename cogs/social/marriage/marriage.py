@@ -7,7 +7,7 @@ import time
 from typing import Optional
 
 from bot_utils import owner_or_has_permissions
-from json_store import load_json, save_json
+from json_store import load_shard, save_shard
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')), 'data', 'marriages.json')
@@ -34,9 +34,8 @@ def load_config():
 
 
 async def is_user_married_json(guild_id: int, user_id: int):
-    data = await load_json(DATA_PATH, {})
     gid = str(guild_id)
-    pairs = data.get(gid, {}).get('pairs', [])
+    pairs = (await load_shard(DATA_PATH, gid, {})).get('pairs', [])
     for p in pairs:
         a = int(p.get('a'))
         b = int(p.get('b'))
@@ -98,14 +97,12 @@ class MarriageCog(commands.Cog):
         if view.result is True:
             started = int(time.time())
             a, b = sorted((interaction.user.id, user.id))
-            data = await load_json(DATA_PATH, {})
             gid = str(interaction.guild.id)
-            g = data.get(gid, {"pairs": []})
+            g = await load_shard(DATA_PATH, gid, {"pairs": []})
             pairs = g.get('pairs', [])
             pairs.append({"a": int(a), "b": int(b), "started_at": started})
             g['pairs'] = pairs
-            data[gid] = g
-            await save_json(DATA_PATH, data)
+            await save_shard(DATA_PATH, gid, g, changes=[('pairs', len(pairs) - 1)])
             text = self.config['messages']['accepted'].format(proposer=interaction.user.mention, target=user.mention)
             # Announce
             ch_id = self.config.get('announce_channel_id')
@@ -123,14 +120,12 @@ class MarriageCog(commands.Cog):
             await interaction.response.send_message(self.config['messages']['not_married'], ephemeral=True)
             return
         a, b = r['user_id_a'], r['user_id_b']
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
-        g = data.get(gid, {"pairs": []})
+        g = await load_shard(DATA_PATH, gid, {"pairs": []})
         pairs = g.get('pairs', [])
         pairs = [p for p in pairs if not ((int(p.get('a')) == int(a) and int(p.get('b')) == int(b)) or (int(p.get('a')) == int(b) and int(p.get('b')) == int(a)))]
         g['pairs'] = pairs
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('pairs',)])
         user_a = interaction.guild.get_member(a)
         user_b = interaction.guild.get_member(b)
         await interaction.response.send_message(self.config['messages']['divorced'].format(a=user_a.mention if user_a else a, b=user_b.mention if user_b else b))
@@ -8,9 +8,10 @@ from discord import InteractionType
 import asyncio
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
 from console_logger import logger
+from json_store import write_json_nowait
+from config_store import get_config
 
 BASE_DIR = os.path.dirname(__file__)
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(BASE_DIR)), 'config.json')
 TICKETMSG_JSON = os.path.join(BASE_DIR, 'ticketmsg.json')
 TICKET_JSON = os.path.join(BASE_DIR, 'ticket.json')
 CLOSED_TICKETS_JSON = os.path.join(BASE_DIR, 'closed_tickets.json')
@@ -19,8 +20,7 @@ BLACKLIST_JSON = os.path.join(BASE_DIR, 'blacklist.json')
 class TicketCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            self.config = json.load(f)
+        self.config = get_config()
         self.ticket_messages = {}
         if os.path.exists(TICKETMSG_JSON):
             with open(TICKETMSG_JSON, 'r', encoding='utf-8') as f:
@@ -35,8 +35,7 @@ class TicketCog(commands.Cog):
                 except Exception:
                     self.ticket_messages = {}
             try:
-                with open(TICKETMSG_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.ticket_messages, f, indent=2, ensure_ascii=False)
+                write_json_nowait(TICKETMSG_JSON, self.ticket_messages, pretty=True)
             except Exception:
                 pass
         self.ticket_owners = {}
@@ -49,8 +48,7 @@ class TicketCog(commands.Cog):
                 loaded = json.load(f)
                 self.ticket_owners = {int(k): v for k, v in loaded.items()}
             try:
-                with open(TICKET_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.ticket_owners, f, indent=2, ensure_ascii=False)
+                write_json_nowait(TICKET_JSON, self.ticket_owners)
             except Exception:
                 pass
         self.closed_tickets = {}
@@ -67,8 +65,7 @@ class TicketCog(commands.Cog):
                 except Exception:
                     self.closed_tickets = {}
             try:
-                with open(CLOSED_TICKETS_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.closed_tickets, f, indent=2, ensure_ascii=False)
+                write_json_nowait(CLOSED_TICKETS_JSON, self.closed_tickets)
             except Exception:
                 pass
         self.blacklist = []
@@ -79,14 +76,12 @@ class TicketCog(commands.Cog):
             with open('blacklist.json', 'r', encoding='utf-8') as f:
                 self.blacklist = json.load(f)
             try:
-                with open(BLACKLIST_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.blacklist, f, indent=2, ensure_ascii=False)
+                write_json_nowait(BLACKLIST_JSON, self.blacklist)
             except Exception:
                 pass
 
     def save_tickets(self):
-        with open(TICKET_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.ticket_owners, f, indent=2, ensure_ascii=False)
+        write_json_nowait(TICKET_JSON, self.ticket_owners)
 
     def reload_ticket(self):
         if os.path.exists(TICKETMSG_JSON):
@@ -180,8 +175,6 @@ class TicketCog(commands.Cog):
 
         self.config['ticket_panel_channel_id'] = interaction.channel.id
         self.config['ticket_panel_message_id'] = message.id
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=2, ensure_ascii=False)
 
         await interaction.response.send_message('✅ Pannello ticket creato!', ephemeral=True)
 
@@ -277,8 +270,7 @@ class TicketCog(commands.Cog):
             self.blacklist.append(member.id)
             await interaction.response.send_message(f'✅ {member.mention} è stato aggiunto alla blacklist!', ephemeral=True)
 
-        with open(BLACKLIST_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.blacklist, f, indent=2, ensure_ascii=False)
+        write_json_nowait(BLACKLIST_JSON, self.blacklist)
 
     @app_commands.command(name='add', description='Aggiungi un utente al ticket')
     @app_commands.describe(member='Utente da aggiungere')
@@ -595,10 +587,7 @@ class TicketButton(discord.ui.Button):
                     pass
                 return
 
-        ticket_number = self.view.cog.config.get('ticket_counter', 0) + 1
-        self.view.cog.config['ticket_counter'] = ticket_number
-        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-            json.dump(self.view.cog.config, f, indent=2, ensure_ascii=False)
+        ticket_number = self.view.cog.config.increment('ticket_counter')
 
         channel = await guild.create_text_channel(
             name=f'ticket-{ticket_number}',
@@ -693,10 +682,7 @@ class ConfirmCloseView(discord.ui.View):
             try:
                 ticket_number = int(channel.name.split('-')[1])
             except (IndexError, ValueError):
-                ticket_number = self.cog.config.get('ticket_counter', 0) + 1
-                self.cog.config['ticket_counter'] = ticket_number
-                with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
-                    json.dump(self.cog.config, f, indent=2, ensure_ascii=False)
+                ticket_number = self.cog.config.increment('ticket_counter')
         else:
             owner_id = ticket_info.get('owner')
             button_id = ticket_info.get('button', '')
@@ -714,8 +700,7 @@ class ConfirmCloseView(discord.ui.View):
             'button': button_id,
             'channel_name': channel.name
         }
-        with open(CLOSED_TICKETS_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.cog.closed_tickets, f, indent=2, ensure_ascii=False)
+        write_json_nowait(CLOSED_TICKETS_JSON, self.cog.closed_tickets)
 
         embed_data = self.cog.config.get('ticket_transcript_embed', {})
         embed = discord.Embed(
@@ -772,10 +757,8 @@ async def setup(bot):
     cog = TicketCog(bot)
     await bot.add_cog(cog)
     try:
-        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-            persisted_config = json.load(f)
-        buttons = persisted_config.get('ticket_buttons', [])
-        bot.add_view(TicketView(buttons, persisted_config, cog))
+        buttons = cog.config.get('ticket_buttons', [])
+        bot.add_view(TicketView(buttons, cog.config, cog))
         bot.add_view(CloseTicketView(None, cog))
     except Exception as e:
         logger.error(f'Errore nella registrazione delle persistent views dei ticket: {e}')
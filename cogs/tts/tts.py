@@ -13,6 +13,7 @@ import json
 import ffmpeg
 
 from console_logger import logger
+from json_store import write_json_nowait
 
 load_dotenv()
 
@@ -96,18 +97,15 @@ class TTSCog(commands.Cog):
                 with open('tts.json', 'r', encoding='utf-8') as f:
                     self.tts_config = json.load(f)
                 try:
-                    with open(TTS_JSON, 'w', encoding='utf-8') as f:
-                        json.dump(self.tts_config, f, indent=2, ensure_ascii=False)
+                    write_json_nowait(TTS_JSON, self.tts_config, pretty=True)
                 except Exception:
                     pass
             else:
                 self.tts_config = {"channel_id": None, "lang": "ita", "voice": "maschio", "xsaid": False}
-                with open(TTS_JSON, 'w', encoding='utf-8') as f:
-                    json.dump(self.tts_config, f, indent=2, ensure_ascii=False)
+                write_json_nowait(TTS_JSON, self.tts_config, pretty=True)
         except FileNotFoundError:
             self.tts_config = {"channel_id": None, "lang": "ita", "voice": "maschio", "xsaid": False}
-            with open(TTS_JSON, 'w', encoding='utf-8') as f:
-                json.dump(self.tts_config, f, indent=2, ensure_ascii=False)
+            write_json_nowait(TTS_JSON, self.tts_config, pretty=True)
 
     @tasks.loop(minutes=2)
     async def update_voice_cache(self):
@@ -181,8 +179,7 @@ class TTSCog(commands.Cog):
             if 'user_voices' not in self.tts_config:
                 self.tts_config['user_voices'] = {}
             self.tts_config['user_voices'][user_id] = voice
-            with open(TTS_JSON, 'w', encoding='utf-8') as f:
-                json.dump(self.tts_config, f, indent=2, ensure_ascii=False)
+            write_json_nowait(TTS_JSON, self.tts_config, pretty=True)
             await interaction.response.send_message(f'✅ Voce impostata su {voice}', ephemeral=True)
         except Exception as e:
             await interaction.response.send_message(f'❌ Errore: {e}', ephemeral=True)
@@ -8,7 +8,7 @@ import time
 from typing import Optional
 
 from bot_utils import owner_or_has_permissions
-from json_store import load_json, save_json
+from json_store import load_shard, save_shard
 
 CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
 DATA_PATH = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')), 'data', 'reminders.json')
@@ -97,10 +97,9 @@ class RemindersCog(commands.Cog):
             else:
                 target_channel_id = interaction.channel.id
         # JSON storage
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = int(interaction.user.id)
-        g = data.get(gid, {"last_id": 0, "items": []})
+        g = await load_shard(DATA_PATH, gid, {"last_id": 0, "items": []})
         # limit per user
         max_per_user = int(cfg.get('max_per_user', 10))
         user_count = sum(1 for it in g.get('items', []) if it.get('user_id') == uid)
@@ -119,17 +118,15 @@ class RemindersCog(commands.Cog):
             'remind_at': int(due),
             'created_at': int(time.time())
         })
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('last_id',), ('items', len(g['items']) - 1)])
         await interaction.response.send_message(cfg['messages']['created'].format(time=when), ephemeral=True)
 
     @remind.command(name='list', description='Lista i tuoi promemoria')
     async def slash_reminders(self, interaction: discord.Interaction):
         cfg = self.config
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = int(interaction.user.id)
-        g = data.get(gid, {"items": []})
+        g = await load_shard(DATA_PATH, gid, {"items": []})
         rows = sorted([it for it in g.get('items', []) if it.get('user_id') == uid], key=lambda it: it.get('remind_at', 0))
         if not rows:
             await interaction.response.send_message(cfg['messages']['no_reminders'], ephemeral=True)
@@ -144,10 +141,9 @@ class RemindersCog(commands.Cog):
     @remind.command(name='delete', description='Elimina un tuo promemoria')
     @app_commands.describe(reminder_id='ID promemoria')
     async def slash_remind_delete(self, interaction: discord.Interaction, reminder_id: int):
-        data = await load_json(DATA_PATH, {})
         gid = str(interaction.guild.id)
         uid = int(interaction.user.id)
-        g = data.get(gid, {"items": []})
+        g = await load_shard(DATA_PATH, gid, {"items": []})
         items = g.get('items', [])
         found = next((it for it in items if int(it.get('id')) == int(reminder_id)), None)
         if not found:
@@ -158,8 +154,7 @@ class RemindersCog(commands.Cog):
             return
         items = [it for it in items if int(it.get('id')) != int(reminder_id)]
         g['items'] = items
-        data[gid] = g
-        await save_json(DATA_PATH, data)
+        await save_shard(DATA_PATH, gid, g, changes=[('items',)])
         await interaction.response.send_message('🗑️ Promemoria eliminato.', ephemeral=True)
 
     @tasks.loop(seconds=30)
@@ -167,19 +162,17 @@ class RemindersCog(commands.Cog):
         await self.bot.wait_until_ready()
         try:
             now = int(time.time())
-            data = await load_json(DATA_PATH, {})
-            changed = False
-            for gid, g in list(data.items()):
+            for guild in list(self.bot.guilds):
+                gid = str(guild.id)
+                g = await load_shard(DATA_PATH, gid, {"items": []})
                 items = g.get('items', [])
+                changed = False
                 remaining = []
                 for r in items:
                     if int(r.get('remind_at', 0)) > now:
                         remaining.append(r)
                         continue
                     try:
-                        guild = self.bot.get_guild(int(gid))
-                        if not guild:
-                            continue
                         user = guild.get_member(int(r.get('user_id')))
                         if not user:
                             continue
@@ -200,9 +193,7 @@ class RemindersCog(commands.Cog):
                         changed = True
                 if changed:
                     g['items'] = remaining
-                    data[gid] = g
-            if changed:
-                await save_json(DATA_PATH, data)
+                    await save_shard(DATA_PATH, gid, g, changes=[('items',)])
         except Exception:
             pass
 
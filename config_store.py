@@ -0,0 +1,194 @@
+import os
+import json
+import atexit
+import asyncio
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+import json_store
+from console_logger import logger
+
+# Shared in-memory view of config.json.
+# index.py and the cogs hold the same ConfigStore instead of private copies,
+# so a change made anywhere (or a /reloadconfig) is seen everywhere without
+# re-reading the file. Top-level assignments mark the store dirty; after a
+# nested change (config['active_counters'][gid] = ...) call save(). Writes are
+# coalesced for WRITE_DELAY seconds and done atomically off the event loop.
+# subscribe(callback) gets callback(store, keys) after every change, with
+# keys=None when the whole file was reloaded or saved without naming keys.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+
+WRITE_DELAY = float(os.getenv('CONFIG_WRITE_DELAY', '1'))
+
+
+class ConfigStore(MutableMapping):
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = os.path.abspath(path)
+        self._data: Dict[str, Any] = {}
+        self._subscribers: List[Callable] = []
+        self._dirty = False
+        self._write_task: Optional[asyncio.Task] = None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._data = json.load(f)
+
+    # Mapping interface, so existing config[...] / config.get(...) code works
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._data[key] = value
+        self.save({key})
+
+    def __delitem__(self, key: str):
+        del self._data[key]
+        self.save({key})
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self._data
+
+    # Typed accessors
+    def get_int(self, key: str, default: int = 0) -> int:
+        try:
+            return int(self._data.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    def get_str(self, key: str, default: str = '') -> str:
+        value = self._data.get(key, default)
+        return default if value is None else str(value)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self._data.get(key, default)
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 'yes', 'on')
+        return bool(value)
+
+    def get_list(self, key: str, default: Optional[list] = None) -> list:
+        value = self._data.get(key)
+        return value if isinstance(value, list) else list(default or [])
+
+    def get_dict(self, key: str) -> dict:
+        """Return the sub-dict for key, creating it if missing."""
+        value = self._data.get(key)
+        if not isinstance(value, dict):
+            value = {}
+            self._data[key] = value
+        return value
+
+    def get_id(self, key: str) -> Optional[int]:
+        """Discord IDs are stored as strings or ints; '' and None mean unset."""
+        try:
+            return int(str(self._data.get(key) or '').strip())
+        except ValueError:
+            return None
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        value = self.get_int(key) + amount
+        self[key] = value
+        return value
+
+    # Change notification
+    def subscribe(self, callback: Callable) -> Callable:
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable):
+        try:
+            self._subscribers.remove(callback)
+        except ValueError:
+            pass
+
+    def _notify(self, keys: Optional[Set[str]]):
+        for callback in list(self._subscribers):
+            try:
+                callback(self, keys)
+            except Exception as e:
+                logger.error(f'Errore in un subscriber della configurazione: {e}')
+
+    # Persistence
+    def save(self, keys: Optional[Set[str]] = None):
+        """Mark the config as changed and schedule a coalesced write.
+
+        Without keys anything may have changed, so subscribers get None.
+        """
+        self._dirty = True
+        self._notify(set(keys) if keys else None)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_sync()
+            return
+        if self._write_task is None or self._write_task.done():
+            self._write_task = loop.create_task(self._delayed_write())
+
+    async def _delayed_write(self):
+        await asyncio.sleep(WRITE_DELAY)
+        await self.flush()
+
+    async def flush(self) -> bool:
+        if not self._dirty:
+            return True
+        self._dirty = False
+        ok = await json_store.write_json(self.path, self._data, pretty=True)
+        if not ok:
+            self._dirty = True
+        return ok
+
+    def _write_sync(self):
+        if self._dirty:
+            self._dirty = False
+            json_store.write_json_nowait(self.path, self._data, pretty=True)
+
+    async def reload(self):
+        """Re-read config.json (e.g. after a manual edit) in place.
+
+        The dict is updated in place so every holder of the store, or of
+        store.data, sees the new values. Pending unsaved changes are dropped.
+        """
+        data = await json_store.read_json(self.path, None)
+        if not isinstance(data, dict):
+            raise ValueError(f'{os.path.basename(self.path)} non valido')
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+        self._write_task = None
+        self._dirty = False
+        self._data.clear()
+        self._data.update(data)
+        self._notify(None)
+
+    async def close(self):
+        if self._write_task is not None and not self._write_task.done():
+            self._write_task.cancel()
+        self._write_task = None
+        await self.flush()
+
+
+_store: Optional[ConfigStore] = None
+
+
+def get_config() -> ConfigStore:
+    global _store
+    if _store is None:
+        _store = ConfigStore()
+    return _store
+
+
+def _shutdown():
+    if _store is not None:
+        try:
+            _store._write_sync()
+        except Exception:
+            pass
+
+
+atexit.register(_shutdown)
@@ -7,14 +7,16 @@ import os
 import re
 from dotenv import load_dotenv
 
+import json_store
+from config_store import get_config
+from valiance_tools.backup import BackupStore
 from console_logger import logger
 from embed_creator import EmbedCreatorView
 from cogs.ticket.ticket import TicketCog, TicketView, CloseTicketView
 
 load_dotenv()
 
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
+config = get_config()
 
 intents = discord.Intents.default()
 intents.voice_states = True
@@ -29,7 +31,27 @@ def get_prefix(bot, message):
     return commands.when_mentioned_or(*prefixes)(bot, message)
 
 
-bot = commands.Bot(command_prefix=get_prefix, intents=intents)
+class ValianceBot(commands.Bot):
+    async def setup_hook(self):
+        if str(config.get('storage_backend', 'json')).lower() == 'sqlite':
+            import sqlite_store
+            await sqlite_store.install()
+        elif config.get('storage_journal', False):
+            for name in ('levels', 'reminders', 'reputation', 'birthdays', 'marriages'):
+                json_store.enable_journal(os.path.join('data', f'{name}.json'))
+        backup_cfg = config.get_dict('backup')
+        if backup_cfg.get('enabled', False):
+            backup_loop.change_interval(minutes=float(backup_cfg.get('interval_minutes', 60)))
+            backup_loop.start()
+
+    async def close(self):
+        # Cogs are removed first so they can hand their pending data to json_store
+        await super().close()
+        await config.close()
+        await json_store.close()
+
+
+bot = ValianceBot(command_prefix=get_prefix, intents=intents)
 
 from bot_utils import OWNER_ID, owner_or_has_permissions, is_owner
 
@@ -110,6 +132,33 @@ async def status_loop():
     await bot.change_presence(status=status_enum, activity=activity)
 
 
+@tasks.loop(minutes=60)
+async def backup_loop():
+    cfg = config.get_dict('backup')
+    store = BackupStore(cfg.get('dir', 'backups'), cfg.get('compression', 'zstd'))
+    try:
+        # Snapshot what is on disk, so write pending changes out first
+        await config.flush()
+        await json_store.flush_all()
+        loop = asyncio.get_running_loop()
+        stats = await loop.run_in_executor(None, store.snapshot, [os.path.join('data', 'valiance.db')])
+        pruned = await loop.run_in_executor(None, store.prune, int(cfg.get('keep_hourly', 24)), int(cfg.get('keep_daily', 14)))
+        logger.info(f"Backup {stats['name']}: {stats['files_read']}/{stats['files']} file letti, "
+                    f"{stats['bytes_written']} byte scritti, {len(pruned['removed'])} snapshot rimossi")
+    except Exception as e:
+        logger.error(f'Errore durante il backup: {e}')
+
+
+STATUS_KEYS = {'bot_status', 'bot_activity_type', 'bot_activity_name', 'bot_activity_guild_id', 'bot_activity_url'}
+
+
+@config.subscribe
+def _on_config_change(store, keys):
+    # Apply a new status right away instead of at the next 5-minute tick
+    if (keys is None or keys & STATUS_KEYS) and status_loop.is_running():
+        status_loop.restart()
+
+
 @bot.event
 async def on_ready():
     bot.start_time = discord.utils.utcnow()
@@ -138,8 +187,7 @@ async def on_ready():
                 del config['active_counters'][guild_id_str][channel_type]
                 if not config['active_counters'][guild_id_str]:
                     del config['active_counters'][guild_id_str]
-                with open('config.json', 'w', encoding='utf-8') as f:
-                    json.dump(config, f, indent=2, ensure_ascii=False)
+                config.save({'active_counters'})
     status_loop.start()
 
     # Register persistent views (e.g., verify button)
@@ -349,8 +397,6 @@ async def on_message(message):
 
     if waiting_for_ruleset and message.author.id == 1123622103917285418:
         config['ruleset_message'] = message.content
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
 
         waiting_for_ruleset = False
         await message.add_reaction('✅')
@@ -359,8 +405,7 @@ async def on_message(message):
 
     if waiting_for_welcome and message.author.id == 1123622103917285418:
         config['welcome_message']['description'] = message.content
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        config.save({'welcome_message'})
 
         waiting_for_welcome = False
         await message.add_reaction('✅')
@@ -678,8 +723,7 @@ async def update_counters(guild):
                     del config['active_counters'][str(guild.id)][channel_type]
                     if not config['active_counters'][str(guild.id)]:
                         del config['active_counters'][str(guild.id)]
-                    with open('config.json', 'w', encoding='utf-8') as f:
-                        json.dump(config, f, indent=2, ensure_ascii=False)
+                    config.save({'active_counters'})
                 logger.info(f'Counter {channel_type} rimosso per guild {guild.name} (canale eliminato)')
 
         counters_config = config.get('counters', {})
@@ -778,14 +822,11 @@ async def slash_startct(interaction: discord.Interaction):
             'role_members': role_channel
         }
 
-        if 'active_counters' not in config:
-            config['active_counters'] = {}
-        config['active_counters'][str(guild.id)] = {
+        config.get_dict('active_counters')[str(guild.id)] = {
             'total_members': total_channel.id,
             'role_members': role_channel.id
         }
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        config.save({'active_counters'})
 
         if counter_task is None or counter_task.done():
             counter_task = bot.loop.create_task(counter_update_loop())
@@ -825,8 +866,7 @@ async def slash_stopct(interaction: discord.Interaction):
 
         if 'active_counters' in config and str(guild.id) in config['active_counters']:
             del config['active_counters'][str(guild.id)]
-            with open('config.json', 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            config.save({'active_counters'})
 
         if not counter_channels and counter_task and not counter_task.done():
             counter_task.cancel()
@@ -1233,14 +1273,9 @@ async def slash_reloadlog(interaction: discord.Interaction):
             f'Errore reloadlog da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}: {e}')
 
 
-def reload_global_config():
-    global config
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
-
-    moderation_cog = bot.get_cog('ModerationCog')
-    if moderation_cog:
-        moderation_cog.reload_config()
+async def reload_global_config():
+    # The cogs share the same ConfigStore, so one reload updates all of them
+    await config.reload()
 
     log_cog = bot.get_cog('LogCog')
     if log_cog:
@@ -1252,7 +1287,7 @@ def reload_global_config():
 @owner_or_has_permissions(administrator=True)
 async def slash_reloadconfig(interaction: discord.Interaction):
     try:
-        reload_global_config()
+        await reload_global_config()
         await interaction.response.send_message('✅ Configurazione globale ricaricata con successo!', ephemeral=True)
         logger.info(
             f'Configurazione globale ricaricata da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}')
@@ -1263,10 +1298,8 @@ async def slash_reloadconfig(interaction: discord.Interaction):
             f'Errore reloadconfig da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}: {e}')
 
 
-def reload_all():
-    global config
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
+async def reload_all():
+    await config.reload()
 
     moderation_cog = bot.get_cog('ModerationCog')
     if moderation_cog:
@@ -1280,12 +1313,16 @@ def reload_all():
     if log_cog:
         log_cog.reload_config()
 
+    levels_cog = bot.get_cog('LevelsCog')
+    if levels_cog:
+        levels_cog.reload_config()
+
 
 @bot.tree.command(name='reloadall', description='Ricarica tutte le configurazioni senza riavviare il bot (solo admin)')
 @owner_or_has_permissions(administrator=True)
 async def slash_reloadall(interaction: discord.Interaction):
     try:
-        reload_all()
+        await reload_all()
         await interaction.response.send_message('✅ Tutte le configurazioni ricaricate con successo!', ephemeral=True)
         logger.info(
             f'Tutte le configurazioni ricaricate da {interaction.user.name}#{interaction.user.discriminator} ({interaction.user.id}) in {interaction.guild.name}')
@@ -1361,8 +1398,7 @@ async def slash_setlogchannel(
                         log_config[field] = value
                     updated_channels.append(f"{param}: {value}")
 
-        with open('cogs/log/log.json', 'w', encoding='utf-8') as f:
-            json.dump(log_config, f, indent=2, ensure_ascii=False)
+        json_store.write_json_nowait('cogs/log/log.json', log_config, pretty=True)
 
         embed = discord.Embed(
             title='✅ Canali Log Aggiornati',
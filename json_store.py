@@ -1,11 +1,80 @@
 import os
 import json
+import time
+import atexit
 import asyncio
-from typing import Any, Dict
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
 
-# Simple async JSON storage with per-file locks to avoid race conditions
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows: cross-process locking is skipped there
+    fcntl = None
+
+from console_logger import logger
+
+# Simple async JSON storage with per-file locks to avoid race conditions.
+# Documents are kept in memory after the first load: readers get the cached
+# object and save_json only marks it dirty. A debounced background task writes
+# dirty documents to disk every FLUSH_INTERVAL seconds and on shutdown.
+# A path can be routed to another backend (see sqlite_store) with set_backend;
+# backends expose async load(path, default), save(path, data, changes) and
+# close(). changes are the key paths passed to save_json since the last
+# flush, or None when some save didn't say what it touched.
+#
+# Paths with the journal enabled (enable_journal) append each mutation to
+# <file>.journal as an NDJSON line instead. Callers pass the key paths they
+# changed, e.g. save_json(path, data, changes=[(gid, 'users', uid)]), and the
+# journal is folded back into the snapshot on load or once it grows past
+# JOURNAL_MAX_BYTES.
+#
+# File I/O and (de)serialization run on a small pool of single-thread "lanes";
+# a path always maps to the same lane, so writes to one file stay ordered.
+# Data files are written compact (orjson when installed); pretty-printing is
+# kept for human-edited config files via write_json(..., pretty=True).
+#
+# Guild-keyed datasets can be sharded: load_shard/save_shard keep each guild
+# of data/levels.json in data/levels/<guild_id>.json, a document of its own
+# with its own lock, cache entry and journal. The old single file is split on
+# first access. Backends and journals enabled for the dataset path apply to
+# all of its shards.
+#
+# Other processes (an admin CLI, a rank card worker) may use the same files.
+# Every read takes a shared fcntl lock and every write an exclusive one, on a
+# <file>.lock sidecar since os.replace swaps the inode of the file itself.
+# The inode/mtime/size of the file and its journal are recorded on each read
+# and write; a cached copy whose file changed underneath is dropped on the
+# next load_json (checked at most every STAT_INTERVAL seconds). Two processes
+# writing the same document still race: the last writer wins and a warning is
+# logged.
+
+FLUSH_INTERVAL = float(os.getenv('JSON_STORE_FLUSH_INTERVAL', '5'))
+JOURNAL_MAX_BYTES = int(os.getenv('JSON_STORE_JOURNAL_MAX_BYTES', str(4 * 1024 * 1024)))
+IO_WORKERS = int(os.getenv('JSON_STORE_IO_WORKERS', '4'))
+STAT_INTERVAL = float(os.getenv('JSON_STORE_STAT_INTERVAL', '1'))
 
 _locks: Dict[str, asyncio.Lock] = {}
+_cache: Dict[str, Any] = {}
+_dirty: Set[str] = set()
+_flush_task: Optional[asyncio.Task] = None
+_backends: Dict[str, Any] = {}
+_journaled: Set[str] = set()
+_journal_files: Dict[str, Any] = {}
+_unsynced: Set[str] = set()
+_lanes: List[ThreadPoolExecutor] = []
+_sharded: Set[str] = set()
+_signatures: Dict[str, tuple] = {}
+_checked_at: Dict[str, float] = {}
+# Backend paths: key paths saved since the last flush (None = whole document)
+_backend_changes: Dict[str, Optional[Set[tuple]]] = {}
 
 
 def _ensure_dir(path: str):
@@ -14,33 +83,636 @@ def _ensure_dir(path: str):
         os.makedirs(d, exist_ok=True)
 
 
+def _norm(path: str) -> str:
+    return os.path.abspath(path)
+
+
+def _dataset_of(path: str) -> str:
+    # data/levels/123.json -> data/levels.json
+    return os.path.dirname(path) + '.json'
+
+
+def _backend_for(path: str) -> Any:
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends.get(_dataset_of(path))
+    return backend
+
+
+def _is_journaled(path: str) -> bool:
+    return path in _journaled or _dataset_of(path) in _journaled
+
+
 def _get_lock(path: str) -> asyncio.Lock:
     if path not in _locks:
         _locks[path] = asyncio.Lock()
     return _locks[path]
 
 
+def dumps(data: Any, pretty: bool = False) -> bytes:
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _lane(path: str) -> ThreadPoolExecutor:
+    if not _lanes:
+        for i in range(max(1, IO_WORKERS)):
+            _lanes.append(ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'json-store-{i}'))
+    return _lanes[hash(path) % len(_lanes)]
+
+
+async def run_io(path: str, fn: Callable, *args) -> Any:
+    """Run blocking fn(*args) on the I/O lane that owns path."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_lane(_norm(path)), functools.partial(fn, *args))
+
+
+def _on_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool, blocking: bool = True):
+    # flock locks belong to the open file, so helpers called while a lock is
+    # held must not take it again (they would wait on themselves)
+    if fcntl is None or (not exclusive and not os.path.exists(path)):
+        yield
+        return
+    # Waiting for another process (migrate, backup) would freeze the gateway:
+    # on the loop thread a busy lock raises BlockingIOError instead, and the
+    # callers keep the document dirty or fall back until the next flush
+    if blocking and _on_loop_thread():
+        blocking = False
+    _ensure_dir(path)
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        fcntl.flock(fd, flags if blocking else flags | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _stat(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _signature(path: str) -> tuple:
+    return _stat(path), _stat(_journal_path(path))
+
+
+def _is_stale(path: str) -> bool:
+    # Throttled so the hot path costs at most one stat per STAT_INTERVAL
+    now = time.monotonic()
+    if now - _checked_at.get(path, 0.0) < STAT_INTERVAL:
+        return False
+    _checked_at[path] = now
+    sig = _signatures.get(path)
+    return sig is not None and _signature(path) != sig
+
+
+def _read_unlocked(path: str, default: Any) -> Any:
+    try:
+        if not os.path.exists(path):
+            return default
+        with open(path, 'rb') as f:
+            return loads(f.read())
+    except Exception:
+        return default
+
+
+def _read_file(path: str, default: Any) -> Any:
+    try:
+        with _file_lock(path, exclusive=False):
+            return _read_unlocked(path, default)
+    except Exception:
+        return default
+
+
+def _store_bytes(path: str, payload: bytes):
+    _ensure_dir(path)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def _write_bytes(path: str, payload: bytes) -> bool:
+    try:
+        with _file_lock(path, exclusive=True):
+            seen = _signatures.get(path)
+            if seen is not None and _signature(path) != seen:
+                logger.warning(f'{os.path.basename(path)} modificato da un altro processo, verrà sovrascritto')
+            _store_bytes(path, payload)
+            _signatures[path] = _signature(path)
+        return True
+    except Exception:
+        # Best-effort; ignore write errors to avoid crashing scheduled loops
+        return False
+
+
+def _write_file(path: str, data: Any) -> bool:
+    # Compact encoders run in C without releasing the GIL, so serializing here
+    # on a lane sees a consistent document even while the loop mutates it
+    try:
+        payload = dumps(data)
+    except Exception:
+        return False
+    return _write_bytes(path, payload)
+
+
+def _load_file(path: str, default: Any, journaled: bool) -> Any:
+    # Replaying compacts the journal, which is a write
+    exclusive = journaled and os.path.exists(_journal_path(path))
+    try:
+        with _file_lock(path, exclusive=exclusive):
+            data = _read_unlocked(path, default)
+            if journaled:
+                data = _replay_journal(path, data)
+            _signatures[path] = _signature(path)
+    except Exception:
+        return default
+    return data
+
+
+def _journal_path(path: str) -> str:
+    return path + '.journal'
+
+
+def _journal_size(path: str) -> int:
+    f = _journal_files.get(path)
+    if f is not None:
+        # fstat rather than tell(): another process may have compacted it
+        return os.fstat(f.fileno()).st_size
+    try:
+        return os.path.getsize(_journal_path(path))
+    except OSError:
+        return 0
+
+
+def _journal_handle(path: str):
+    f = _journal_files.get(path)
+    if f is None:
+        _ensure_dir(path)
+        f = open(_journal_path(path), 'a', encoding='utf-8')
+        _journal_files[path] = f
+    return f
+
+
+def _truncate_journal(path: str, offset: int):
+    with _file_lock(path, exclusive=True):
+        _truncate_unlocked(path, offset)
+        _signatures[path] = _signature(path)
+
+
+def _truncate_unlocked(path: str, offset: int):
+    # Drop the lines already folded into the snapshot, keep anything appended later
+    jpath = _journal_path(path)
+    f = _journal_files.pop(path, None)
+    if f is not None:
+        f.close()
+    _unsynced.discard(path)
+    if not os.path.exists(jpath):
+        return
+    with open(jpath, 'rb') as src:
+        src.seek(offset)
+        tail = src.read()
+    with open(jpath, 'wb') as dst:
+        dst.write(tail)
+
+
+def _lookup(data: Any, keys: Sequence):
+    node = data
+    for k in keys:
+        if isinstance(node, dict) and k in node:
+            node = node[k]
+        elif isinstance(node, list) and isinstance(k, int) and 0 <= k < len(node):
+            node = node[k]
+        else:
+            raise KeyError(k)
+    return node
+
+
+def _apply(data: Any, entry: dict) -> Any:
+    keys = entry.get('p') or []
+    if not keys:
+        return entry.get('v')
+    node = data
+    for i, k in enumerate(keys[:-1]):
+        # Missing containers are created as lists when indexed by position
+        fresh = [] if isinstance(keys[i + 1], int) else {}
+        if isinstance(node, dict):
+            node = node.setdefault(k, fresh)
+        elif isinstance(node, list) and isinstance(k, int) and 0 <= k <= len(node):
+            if k == len(node):
+                node.append(fresh)
+            node = node[k]
+        else:
+            return data
+    last = keys[-1]
+    if isinstance(node, dict):
+        if entry.get('d'):
+            node.pop(last, None)
+        else:
+            node[last] = entry.get('v')
+    elif isinstance(node, list) and isinstance(last, int) and not entry.get('d'):
+        # Index-addressed so replaying a line twice is harmless
+        if last < len(node):
+            node[last] = entry.get('v')
+        elif last == len(node):
+            node.append(entry.get('v'))
+    return data
+
+
+def _replay_journal(path: str, data: Any, compact: bool = True) -> Any:
+    jpath = _journal_path(path)
+    if not os.path.exists(jpath):
+        return data
+    replayed = 0
+    with open(jpath, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn last line from a crash mid-append
+                break
+            data = _apply(data, entry)
+            replayed += 1
+    if not compact:
+        return data
+    size = os.path.getsize(jpath)
+    # Startup compaction: fold the journal into a fresh snapshot
+    if replayed:
+        try:
+            _store_bytes(path, dumps(data))
+        except Exception:
+            return data
+    if size:
+        _truncate_unlocked(path, size)
+    return data
+
+
+def _append_journal(path: str, data: Any, changes: Iterable[Sequence]):
+    # Runs on the loop, so never wait for another process: if the lock is
+    # busy this raises and the caller falls back to a full write
+    lines = []
+    for keys in changes:
+        keys = list(keys)
+        try:
+            entry = {'p': keys, 'v': _lookup(data, keys)}
+        except KeyError:
+            entry = {'p': keys, 'd': 1}
+        lines.append(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+    with _file_lock(path, exclusive=True, blocking=False):
+        f = _journal_handle(path)
+        f.write(''.join(lines))
+        f.flush()
+        # Our own append must not look like a foreign change
+        seen = _signatures.get(path)
+        _signatures[path] = (seen[0] if seen else _stat(path), _stat(_journal_path(path)))
+    _unsynced.add(path)
+
+
+def _fsync(f):
+    try:
+        # fdatasync skips the metadata flush where the platform has it
+        getattr(os, 'fdatasync', os.fsync)(f.fileno())
+    except Exception:
+        pass
+
+
+def _take_unsynced():
+    handles = []
+    for path in list(_unsynced):
+        _unsynced.discard(path)
+        f = _journal_files.get(path)
+        if f is not None:
+            handles.append((path, f))
+    return handles
+
+
+def _sync_journals():
+    for _, f in _take_unsynced():
+        _fsync(f)
+
+
+def set_flush_interval(seconds: float) -> None:
+    global FLUSH_INTERVAL
+    FLUSH_INTERVAL = max(0.0, float(seconds))
+
+
+def set_backend(path: str, backend: Any) -> None:
+    path = _norm(path)
+    _backends[path] = backend
+    if path not in _dirty:
+        _cache.pop(path, None)
+
+
+def enable_journal(path: str) -> None:
+    """Write mutations of this file as NDJSON deltas to <file>.journal."""
+    path = _norm(path)
+    _journaled.add(path)
+    if path not in _dirty:
+        _cache.pop(path, None)
+
+
 async def load_json(path: str, default: Any) -> Any:
+    path = _norm(path)
+    if path in _cache:
+        if path in _dirty or _backend_for(path) is not None or not _is_stale(path):
+            return _cache[path]
+        # Another process wrote the file since we read it
+        _cache.pop(path, None)
     lock = _get_lock(path)
     async with lock:
+        if path not in _cache:
+            backend = _backend_for(path)
+            if backend is not None:
+                _cache[path] = await backend.load(path, default)
+            else:
+                _cache[path] = await run_io(path, _load_file, path, default, _is_journaled(path))
+        return _cache[path]
+
+
+async def save_json(path: str, data: Any, changes: Optional[Iterable[Sequence]] = None) -> None:
+    """Store data for path. changes lists the key paths that were modified;
+    it is only needed for journaled files and falls back to a full write."""
+    path = _norm(path)
+    _cache[path] = data
+    if _backend_for(path) is not None:
+        _track_changes(path, changes)
+    if changes is not None and _is_journaled(path) and _backend_for(path) is None:
         try:
-            if not os.path.exists(path):
-                return default
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            _append_journal(path, data, changes)
+            if _journal_size(path) >= JOURNAL_MAX_BYTES:
+                _dirty.add(path)
         except Exception:
-            return default
+            _dirty.add(path)
+    else:
+        _dirty.add(path)
+    _schedule_flush()
 
 
-async def save_json(path: str, data: Any) -> None:
-    lock = _get_lock(path)
-    async with lock:
+def _track_changes(path: str, changes: Optional[Iterable[Sequence]]):
+    if changes is None:
+        _backend_changes[path] = None
+    elif path not in _backend_changes:
+        _backend_changes[path] = {tuple(keys) for keys in changes}
+    elif _backend_changes[path] is not None:
+        _backend_changes[path].update(tuple(keys) for keys in changes)
+
+
+def _schedule_flush():
+    global _flush_task
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _flush_all_sync()
+        return
+    if _flush_task is None or _flush_task.done():
+        _flush_task = loop.create_task(_delayed_flush())
+
+
+async def _delayed_flush():
+    await asyncio.sleep(FLUSH_INTERVAL)
+    await flush_all()
+
+
+async def flush_all() -> None:
+    for path, f in _take_unsynced():
+        await run_io(path, _fsync, f)
+    for path in list(_dirty):
+        lock = _get_lock(path)
+        async with lock:
+            if path not in _dirty:
+                continue
+            _dirty.discard(path)
+            backend = _backend_for(path)
+            if backend is not None:
+                changes = _backend_changes.pop(path, None)
+                ok = await backend.save(path, _cache.get(path), changes)
+                if not ok:
+                    _track_changes(path, changes)
+            else:
+                # Lines up to here are covered by the snapshot about to be written
+                offset = _journal_size(path) if _is_journaled(path) else None
+                ok = await run_io(path, _write_file, path, _cache.get(path))
+                if ok and offset is not None:
+                    # Takes the cross-process lock and rewrites the journal tail
+                    await run_io(path, _truncate_journal, path, offset)
+            if not ok:
+                # Keep it dirty so the next flush retries
+                _dirty.add(path)
+
+
+async def close() -> None:
+    """Cancel the pending debounce and write every dirty document now."""
+    global _flush_task
+    if _flush_task is not None and not _flush_task.done():
+        _flush_task.cancel()
+    _flush_task = None
+    await flush_all()
+    _close_journals()
+    for backend in {id(b): b for b in _backends.values()}.values():
         try:
-            _ensure_dir(path)
-            tmp = path + '.tmp'
-            with open(tmp, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            os.replace(tmp, path)
+            await backend.close()
         except Exception:
-            # Best-effort; ignore write errors to avoid crashing scheduled loops
             pass
+
+
+def shard_path(path: str, guild_id: Any) -> str:
+    """data/levels.json + guild 123 -> data/levels/123.json"""
+    root, _ = os.path.splitext(_norm(path))
+    return os.path.join(root, f'{guild_id}.json')
+
+
+def _split_file(path: str):
+    # One-time migration of a guild-keyed file into per-guild shards
+    with _file_lock(path, exclusive=True):
+        if not os.path.exists(path):
+            # Already split (possibly by another process)
+            return
+        data = _read_unlocked(path, None)
+        if _is_journaled(path):
+            data = _replay_journal(path, data)
+        if not isinstance(data, dict):
+            return
+        for gid, g in data.items():
+            target = shard_path(path, gid)
+            if not os.path.exists(target) and not _write_file(target, g):
+                return
+        os.replace(path, path + '.migrated')
+        if os.path.exists(_journal_path(path)):
+            os.remove(_journal_path(path))
+
+
+async def _ensure_sharded(path: str):
+    if path in _sharded:
+        return
+    async with _get_lock(path):
+        if path not in _sharded:
+            if _backend_for(path) is None:
+                await run_io(path, _split_file, path)
+            _sharded.add(path)
+
+
+async def load_shard(path: str, guild_id: Any, default: Any) -> Any:
+    """Load one guild's document of a sharded dataset."""
+    await _ensure_sharded(_norm(path))
+    return await load_json(shard_path(path, guild_id), default)
+
+
+async def save_shard(path: str, guild_id: Any, data: Any, changes: Optional[Iterable[Sequence]] = None) -> None:
+    """Save one guild's document; changes are relative to that document."""
+    await _ensure_sharded(_norm(path))
+    await save_json(shard_path(path, guild_id), data, changes)
+
+
+# Synchronous, uncached access for offline tools (migrate, backup). They
+# share the bot's cross-process locks but never split, compact or otherwise
+# rewrite a file unless asked to.
+
+def file_lock(path: str, exclusive: bool = False):
+    """The cross-process lock the bot takes on path (a context manager)."""
+    return _file_lock(_norm(path), exclusive)
+
+
+def read_document(path: str, default: Any = None) -> Any:
+    """Read path with its journal (if any) replayed in memory only."""
+    path = _norm(path)
+    try:
+        with _file_lock(path, exclusive=False):
+            data = _read_unlocked(path, default)
+            if os.path.exists(_journal_path(path)):
+                data = _replay_journal(path, data, compact=False)
+        return data
+    except Exception:
+        return default
+
+
+def write_document(path: str, data: Any, drop_journal: bool = False) -> bool:
+    """Atomic locked write of path; drop_journal removes a journal that
+    would otherwise be replayed on top of it."""
+    path = _norm(path)
+    if not _write_file(path, data):
+        return False
+    if drop_journal and os.path.exists(_journal_path(path)):
+        os.remove(_journal_path(path))
+    return True
+
+
+def dataset_guilds(path: str) -> List[str]:
+    """Guild ids of a sharded dataset: its shards plus the guilds still in
+    the unsplit file (read-only)."""
+    path = _norm(path)
+    gids = set()
+    root, _ = os.path.splitext(path)
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            gid, ext = os.path.splitext(name)
+            if ext == '.json' and gid.isdigit():
+                gids.add(gid)
+    legacy = read_document(path) if os.path.exists(path) else None
+    if isinstance(legacy, dict):
+        gids.update(str(g) for g in legacy if str(g).isdigit())
+    return sorted(gids, key=int)
+
+
+def split_dataset(path: str) -> None:
+    """The bot's one-time split of a guild-keyed file into shards."""
+    path = _norm(path)
+    if os.path.exists(_journal_path(path)):
+        _journaled.add(path)
+    _split_file(path)
+
+
+async def read_json(path: str, default: Any) -> Any:
+    """Uncached read of a file (e.g. a config) off the event loop."""
+    return await run_io(path, _read_file, _norm(path), default)
+
+
+async def write_json(path: str, data: Any, pretty: bool = False) -> bool:
+    """Uncached atomic write of a file off the event loop."""
+    future = write_json_nowait(path, data, pretty)
+    return await future if future is not None else True
+
+
+def write_json_nowait(path: str, data: Any, pretty: bool = False):
+    """Queue an atomic write from sync code; returns an awaitable or None.
+
+    Pretty output uses the pure-Python encoder, which can interleave with the
+    loop, so it is serialized here; compact output is serialized on the lane.
+    """
+    path = _norm(path)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if pretty:
+        payload = dumps(data, pretty=True)
+        job = functools.partial(_write_bytes, path, payload)
+    else:
+        job = functools.partial(_write_file, path, data)
+    if loop is None:
+        job()
+        return None
+    return loop.run_in_executor(_lane(path), job)
+
+
+def invalidate(path: str) -> None:
+    """Drop the cached copy so the next load_json re-reads the file."""
+    path = _norm(path)
+    if path not in _dirty:
+        _cache.pop(path, None)
+
+
+def _close_journals():
+    _sync_journals()
+    for path in list(_journal_files):
+        try:
+            _journal_files.pop(path).close()
+        except Exception:
+            pass
+
+
+def _flush_all_sync():
+    # Only plain files can be written without a running loop
+    _sync_journals()
+    for path in [p for p in _dirty if _backend_for(p) is None]:
+        _dirty.discard(path)
+        offset = _journal_size(path) if _is_journaled(path) else None
+        if not _write_file(path, _cache.get(path)):
+            _dirty.add(path)
+        elif offset is not None:
+            _truncate_journal(path, offset)
+
+
+def _shutdown():
+    _flush_all_sync()
+    _close_journals()
+    for lane in _lanes:
+        lane.shutdown(wait=True)
+
+
+# Last resort for documents still dirty if the loop died without close()
+atexit.register(_shutdown)
@@ -0,0 +1,576 @@
+import os
+import time
+import asyncio
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import aiosqlite
+
+import json_store
+from console_logger import logger
+
+# SQLite backend for the guild-keyed datasets in data/*.json.
+# It plugs into json_store with set_backend, so cogs keep calling
+# load_json/save_json unchanged. Each dataset is mapped to real tables and a
+# flush only UPSERTs (or deletes) the rows that changed since the last one,
+# using a single shared WAL-mode connection.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+DB_PATH = os.path.join(DATA_DIR, 'valiance.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS levels (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    text_xp INTEGER NOT NULL DEFAULT 0,
+    voice_xp INTEGER NOT NULL DEFAULT 0,
+    last_msg_xp_at INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS reminder_guilds (
+    guild_id INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    guild_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    channel_id INTEGER,
+    is_dm INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    remind_at INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_remind_at ON reminders (remind_at);
+CREATE TABLE IF NOT EXISTS rep_totals (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+-- A log entry is keyed by what it is, not by its position in the JSON list,
+-- so trimming old entries doesn't shift the others; dup tells apart
+-- identical (from, to, second) entries
+CREATE TABLE IF NOT EXISTS rep_logs (
+    guild_id INTEGER NOT NULL,
+    from_id INTEGER NOT NULL,
+    to_id INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    dup INTEGER NOT NULL DEFAULT 0,
+    delta INTEGER NOT NULL,
+    reason TEXT,
+    PRIMARY KEY (guild_id, from_id, to_id, created_at, dup)
+);
+CREATE TABLE IF NOT EXISTS birthdays (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    year INTEGER,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_birthdays_month_day ON birthdays (month, day);
+CREATE TABLE IF NOT EXISTS marriages (
+    guild_id INTEGER NOT NULL,
+    a INTEGER NOT NULL,
+    b INTEGER NOT NULL,
+    started_at INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, a, b)
+);
+-- Whole JSON files without a table of their own (warns, closed tickets,
+-- giveaways), filled by valiance_tools.migrate. The bot keeps writing them
+-- as JSON, so this is a snapshot taken at migration time
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    checksum TEXT NOT NULL
+);
+-- Datasets whose JSON files were already imported (or migrated), so a
+-- dataset emptied later on is never imported again
+CREATE TABLE IF NOT EXISTS imports (
+    dataset TEXT PRIMARY KEY,
+    imported_at INTEGER NOT NULL
+);
+"""
+
+# rep_logs used to be keyed by list position (seq)
+_REP_LOGS_SEQ_BEFORE = """
+ALTER TABLE rep_logs RENAME TO rep_logs_seq;
+DROP INDEX IF EXISTS idx_rep_logs_pair;
+"""
+_REP_LOGS_SEQ_AFTER = """
+INSERT OR IGNORE INTO rep_logs (guild_id, from_id, to_id, created_at, dup, delta, reason)
+SELECT guild_id, from_id, to_id, created_at,
+       ROW_NUMBER() OVER (PARTITION BY guild_id, from_id, to_id, created_at ORDER BY seq) - 1,
+       delta, reason
+FROM rep_logs_seq;
+DROP TABLE rep_logs_seq;
+"""
+
+
+def schema_script(rep_logs_columns: Iterable[str]) -> str:
+    """SCHEMA, upgrading an older rep_logs table (its column names) first."""
+    if 'seq' in rep_logs_columns:
+        return 'BEGIN;' + _REP_LOGS_SEQ_BEFORE + SCHEMA + _REP_LOGS_SEQ_AFTER + 'COMMIT;'
+    return SCHEMA
+
+
+MARK_IMPORTED = 'INSERT OR IGNORE INTO imports (dataset, imported_at) VALUES (?, ?)'
+
+Rows = Dict[str, Dict[tuple, tuple]]
+# (table, key prefix, current rows under that prefix) for one changed key path
+Partial = Tuple[str, tuple, List[tuple]]
+
+
+class Dataset:
+    """Maps one guild's document of a data/*.json file to table rows and back.
+
+    partial(gid, doc, change) maps one of the key paths passed to save_json
+    (e.g. ('users', '123')) to the rows it covers, so a save only touches
+    those; it returns None for paths it doesn't know and the whole document
+    is diffed instead.
+    """
+
+    def __init__(self, name: str, tables: Dict[str, Tuple[Tuple[str, ...], int]],
+                 to_rows: Callable[[int, dict], Dict[str, List[tuple]]],
+                 from_rows: Callable[[Dict[str, List[tuple]]], dict],
+                 partial: Optional[Callable[[int, dict, tuple], Optional[Partial]]] = None):
+        self.name = name
+        # table -> (columns, number of leading primary key columns)
+        self.tables = tables
+        self.to_rows = to_rows
+        self.from_rows = from_rows
+        self.partial = partial
+
+
+def _levels_rows(gid: int, g: dict):
+    rows = []
+    for uid, u in (g.get('users') or {}).items():
+        rows.append((gid, int(uid), int(u.get('text_xp', 0) or 0), int(u.get('voice_xp', 0) or 0), int(u.get('last_msg_xp_at', 0) or 0)))
+    return {'levels': rows}
+
+
+def _levels_partial(gid: int, g: dict, change: tuple) -> Optional[Partial]:
+    if len(change) != 2 or change[0] != 'users':
+        return None
+    uid = str(change[1])
+    u = (g.get('users') or {}).get(uid)
+    rows = _levels_rows(gid, {'users': {uid: u}})['levels'] if u is not None else []
+    return 'levels', (gid, int(uid)), rows
+
+
+def _levels_doc(rows):
+    users = {}
+    for _, uid, text_xp, voice_xp, last in rows.get('levels', []):
+        users[str(uid)] = {"text_xp": text_xp, "voice_xp": voice_xp, "last_msg_xp_at": last}
+    return {'users': users}
+
+
+def _reminders_rows(gid: int, g: dict):
+    items = []
+    for it in g.get('items') or []:
+        items.append((gid, int(it.get('id')), int(it.get('user_id')),
+                      int(it['channel_id']) if it.get('channel_id') else None,
+                      1 if it.get('is_dm') else 0, it.get('message'),
+                      int(it.get('remind_at', 0)), int(it.get('created_at', 0))))
+    return {'reminder_guilds': [(gid, int(g.get('last_id', 0) or 0))], 'reminders': items}
+
+
+def _reminders_partial(gid: int, g: dict, change: tuple) -> Optional[Partial]:
+    if change == ('last_id',):
+        return 'reminder_guilds', (gid,), _reminders_rows(gid, {'last_id': g.get('last_id'), 'items': []})['reminder_guilds']
+    if change == ('items',):
+        return 'reminders', (gid,), _reminders_rows(gid, g)['reminders']
+    items = g.get('items') or []
+    if len(change) == 2 and change[0] == 'items' and isinstance(change[1], int) and 0 <= change[1] < len(items):
+        # Appended item; removals are saved as ('items',)
+        rows = _reminders_rows(gid, {'items': [items[change[1]]]})['reminders']
+        return 'reminders', rows[0][:2], rows
+    return None
+
+
+def _reminders_doc(rows):
+    last_id = rows['reminder_guilds'][0][1] if rows.get('reminder_guilds') else 0
+    items = []
+    for _, rid, uid, ch_id, is_dm, message, remind_at, created_at in sorted(rows.get('reminders', []), key=lambda r: r[1]):
+        items.append({'id': rid, 'user_id': uid, 'channel_id': ch_id, 'is_dm': bool(is_dm),
+                      'message': message, 'remind_at': remind_at, 'created_at': created_at})
+    return {'last_id': last_id, 'items': items}
+
+
+def _reputation_rows(gid: int, g: dict):
+    totals = [(gid, int(uid), int(total)) for uid, total in (g.get('totals') or {}).items()]
+    seen: Dict[tuple, int] = {}
+    logs = [_rep_log_row(gid, log, seen) for log in g.get('logs') or []]
+    return {'rep_totals': totals, 'rep_logs': logs}
+
+
+def _rep_log_row(gid: int, log: dict, seen: Dict[tuple, int]) -> tuple:
+    key = (gid, int(log.get('from')), int(log.get('to')), int(log.get('created_at', 0)))
+    dup = seen.get(key, 0)
+    seen[key] = dup + 1
+    return key + (dup, int(log.get('delta', 0)), log.get('reason'))
+
+
+def _reputation_partial(gid: int, g: dict, change: tuple) -> Optional[Partial]:
+    if change == ('logs',):
+        return 'rep_logs', (gid,), _reputation_rows(gid, g)['rep_logs']
+    if len(change) != 2:
+        return None
+    if change[0] == 'totals':
+        uid = str(change[1])
+        total = (g.get('totals') or {}).get(uid)
+        return 'rep_totals', (gid, int(uid)), [(gid, int(uid), int(total))] if total is not None else []
+    logs = g.get('logs') or []
+    if change[0] == 'logs' and isinstance(change[1], int) and 0 <= change[1] < len(logs):
+        # Appended entry; trims and removals are saved as ('logs',)
+        log = logs[change[1]]
+        seen: Dict[tuple, int] = {}
+        for earlier in logs[:change[1]]:
+            if earlier.get('created_at') == log.get('created_at'):
+                _rep_log_row(gid, earlier, seen)
+        row = _rep_log_row(gid, log, seen)
+        return 'rep_logs', row[:5], [row]
+    return None
+
+
+def _reputation_doc(rows):
+    totals = {str(uid): total for _, uid, total in rows.get('rep_totals', [])}
+    logs = []
+    for _, from_id, to_id, created_at, _, delta, reason in sorted(rows.get('rep_logs', []), key=lambda r: (r[3], r[4])):
+        logs.append({'from': from_id, 'to': to_id, 'delta': delta, 'reason': reason, 'created_at': created_at})
+    return {'totals': totals, 'logs': logs}
+
+
+def _birthdays_rows(gid: int, g: dict):
+    rows = []
+    for uid, info in (g.get('users') or {}).items():
+        rows.append((gid, int(uid), int(info.get('day', 0)), int(info.get('month', 0)), info.get('year')))
+    return {'birthdays': rows}
+
+
+def _birthdays_partial(gid: int, g: dict, change: tuple) -> Optional[Partial]:
+    if len(change) != 2 or change[0] != 'users':
+        return None
+    uid = str(change[1])
+    info = (g.get('users') or {}).get(uid)
+    rows = _birthdays_rows(gid, {'users': {uid: info}})['birthdays'] if info is not None else []
+    return 'birthdays', (gid, int(uid)), rows
+
+
+def _birthdays_doc(rows):
+    users = {}
+    for _, uid, day, month, year in rows.get('birthdays', []):
+        users[str(uid)] = {"day": day, "month": month, "year": year}
+    return {'users': users}
+
+
+def _marriages_rows(gid: int, g: dict):
+    rows = [(gid, int(p.get('a')), int(p.get('b')), int(p.get('started_at', 0))) for p in g.get('pairs') or []]
+    return {'marriages': rows}
+
+
+def _marriages_partial(gid: int, g: dict, change: tuple) -> Optional[Partial]:
+    if change == ('pairs',):
+        return 'marriages', (gid,), _marriages_rows(gid, g)['marriages']
+    pairs = g.get('pairs') or []
+    if len(change) == 2 and change[0] == 'pairs' and isinstance(change[1], int) and 0 <= change[1] < len(pairs):
+        # Appended pair; removals are saved as ('pairs',)
+        rows = _marriages_rows(gid, {'pairs': [pairs[change[1]]]})['marriages']
+        return 'marriages', rows[0][:3], rows
+    return None
+
+
+def _marriages_doc(rows):
+    pairs = sorted(rows.get('marriages', []), key=lambda r: r[3])
+    return {'pairs': [{"a": a, "b": b, "started_at": started} for _, a, b, started in pairs]}
+
+
+DATASETS: Dict[str, Dataset] = {
+    'levels': Dataset('levels', {
+        'levels': (('guild_id', 'user_id', 'text_xp', 'voice_xp', 'last_msg_xp_at'), 2),
+    }, _levels_rows, _levels_doc, _levels_partial),
+    'reminders': Dataset('reminders', {
+        'reminder_guilds': (('guild_id', 'last_id'), 1),
+        'reminders': (('guild_id', 'id', 'user_id', 'channel_id', 'is_dm', 'message', 'remind_at', 'created_at'), 2),
+    }, _reminders_rows, _reminders_doc, _reminders_partial),
+    'reputation': Dataset('reputation', {
+        'rep_totals': (('guild_id', 'user_id', 'total'), 2),
+        'rep_logs': (('guild_id', 'from_id', 'to_id', 'created_at', 'dup', 'delta', 'reason'), 5),
+    }, _reputation_rows, _reputation_doc, _reputation_partial),
+    'birthdays': Dataset('birthdays', {
+        'birthdays': (('guild_id', 'user_id', 'day', 'month', 'year'), 2),
+    }, _birthdays_rows, _birthdays_doc, _birthdays_partial),
+    'marriages': Dataset('marriages', {
+        'marriages': (('guild_id', 'a', 'b', 'started_at'), 3),
+    }, _marriages_rows, _marriages_doc, _marriages_partial),
+}
+
+
+def _index_rows(dataset: Dataset, data: Any) -> Rows:
+    indexed: Rows = {table: {} for table in dataset.tables}
+    if not isinstance(data, dict):
+        return indexed
+    for gid, g in data.items():
+        if not isinstance(g, dict):
+            continue
+        for table, rows in dataset.to_rows(int(gid), g).items():
+            key_len = dataset.tables[table][1]
+            for row in rows:
+                indexed[table][row[:key_len]] = row
+    return indexed
+
+
+def _diff_rows(dataset: Dataset, old: Rows, new: Rows) -> Tuple[Dict[str, List[tuple]], Dict[str, List[tuple]]]:
+    upserts, deletes = {}, {}
+    for table in dataset.tables:
+        before, after = old.get(table, {}), new.get(table, {})
+        upserts[table] = [row for key, row in after.items() if before.get(key) != row]
+        deletes[table] = [key for key in before if key not in after]
+    return upserts, deletes
+
+
+class SQLiteBackend:
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._db: Optional[aiosqlite.Connection] = None
+        self._connect_lock = asyncio.Lock()
+        self._paths: Dict[str, Dataset] = {}
+        # Rows as last written, used to turn a full document into a row diff
+        self._snapshots: Dict[str, Rows] = {}
+        self._imported: Set[str] = set()
+        self._import_locks: Dict[str, asyncio.Lock] = {}
+
+    async def connect(self) -> aiosqlite.Connection:
+        async with self._connect_lock:
+            if self._db is None:
+                d = os.path.dirname(self.db_path)
+                if d:
+                    os.makedirs(d, exist_ok=True)
+                db = await aiosqlite.connect(self.db_path)
+                await db.execute('PRAGMA journal_mode=WAL')
+                await db.execute('PRAGMA synchronous=NORMAL')
+                async with db.execute('PRAGMA table_info(rep_logs)') as cur:
+                    rep_logs_columns = [row[1] async for row in cur]
+                await db.executescript(schema_script(rep_logs_columns))
+                await db.commit()
+                self._db = db
+            return self._db
+
+    def register(self, path: str, dataset: Dataset):
+        path = os.path.abspath(path)
+        self._paths[path] = dataset
+        json_store.set_backend(path, self)
+
+    def _resolve(self, path: str) -> Tuple[Dataset, str, Optional[int]]:
+        # Either the dataset file itself or one of its guild shards
+        if path in self._paths:
+            return self._paths[path], path, None
+        dpath = os.path.dirname(path) + '.json'
+        gid = int(os.path.splitext(os.path.basename(path))[0])
+        return self._paths[dpath], dpath, gid
+
+    async def _select(self, dataset: Dataset, gid: Optional[int]) -> Dict[int, Dict[str, List[tuple]]]:
+        db = await self.connect()
+        grouped: Dict[int, Dict[str, List[tuple]]] = {}
+        for table, (columns, _) in dataset.tables.items():
+            sql = f"SELECT {', '.join(columns)} FROM {table}"
+            args: tuple = ()
+            if gid is not None:
+                sql += ' WHERE guild_id=?'
+                args = (gid,)
+            async with db.execute(sql, args) as cur:
+                async for row in cur:
+                    grouped.setdefault(row[0], {}).setdefault(table, []).append(tuple(row))
+        return grouped
+
+    @staticmethod
+    def _read_legacy(dpath: str) -> Dict[str, Any]:
+        # The unsharded file and/or the data/<name>/<gid>.json shards
+        data = json_store._read_file(dpath, None)
+        data = dict(data) if isinstance(data, dict) else {}
+        root = os.path.splitext(dpath)[0]
+        if os.path.isdir(root):
+            for name in os.listdir(root):
+                gid, ext = os.path.splitext(name)
+                if ext == '.json' and gid.isdigit():
+                    g = json_store._read_file(os.path.join(root, name), None)
+                    if isinstance(g, dict):
+                        data[gid] = g
+        return data
+
+    async def _import_legacy(self, dataset: Dataset, dpath: str):
+        if dpath in self._imported:
+            return
+        # Every load of the dataset (any guild shard) waits here until the
+        # import is committed, or it would read the still empty tables
+        lock = self._import_locks.setdefault(dpath, asyncio.Lock())
+        async with lock:
+            if dpath in self._imported:
+                return
+            db = await self.connect()
+            async with db.execute('SELECT 1 FROM imports WHERE dataset=?', (dataset.name,)) as cur:
+                done = await cur.fetchone() is not None
+            if not done:
+                empty = True
+                for table in dataset.tables:
+                    async with db.execute(f'SELECT 1 FROM {table} LIMIT 1') as cur:
+                        if await cur.fetchone() is not None:
+                            empty = False
+                            break
+                legacy = None
+                if empty:
+                    # First start on SQLite: import the existing JSON files if any
+                    legacy = await json_store.run_io(dpath, self._read_legacy, dpath)
+                # Recorded in the same transaction as the rows, so emptying
+                # the dataset later never brings the old files back
+                upserts, deletes = _diff_rows(dataset, _index_rows(dataset, {}), _index_rows(dataset, legacy or {}))
+                if not await self._write_rows(dataset, upserts, deletes, mark_imported=True):
+                    raise RuntimeError(f'importazione di {os.path.basename(dpath)} fallita')
+                if legacy:
+                    logger.info(f'Importato {os.path.basename(dpath)} in SQLite')
+            self._imported.add(dpath)
+
+    async def load(self, path: str, default: Any) -> Any:
+        dataset, dpath, gid = self._resolve(path)
+        try:
+            await self._import_legacy(dataset, dpath)
+            grouped = await self._select(dataset, gid)
+        except Exception as e:
+            logger.error(f'Errore nel caricamento di {dataset.name} da SQLite: {e}')
+            return default
+        if gid is not None:
+            if gid not in grouped:
+                self._snapshots[path] = _index_rows(dataset, {})
+                return default
+            doc = dataset.from_rows(grouped[gid])
+            self._snapshots[path] = _index_rows(dataset, {str(gid): doc})
+            return doc
+        if not grouped:
+            self._snapshots[path] = _index_rows(dataset, {})
+            return default
+        data = {str(g): dataset.from_rows(rows) for g, rows in grouped.items()}
+        self._snapshots[path] = _index_rows(dataset, data)
+        return data
+
+    def _partial_diff(self, dataset: Dataset, gid: Optional[int], data: Any, snapshot: Rows,
+                      changes: Iterable[Sequence]) -> Optional[Tuple[Dict[str, List[tuple]], Dict[str, List[tuple]]]]:
+        """Rows to upsert/delete for just these key paths, or None if one
+        of them can't be mapped to rows."""
+        if dataset.partial is None or not isinstance(data, dict):
+            return None
+        upserts: Dict[str, List[tuple]] = {}
+        deletes: Dict[str, List[tuple]] = {}
+        for change in changes:
+            change = tuple(change)
+            g, g_id = data, gid
+            if g_id is None:
+                # Whole dataset file: paths start with the guild id
+                if len(change) < 2:
+                    return None
+                g, g_id, change = data.get(str(change[0])), int(change[0]), change[1:]
+                if not isinstance(g, dict):
+                    return None
+            part = dataset.partial(g_id, g, change)
+            if part is None:
+                return None
+            table, prefix, rows = part
+            key_len = dataset.tables[table][1]
+            before = snapshot.setdefault(table, {})
+            fresh = {row[:key_len]: row for row in rows}
+            if len(prefix) == key_len:
+                stale = [prefix] if prefix in before and prefix not in fresh else []
+            else:
+                stale = [key for key in before if key[:len(prefix)] == prefix and key not in fresh]
+            deletes.setdefault(table, []).extend(stale)
+            upserts.setdefault(table, []).extend(row for key, row in fresh.items() if before.get(key) != row)
+        return upserts, deletes
+
+    async def save(self, path: str, data: Any, changes: Optional[Iterable[Sequence]] = None) -> bool:
+        """Write the rows behind the changed key paths (json_store passes the
+        ones collected since the last flush); the whole document is diffed
+        against the last written rows when changes is None."""
+        dataset, _, gid = self._resolve(path)
+        snapshot = self._snapshots.get(path)
+        plan = None
+        if changes is not None and snapshot is not None:
+            plan = self._partial_diff(dataset, gid, data, snapshot, changes)
+        if plan is None:
+            new = _index_rows(dataset, {str(gid): data} if gid is not None else data)
+            upserts, deletes = _diff_rows(dataset, snapshot or _index_rows(dataset, {}), new)
+            if not await self._write_rows(dataset, upserts, deletes):
+                return False
+            self._snapshots[path] = new
+            return True
+        upserts, deletes = plan
+        if not await self._write_rows(dataset, upserts, deletes):
+            return False
+        key_lens = {table: key_len for table, (_, key_len) in dataset.tables.items()}
+        for table, keys in deletes.items():
+            rows = snapshot.setdefault(table, {})
+            for key in keys:
+                rows.pop(key, None)
+        for table, rows in upserts.items():
+            target = snapshot.setdefault(table, {})
+            for row in rows:
+                target[row[:key_lens[table]]] = row
+        return True
+
+    async def _write_rows(self, dataset: Dataset, upserts: Dict[str, List[tuple]], deletes: Dict[str, List[tuple]],
+                          mark_imported: bool = False) -> bool:
+        db = None
+        try:
+            db = await self.connect()
+            for table, (columns, key_len) in dataset.tables.items():
+                changed = upserts.get(table)
+                removed = deletes.get(table)
+                if changed:
+                    keys = ', '.join(columns[:key_len])
+                    updates = ', '.join(f'{c}=excluded.{c}' for c in columns[key_len:])
+                    conflict = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+                    await db.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                        f"ON CONFLICT ({keys}) {conflict}", changed)
+                if removed:
+                    where = ' AND '.join(f'{c}=?' for c in columns[:key_len])
+                    await db.executemany(f'DELETE FROM {table} WHERE {where}', removed)
+            if mark_imported:
+                await db.execute(MARK_IMPORTED, (dataset.name, int(time.time())))
+            await db.commit()
+        except Exception as e:
+            logger.error(f'Errore nel salvataggio di {dataset.name} su SQLite: {e}')
+            if db is not None:
+                try:
+                    await db.rollback()
+                except Exception:
+                    pass
+            return False
+        return True
+
+    async def close(self):
+        if self._db is not None:
+            try:
+                await self._db.close()
+            finally:
+                self._db = None
+
+
+_backend: Optional[SQLiteBackend] = None
+
+
+def get_backend() -> Optional[SQLiteBackend]:
+    return _backend
+
+
+async def install(data_dir: str = DATA_DIR, db_path: str = DB_PATH) -> SQLiteBackend:
+    """Route data/<dataset>.json through SQLite for every known dataset."""
+    global _backend
+    if _backend is None:
+        _backend = SQLiteBackend(db_path)
+    await _backend.connect()
+    for name, dataset in DATASETS.items():
+        _backend.register(os.path.join(data_dir, f'{name}.json'), dataset)
+    logger.info(f'Storage SQLite attivo ({db_path})')
+    return _backend
@@ -0,0 +1,89 @@
+import os
+import time
+import asyncio
+
+from cogs.log.archive import DISCORD_EPOCH_MS, RECORD_OVERHEAD, ArchivedMessage, MessageArchive, segment_of
+
+
+def snowflake(ts: float, n: int = 0) -> int:
+    return (int(ts * 1000) - DISCORD_EPOCH_MS) << 22 | n
+
+
+def record(mid, channel_id=1, content='x'):
+    return ArchivedMessage(mid, channel_id, 7, content, ('a.png',))
+
+
+def test_each_channel_keeps_its_last_messages(tmp_path):
+    archive = MessageArchive(str(tmp_path), per_channel=3)
+    for i in range(5):
+        archive.add(0, record(i, channel_id=1))
+    archive.add(0, record(100, channel_id=2))
+    assert list(archive._channels[1]) == [2, 3, 4]
+    assert archive.count == 4
+    assert archive.bytes == sum(r.size() for ring in archive._channels.values() for r in ring.values())
+
+    # Edits replace the record without growing the ring
+    archive.add(0, record(3, channel_id=1, content='edited'))
+    assert archive.count == 4
+    assert archive._channels[1][3].content == 'edited'
+
+    archive.configure(per_channel=1, max_bytes=archive.max_bytes, disk=False, ttl=60, flush_interval=5)
+    assert list(archive._channels[1]) == [3]
+    assert archive.pop(1, 3).content == 'edited'
+    assert 1 not in archive._channels
+    assert archive.pop(1, 3) is None
+
+
+def test_byte_cap_evicts_the_oldest_across_channels(tmp_path):
+    size = record(0, content='y' * 100).size()
+    assert size == RECORD_OVERHEAD + 100 + len('a.png')
+    archive = MessageArchive(str(tmp_path), per_channel=100, max_bytes=size * 4)
+    for i in range(6):
+        archive.add(0, record(i, channel_id=i % 2, content='y' * 100))
+    assert archive.count == 4
+    assert archive.bytes == size * 4
+    assert sorted(mid for ring in archive._channels.values() for mid in ring) == [2, 3, 4, 5]
+
+    # Ring evictions leave stale keys in the order queue; they are skipped
+    archive.configure(per_channel=1, max_bytes=size * 4, disk=False, ttl=60, flush_interval=5)
+    archive.add(0, record(6, channel_id=0, content='y' * 100))
+    assert archive.count == 2
+    archive.configure(per_channel=1, max_bytes=size, disk=False, ttl=60, flush_interval=5)
+    assert archive.count == 1 and archive.bytes == size
+    assert list(archive._channels) == [0]
+
+
+def test_disk_segments_serve_evicted_messages_until_the_ttl(tmp_path):
+    now = time.time()
+    recent, old = snowflake(now - 60, 1), snowflake(now - 10 * 3600, 2)
+
+    async def main():
+        archive = MessageArchive(str(tmp_path), per_channel=1, disk=True, ttl=3 * 3600, flush_interval=60)
+        archive.add(5, record(recent, content='recent'))
+        archive.add(5, record(old, content='old'))
+        # Both evicted from memory (ring of one, then popped)
+        archive.pop(1, old)
+        assert recent not in archive._channels.get(1, {})
+        found = await archive.get_many(5, 1, [recent, old])
+        # The old one is past the TTL horizon and never read
+        assert {mid: r.content for mid, r in found.items()} == {recent: 'recent'}
+        # Another channel doesn't see it
+        assert await archive.get(5, 2, recent) is None
+        await archive.close()
+        return archive
+
+    archive = asyncio.run(main())
+    gdir = tmp_path / '5'
+    # The first flush already pruned the expired segment
+    assert os.listdir(gdir) == [segment_of(recent) + '.ndjson']
+    archive._prune_files(now + 4 * 3600)
+    assert not gdir.exists()
+
+
+def test_later_lines_win_and_bad_lines_are_skipped(tmp_path):
+    mid = snowflake(time.time(), 3)
+    path = tmp_path / '5' / (segment_of(mid) + '.ndjson')
+    path.parent.mkdir()
+    path.write_bytes(b'[%d, 1, 7, "first", []]\nnot json\n[%d, 1, 7, "second", ["b.txt"]]\n' % (mid, mid))
+    found = MessageArchive._read(str(path), frozenset([mid]))
+    assert found[mid] == ArchivedMessage(mid, 1, 7, 'second', ('b.txt',))
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from cogs.log import audit as audit_mod
+from cogs.log.audit import AuditCache
+
+BAN = discord.AuditLogAction.ban
+NICK = discord.AuditLogAction.member_update
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(audit_mod.time, 'monotonic', clock)
+    return clock
+
+
+def entry(action=BAN, target=5, user=9):
+    return SimpleNamespace(guild=SimpleNamespace(id=1), action=action, target=SimpleNamespace(id=target),
+                           user=SimpleNamespace(mention=f'<@{user}>'), user_id=user)
+
+
+class Guild:
+    id = 1
+
+    def __init__(self):
+        self.queries = 0
+
+    async def audit_logs(self, action, limit):
+        self.queries += 1
+        return
+        yield
+
+
+def test_each_key_drops_expired_entries_as_it_is_used(clock):
+    cache = AuditCache(ttl=30)
+    for _ in range(50):
+        cache.add(entry())
+        clock.now += 10
+    # Far under the 2000 key limit, yet only the live entries are kept
+    assert len(cache._entries[(1, BAN, 5)]) == 3
+
+    clock.now += 30
+    assert asyncio.run(cache.lookup(Guild(), BAN, 5, wait=0)) is None
+    assert (1, BAN, 5) not in cache._entries
+
+
+def test_lookup_returns_the_newest_matching_entry(clock):
+    cache = AuditCache(ttl=30)
+    first, second = entry(user=1), entry(user=2)
+    cache.add(first)
+    cache.add(second)
+    guild = Guild()
+    assert asyncio.run(cache.lookup(guild, BAN, 5)) is second
+    assert asyncio.run(cache.lookup(guild, BAN, 5, predicate=lambda e: e.user_id == 1)) is first
+    assert guild.queries == 0 and cache.hits == 2
+
+
+def test_misses_are_remembered_for_the_negative_ttl(clock):
+    cache = AuditCache(ttl=30, wait=0, negative_ttl=10)
+    guild = Guild()
+    assert asyncio.run(cache.lookup(guild, NICK, 5)) is None
+    assert asyncio.run(cache.lookup(guild, NICK, 5)) is None
+    assert guild.queries == 1
+
+    clock.now += 10
+    assert asyncio.run(cache.lookup(guild, NICK, 5)) is None
+    assert guild.queries == 2
+
+    # The entry arriving clears the remembered miss
+    cache.add(entry(NICK))
+    assert asyncio.run(cache.lookup(guild, NICK, 5)) is not None
@@ -0,0 +1,19 @@
+import json
+
+from config_store import ConfigStore
+
+
+def test_subscribers_get_the_changed_keys_or_none(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'status': 'a', 'active_counters': {}}))
+    store = ConfigStore(str(path))
+    seen = []
+    store.subscribe(lambda s, keys: seen.append(keys))
+
+    store['status'] = 'b'
+    store['active_counters']['1'] = 2
+    # Nested change: any key may be affected
+    store.save()
+    store.save({'active_counters'})
+    assert seen == [{'status'}, None, {'active_counters'}]
+    assert json.loads(path.read_text()) == {'status': 'b', 'active_counters': {'1': 2}}
@@ -0,0 +1,138 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from cogs.log import dispatcher as dispatcher_mod
+from cogs.log.dispatcher import (LogDispatcher, MAX_CHARS, MAX_EMBEDS, PRIORITY_HIGH,
+                                 PRIORITY_LOW, PRIORITY_NORMAL)
+
+WINDOW = 0.25
+
+
+def http_error(status, retry_after=None):
+    error = discord.HTTPException(SimpleNamespace(status=status, reason='test'), 'test')
+    if retry_after is not None:
+        error.retry_after = retry_after
+    return error
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, errors=None):
+        self.id = channel_id
+        self.sent = []
+        # Called with the embeds of each send; may raise
+        self.errors = errors or (lambda embeds: None)
+
+    async def send(self, embeds):
+        self.errors(embeds)
+        self.sent.append([e.title for e in embeds])
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the dispatcher's sleeps and skip the waiting."""
+    calls = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        calls.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(dispatcher_mod.asyncio, 'sleep', fake_sleep)
+    return calls
+
+
+def run(dispatcher, channel, embeds):
+    async def main():
+        for embed, priority in embeds:
+            await dispatcher.submit(channel, embed, priority)
+        for _ in range(200):
+            await asyncio.sleep(0)
+        stats = dispatcher.stats()
+        dispatcher.close()
+        return stats
+    return asyncio.run(main())
+
+
+def embed(title, size=0):
+    return discord.Embed(title=title, description='x' * size if size else None)
+
+
+def test_batches_pack_ten_embeds_in_priority_order(sleeps):
+    channel = FakeChannel()
+    items = [(embed(f'n{i}'), PRIORITY_NORMAL) for i in range(12)]
+    items.insert(5, (embed('high'), PRIORITY_HIGH))
+    items.insert(0, (embed('low'), PRIORITY_LOW))
+    run(LogDispatcher(window=WINDOW), channel, items)
+
+    assert [len(batch) for batch in channel.sent] == [MAX_EMBEDS, 4]
+    flat = [title for batch in channel.sent for title in batch]
+    assert flat == ['high'] + [f'n{i}' for i in range(12)] + ['low']
+
+
+def test_batches_respect_the_character_limit(sleeps):
+    channel = FakeChannel()
+    size = MAX_CHARS // 3
+    run(LogDispatcher(window=WINDOW), channel, [(embed(f'e{i}', size), PRIORITY_NORMAL) for i in range(5)])
+    assert [len(batch) for batch in channel.sent] == [2, 2, 1]
+    for batch in channel.sent:
+        assert len(batch) * (size + 2) <= MAX_CHARS
+
+
+def test_window_only_waits_for_the_first_batch_of_a_backlog(sleeps):
+    channel = FakeChannel()
+    run(LogDispatcher(window=WINDOW), channel, [(embed(f'e{i}'), PRIORITY_NORMAL) for i in range(25)])
+    assert [len(batch) for batch in channel.sent] == [10, 10, 5]
+    assert sleeps.count(WINDOW) == 1
+
+
+def test_rate_limited_batch_is_requeued_and_retried(sleeps):
+    calls = []
+
+    def errors(embeds):
+        calls.append(len(embeds))
+        if len(calls) == 1:
+            raise http_error(429, retry_after=1.5)
+
+    channel = FakeChannel(errors=errors)
+    stats = run(LogDispatcher(window=WINDOW), channel, [(embed(f'e{i}'), PRIORITY_NORMAL) for i in range(3)])
+
+    assert calls == [3, 3]
+    assert channel.sent == [['e0', 'e1', 'e2']]
+    assert stats[1]['sent'] == 3 and stats[1]['messages'] == 1
+    assert 1.5 in sleeps
+
+
+def test_bad_embed_only_drops_itself(sleeps):
+    def errors(embeds):
+        if any(e.title == 'bad' for e in embeds):
+            raise http_error(400)
+
+    channel = FakeChannel(errors=errors)
+    stats = run(LogDispatcher(window=WINDOW), channel, [(embed(t), PRIORITY_NORMAL) for t in ('a', 'bad', 'c')])
+
+    assert channel.sent == [['a'], ['c']]
+    assert stats[1]['sent'] == 2
+    assert stats[1]['depth'] == 0
+
+
+def test_full_queue_drops_lowest_priority_and_reports_it(sleeps):
+    channel = FakeChannel()
+    dispatcher = LogDispatcher(window=WINDOW, max_queue=10, backpressure=0)
+
+    async def main():
+        for i in range(10):
+            await dispatcher.submit(channel, embed(f'low{i}'), PRIORITY_LOW)
+        await dispatcher.submit(channel, embed('high'), PRIORITY_HIGH)
+        assert dispatcher.stats()[1]['dropped'] == 1
+        for _ in range(200):
+            await asyncio.sleep(0)
+        dispatcher.close()
+    asyncio.run(main())
+
+    flat = [title for batch in channel.sent for title in batch]
+    assert flat[0] == 'high'
+    assert 'low9' not in flat
+    assert flat[-1] == '⚠️ Log in sovraccarico'
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from cogs.levels import history as history_mod
+from cogs.levels.history import DAY, XPHistory, month_of
+
+
+class FakeShards:
+    def __init__(self):
+        self.docs = {}
+        self.fail = False
+
+    async def load(self, path, gid, default):
+        return self.docs.setdefault(gid, default)
+
+    async def save(self, path, gid, doc, changes=None):
+        if self.fail:
+            raise OSError('save')
+        self.docs[gid] = doc
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    fake = FakeShards()
+    monkeypatch.setattr(history_mod, 'load_shard', fake.load)
+    monkeypatch.setattr(history_mod, 'save_shard', fake.save)
+    return fake
+
+
+def test_xp_goes_to_the_day_it_was_earned(shards):
+    history = XPHistory('history.json')
+    history.record('1', '10', 5, 0, now=100 * DAY - 1)
+    history.record('1', '10', 0, 3, now=100 * DAY + 1)
+    history.record('1', '10', 0, 0, now=100 * DAY + 2)
+    asyncio.run(history.flush())
+    assert shards.docs['1']['daily'] == {'99': {'10': [5, 0]}, '100': {'10': [0, 3]}}
+
+
+def test_failed_flush_leaves_the_doc_and_keeps_the_deltas(shards):
+    history = XPHistory('history.json', daily_days=31)
+    old_day = 1000
+    cached = {'daily': {str(old_day): {'10': [4, 1]}}, 'monthly': {month_of(old_day): {'10': [1, 1]}}}
+    shards.docs['1'] = cached
+    snapshot = repr(cached)
+
+    # Far enough ahead that the old day is rolled into its month
+    history.record('1', '10', 7, 0, now=(old_day + 40) * DAY)
+    shards.fail = True
+    asyncio.run(history.flush())
+    assert repr(shards.docs['1']) == snapshot
+    assert history._pending == {'1': {old_day + 40: {'10': [7, 0]}}}
+
+    shards.fail = False
+    asyncio.run(history.flush())
+    doc = shards.docs['1']
+    assert doc['daily'] == {str(old_day + 40): {'10': [7, 0]}}
+    assert doc['monthly'] == {month_of(old_day): {'10': [5, 2]}}
+    assert history._pending == {}
+
+
+def test_windows_sum_days_and_whole_months(shards):
+    history = XPHistory('history.json', daily_days=31)
+    for day, xp in ((1000, 1), (1001, 2), (1100, 4)):
+        history.record('1', '10', xp, 0, now=day * DAY)
+        history.record('1', '11', 0, xp, now=day * DAY)
+    asyncio.run(history.flush())
+    assert asyncio.run(history.totals('1', 1100)) == {10: 4}
+    assert asyncio.run(history.ranked('1', 0, 'voice')) == [(11, 7)]
+    assert [s[1] for s in asyncio.run(history.series('1', 10, days=2, now=1100 * DAY))] == [0, 4]
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from cogs.levels import ledger as ledger_mod
+from cogs.levels.ledger import XPLedger
+
+
+class FakeShards:
+    """load_shard/save_shard over a dict, like the json_store cache."""
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}
+        self.saves = []
+        self.fail_load = False
+        self.fail_save = False
+
+    async def load(self, path, gid, default):
+        if self.fail_load:
+            raise OSError('load')
+        return self.docs.setdefault(gid, default)
+
+    async def save(self, path, gid, doc, changes=None):
+        if self.fail_save:
+            raise OSError('save')
+        self.docs[gid] = doc
+        self.saves.append((gid, sorted(changes)))
+
+
+@pytest.fixture
+def shards(monkeypatch):
+    fake = FakeShards()
+    monkeypatch.setattr(ledger_mod, 'load_shard', fake.load)
+    monkeypatch.setattr(ledger_mod, 'save_shard', fake.save)
+    return fake
+
+
+def test_cooldown_seeded_from_shard_then_memory(shards):
+    shards.docs['1'] = {'users': {'10': {'text_xp': 5, 'voice_xp': 0, 'last_msg_xp_at': 100}}}
+    ledger = XPLedger('levels.json')
+
+    assert asyncio.run(ledger.last_message_at('1', '10')) == 100
+    assert asyncio.run(ledger.last_message_at('1', '11')) == 0
+
+    ledger.add_text('1', '10', 7, now=160)
+    assert asyncio.run(ledger.last_message_at('1', '10')) == 160
+
+    ledger.prune_cooldowns(now=230, cooldown=60)
+    assert ('1', '10') not in ledger._last_msg
+    # Pruned: read again from the (not yet flushed) shard
+    assert asyncio.run(ledger.last_message_at('1', '10')) == 100
+
+
+def test_flush_folds_deltas_once(shards):
+    shards.docs['1'] = {'users': {'10': {'text_xp': 5, 'voice_xp': 1, 'last_msg_xp_at': 100}}}
+    ledger = XPLedger('levels.json')
+    ledger.add_text('1', '10', 3, now=150)
+    ledger.add_text('1', '10', 4, now=170)
+    ledger.add_voice('1', '11', 20)
+    assert ledger.pending('1', '10') == (7, 0)
+
+    asyncio.run(ledger.flush())
+
+    users = shards.docs['1']['users']
+    assert users['10'] == {'text_xp': 12, 'voice_xp': 1, 'last_msg_xp_at': 170}
+    assert users['11'] == {'text_xp': 0, 'voice_xp': 20, 'last_msg_xp_at': 0}
+    assert shards.saves == [('1', [('users', '10'), ('users', '11')])]
+    assert len(ledger) == 0
+    asyncio.run(ledger.flush())
+    assert len(shards.saves) == 1
+
+
+@pytest.mark.parametrize('failure', ['fail_load', 'fail_save'])
+def test_failed_flush_merges_deltas_back(shards, failure):
+    shards.docs['1'] = {'users': {'10': {'text_xp': 5, 'voice_xp': 0, 'last_msg_xp_at': 100}}}
+    ledger = XPLedger('levels.json')
+    ledger.add_text('1', '10', 3, now=150)
+    ledger.add_voice('1', '12', 9)
+
+    setattr(shards, failure, True)
+    asyncio.run(ledger.flush('1'))
+    # Nothing lost and the cached doc is untouched
+    assert ledger.pending('1', '10') == (3, 0)
+    assert ledger.pending('1', '12') == (0, 9)
+    assert shards.docs['1']['users'] == {'10': {'text_xp': 5, 'voice_xp': 0, 'last_msg_xp_at': 100}}
+
+    # More XP while the store was failing, then a good flush
+    ledger.add_text('1', '10', 2, now=180)
+    setattr(shards, failure, False)
+    asyncio.run(ledger.flush('1'))
+    users = shards.docs['1']['users']
+    assert users['10'] == {'text_xp': 10, 'voice_xp': 0, 'last_msg_xp_at': 180}
+    assert users['12'] == {'text_xp': 0, 'voice_xp': 9, 'last_msg_xp_at': 0}
+    assert len(ledger) == 0
+
+
+def test_listener_sees_flushed_deltas(shards):
+    seen = []
+    ledger = XPLedger('levels.json')
+    ledger.subscribe(lambda gid, doc, deltas: seen.append((gid, dict(deltas))))
+    ledger.add_text('2', '20', 1, now=10)
+    asyncio.run(ledger.flush())
+    assert seen == [('2', {'20': [1, 0, 10]})]
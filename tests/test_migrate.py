@@ -0,0 +1,47 @@
+import os
+import json
+
+import pytest
+
+import json_store
+from valiance_tools import migrate
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_store, '_backends', {})
+    monkeypatch.setattr(json_store, '_cache', {})
+    monkeypatch.setattr(migrate, 'ROOT', str(tmp_path))
+    monkeypatch.setattr(migrate, 'DATA_DIR', str(tmp_path / 'data'))
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'cogs' / 'moderation').mkdir(parents=True)
+    return tmp_path
+
+
+def run(root, target, verify_only=False):
+    state = migrate.State(str(root / 'data' / f'.migrate-{target}.json'), restart=True)
+    return migrate.Migration(target, str(root / 'data' / 'valiance.db'), 100, verify_only, state).run(['documents'])
+
+
+def test_to_json_keeps_documents_written_after_the_migration(root):
+    warns = root / 'cogs' / 'moderation' / 'warns.json'
+    warns.write_text(json.dumps({'1': [{'id': 1}]}))
+    assert run(root, 'sqlite')['errors'] == []
+
+    # The bot keeps writing warns.json on the SQLite backend
+    warns.write_text(json.dumps({'1': [{'id': 1}, {'id': 2}]}))
+    for verify_only in (True, False):
+        report = run(root, 'json', verify_only)
+        assert report['skipped'] == ['doc:cogs/moderation/warns.json']
+        assert report['errors'] == []
+    assert json.loads(warns.read_text()) == {'1': [{'id': 1}, {'id': 2}]}
+
+
+def test_to_json_restores_missing_documents(root):
+    warns = root / 'cogs' / 'moderation' / 'warns.json'
+    warns.write_text(json.dumps({'1': [{'id': 1}]}))
+    run(root, 'sqlite')
+    os.remove(warns)
+    report = run(root, 'json')
+    assert report['skipped'] == [] and report['errors'] == []
+    assert json.loads(warns.read_text()) == {'1': [{'id': 1}]}
@@ -0,0 +1,146 @@
+import random
+
+import discord
+import pytest
+
+from cogs.log.permissions import MAX_LINES, diff, flag_names, overwrites_diff, permissions_diff
+
+ALL_BITS = sorted(set(discord.Permissions.VALID_FLAGS.values()))
+# First name of each bit; the later ones are aliases (view_channel, ...)
+CANONICAL = []
+_seen = set()
+for _flag, _bit in discord.Permissions.VALID_FLAGS.items():
+    if _bit not in _seen:
+        _seen.add(_bit)
+        CANONICAL.append(_flag)
+ALIASES = set(discord.Permissions.VALID_FLAGS) - set(CANONICAL)
+
+
+def old_names(perms, flags=CANONICAL, without=None):
+    """The per-attribute getattr diff log.py used to do."""
+    return [p.replace('_', ' ') for p in flags if getattr(perms, p) and not (without is not None and getattr(without, p))]
+
+
+def old_overwrites_diff(before_overwrites, after_overwrites):
+    """Old per-target lines as (line with the mention left as {}, mention)."""
+    changes = []
+    for target in sorted(set(before_overwrites) | set(after_overwrites), key=lambda t: t.id):
+        b_over = before_overwrites.get(target)
+        a_over = after_overwrites.get(target)
+        line = None
+        if b_over is None and a_over is not None:
+            allow, deny = a_over.pair()
+            allow_perms, deny_perms = old_names(allow), old_names(deny)
+            if allow_perms or deny_perms:
+                line = f"Aggiunto overwrite per {{}}: Allow {', '.join(allow_perms) or 'Nessuno'}, Deny {', '.join(deny_perms) or 'Nessuno'}"
+        elif a_over is None and b_over is not None:
+            line = "Rimosso overwrite per {}"
+        else:
+            b_allow, b_deny = b_over.pair()
+            a_allow, a_deny = a_over.pair()
+            parts = []
+            for label, names in (('Allow aggiunti', old_names(a_allow, without=b_allow)),
+                                 ('Allow rimossi', old_names(b_allow, without=a_allow)),
+                                 ('Deny aggiunti', old_names(a_deny, without=b_deny)),
+                                 ('Deny rimossi', old_names(b_deny, without=a_deny))):
+                if names:
+                    parts.append(f"{label}: {', '.join(names)}")
+            if parts:
+                line = "Modificato overwrite per {}: " + '; '.join(parts)
+        if line is not None:
+            changes.append((line, target.mention))
+    return changes
+
+
+def grouped(changes):
+    """Old lines with the same change merged, as the new summary does."""
+    targets = {}
+    for line, mention in changes:
+        targets.setdefault(line, []).append(mention)
+    return '\n'.join(line.format(', '.join(mentions)) for line, mentions in targets.items())
+
+
+class Target:
+    def __init__(self, id):
+        self.id = id
+        self.mention = f'<@&{id}>'
+
+    def __hash__(self):
+        return self.id
+
+    def __eq__(self, other):
+        return isinstance(other, Target) and other.id == self.id
+
+
+def random_value(rng):
+    return sum(bit for bit in ALL_BITS if rng.random() < 0.3)
+
+
+def overwrite(allow, deny):
+    return discord.PermissionOverwrite.from_pair(discord.Permissions(allow), discord.Permissions(deny & ~allow))
+
+
+def test_flag_names_match_getattr_in_bit_order():
+    rng = random.Random(1)
+    for _ in range(200):
+        perms = discord.Permissions(random_value(rng))
+        assert flag_names(perms.value) == old_names(perms)
+    assert flag_names(0) == []
+    # Bits discord.py doesn't know about are skipped
+    assert flag_names(1 << 62 | 1) == old_names(discord.Permissions(1))
+
+
+def test_only_aliases_differ_from_the_full_getattr_diff():
+    perms = discord.Permissions.all()
+    full = old_names(perms, flags=discord.Permissions.VALID_FLAGS)
+    assert [n for n in full if n.replace(' ', '_') not in ALIASES] == flag_names(perms.value)
+
+
+def test_permissions_diff_matches_getattr_diff():
+    rng = random.Random(2)
+    for _ in range(200):
+        before = discord.Permissions(random_value(rng))
+        after = discord.Permissions(random_value(rng))
+        added = ', '.join(old_names(after, without=before)) or 'Nessuno'
+        removed = ', '.join(old_names(before, without=after)) or 'Nessuno'
+        assert permissions_diff(before, after) == (added, removed)
+    same = discord.Permissions(8)
+    assert permissions_diff(same, same) == ('Nessuno', 'Nessuno')
+
+
+def test_diff_bits():
+    assert diff(0b0110, 0b1100) == (0b1000, 0b0010)
+    assert diff(5, 5) == (0, 0)
+
+
+def test_overwrites_diff_matches_getattr_diff():
+    rng = random.Random(3)
+    for _ in range(100):
+        before, after = {}, {}
+        for i in range(rng.randrange(1, MAX_LINES)):
+            target = Target(1000 + i)
+            kind = rng.randrange(4)
+            if kind != 0:
+                before[target] = overwrite(random_value(rng), random_value(rng))
+            if kind != 1:
+                after[target] = overwrite(random_value(rng), random_value(rng))
+            if kind == 3:
+                after[target] = before[target]
+        assert overwrites_diff(before, after) == grouped(old_overwrites_diff(before, after))
+
+
+def test_same_change_on_many_targets_is_one_line_and_capped():
+    before = {Target(i): overwrite(0, 0) for i in range(3)}
+    after = {Target(i): overwrite(discord.Permissions.send_messages.flag, 0) for i in range(3)}
+    assert overwrites_diff(before, after) == 'Modificato overwrite per <@&0>, <@&1>, <@&2>: Allow aggiunti: send messages'
+
+    before = {Target(i): overwrite(0, 0) for i in range(MAX_LINES + 3)}
+    after = {Target(i): overwrite(ALL_BITS[i], 0) for i in range(MAX_LINES + 3)}
+    lines = overwrites_diff(before, after).split('\n')
+    assert len(lines) == MAX_LINES + 1
+    assert lines[-1] == '... e altre 3 modifiche'
+
+
+def test_empty_new_overwrite_is_not_reported():
+    assert overwrites_diff({}, {Target(1): overwrite(0, 0)}) == ''
+    assert overwrites_diff({Target(1): overwrite(1, 0)}, {}) == 'Rimosso overwrite per <@&1>'
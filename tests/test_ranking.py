@@ -0,0 +1,76 @@
+import random
+import asyncio
+
+from cogs.levels import ranking as ranking_mod
+from cogs.levels.ranking import Leaderboards, RankIndex
+
+
+def naive(xp):
+    return sorted(xp.items(), key=lambda x: (-x[1], x[0]))
+
+
+def check(index, xp):
+    expected = naive(xp)
+    assert len(index) == len(expected)
+    assert index.top(len(expected) + 5) == expected
+    assert index.top(3, offset=2) == expected[2:5]
+    for pos, (uid, value) in enumerate(expected, 1):
+        assert index.rank_of(uid) == pos
+        assert index.xp_of(uid) == value
+
+
+def test_rank_index_matches_a_full_sort_through_updates_and_removals():
+    rng = random.Random(7)
+    xp = {uid: rng.randrange(50) for uid in range(200)}
+    index = RankIndex.build(xp.items())
+    check(index, xp)
+    for _ in range(500):
+        uid = rng.randrange(260)
+        if rng.random() < 0.2:
+            index.remove(uid)
+            xp.pop(uid, None)
+        else:
+            xp[uid] = rng.randrange(50)
+            index.update(uid, xp[uid])
+    check(index, xp)
+
+
+def test_ties_break_by_user_id_and_unknown_users_have_no_rank():
+    index = RankIndex.build([(30, 10), (10, 10), (20, 5)])
+    assert index.top(3) == [(10, 10), (30, 10), (20, 5)]
+    assert index.rank_of(30) == 2
+    assert index.rank_of(99) is None
+    index.remove(10)
+    index.remove(99)
+    assert index.rank_of(30) == 1
+    assert 10 not in index
+    assert index.top(0) == [] and index.top(5, offset=10) == []
+
+
+def test_leaderboards_follow_flushes_and_rebuild_on_a_new_doc(monkeypatch):
+    docs = {'1': {'users': {'10': {'text_xp': 5, 'voice_xp': 9}, '11': {'text_xp': 7, 'voice_xp': 1}}}}
+
+    async def load_shard(path, gid, default):
+        return docs.get(gid, default)
+
+    monkeypatch.setattr(ranking_mod, 'load_shard', load_shard)
+    boards = Leaderboards('levels.json')
+
+    async def main():
+        text = await boards.get('1', 'text')
+        assert text.top(2) == [(11, 7), (10, 5)]
+        assert (await boards.get('1', 'voice')).rank_of(10) == 1
+
+        doc = docs['1']
+        doc['users']['10']['text_xp'] = 20
+        doc['users']['12'] = {'text_xp': 6, 'voice_xp': 0}
+        del doc['users']['11']
+        boards.update_users('1', doc, ['10', '11', '12'])
+        assert (await boards.get('1', 'text')).top(5) == [(10, 20), (12, 6)]
+        assert (await boards.get('1', 'voice')).rank_of(11) is None
+
+        # Reloaded from disk: a different object, so the index is rebuilt
+        docs['1'] = {'users': {'13': {'text_xp': 1, 'voice_xp': 1}}}
+        assert (await boards.get('1', 'text')).top(5) == [(13, 1)]
+
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+import pytest
+
+from cogs.levels.rules import compile_rewards, compile_rules
+
+START = 1_700_000_000
+
+
+@pytest.fixture
+def rules():
+    return compile_rules({
+        'multiplier_roles': {'1': 1.5, '2': 2, '3': 0.5, 'bad': 3},
+        'multiplier_channels': {'100': 2},
+        'excluded_channel_ids': [200],
+        'excluded_role_ids': ['9'],
+        'boosts': [
+            {'start': START, 'end': START + 3600, 'factor': 2},
+            {'start': '2023-11-14T22:13:20', 'end': START + 7200, 'factor': 1.5, 'channel_ids': [100]},
+            {'start': 'not a date', 'end': START, 'factor': 10},
+        ],
+    })
+
+
+def test_best_role_factor_wins_and_never_goes_below_one(rules):
+    before = START - 10
+    assert rules.multiplier([1, 2], now=before) == 2
+    assert rules.multiplier([3], now=before) == 1
+    assert rules.multiplier([], now=before) == 1
+
+
+def test_channel_and_boosts_stack_on_the_role_factor(rules):
+    # role 2 * channel 2 * global boost 2 * channel boost 1.5
+    assert rules.multiplier([2], 100, now=START) == pytest.approx(12)
+    # Other channel: only the global boost applies
+    assert rules.multiplier([2], 101, now=START) == pytest.approx(4)
+    # Global boost ended, channel boost still on
+    assert rules.multiplier([], 100, now=START + 3600) == pytest.approx(3)
+    # Both ended (end is exclusive)
+    assert rules.multiplier([], 100, now=START + 7200) == pytest.approx(2)
+
+
+def test_boost_dates_are_utc_and_invalid_entries_are_skipped(rules):
+    assert len(rules.boosts) == 2
+    assert rules.boosts[1].start == START
+
+
+def test_exclusions(rules):
+    assert rules.excluded([], 200)
+    assert rules.excluded([9, 1], 100)
+    assert not rules.excluded([1], 100)
+
+
+def test_voice_section_excludes_afk_channels():
+    voice = compile_rules({'per_min_min': 1, 'per_min_max': 3, 'exclude_afk_channel_ids': [5]}, voice=True)
+    assert voice.amount == (1, 3)
+    assert voice.excluded([], 5)
+
+
+def test_rewards_stack_or_keep_the_highest():
+    section = {'text': {'5': 50, '10': 100}, 'voice': {'3': 30}}
+    stacked = compile_rewards(dict(section, stack=True))
+    assert stacked.roles_for(12, 0) == {50, 100}
+    assert stacked.roles_for(7, 3) == {50, 30}
+    assert stacked.roles == {50, 100, 30}
+    highest = compile_rewards(dict(section, stack=False))
+    assert highest.roles_for(12, 4) == {100, 30}
+    assert highest.roles_for(1, 0) == set()
@@ -0,0 +1,143 @@
+import os
+import json
+import asyncio
+import sqlite3
+
+import pytest
+
+import json_store
+from sqlite_store import DATASETS, SQLiteBackend
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_store, '_backends', {})
+    monkeypatch.setattr(json_store, '_cache', {})
+    d = tmp_path / 'data'
+    d.mkdir()
+    return d
+
+
+def backend_for(data_dir, *names):
+    backend = SQLiteBackend(str(data_dir / 'valiance.db'))
+    for name in names:
+        backend.register(str(data_dir / f'{name}.json'), DATASETS[name])
+    return backend
+
+
+def test_legacy_json_is_imported_only_once(data_dir):
+    (data_dir / 'marriages.json').write_text(json.dumps(
+        {'1': {'pairs': [{'a': 10, 'b': 11, 'started_at': 5}]}}))
+    path = str(data_dir / 'marriages.json')
+
+    async def first_run():
+        backend = backend_for(data_dir, 'marriages')
+        data = await backend.load(path, {})
+        assert data == {'1': {'pairs': [{'a': 10, 'b': 11, 'started_at': 5}]}}
+        # Every marriage dissolved: the tables are empty again
+        data['1']['pairs'] = []
+        assert await backend.save(path, data, None)
+        await backend.close()
+
+    async def restart():
+        backend = backend_for(data_dir, 'marriages')
+        data = await backend.load(path, {})
+        await backend.close()
+        return data
+
+    asyncio.run(first_run())
+    assert asyncio.run(restart()) == {}
+    db = sqlite3.connect(str(data_dir / 'valiance.db'))
+    assert [r[0] for r in db.execute('SELECT dataset FROM imports')] == ['marriages']
+
+
+def test_filled_database_is_marked_without_importing(data_dir):
+    (data_dir / 'birthdays.json').write_text(json.dumps(
+        {'1': {'users': {'10': {'day': 1, 'month': 2, 'year': None}}}}))
+    path = str(data_dir / 'birthdays.json')
+
+    async def main():
+        backend = backend_for(data_dir, 'birthdays')
+        db = await backend.connect()
+        # A database from before the imports table, already in use
+        await db.execute('INSERT INTO birthdays VALUES (2, 20, 3, 4, NULL)')
+        await db.commit()
+        data = await backend.load(path, {})
+        await backend.close()
+        return data
+
+    assert asyncio.run(main()) == {'2': {'users': {'20': {'day': 3, 'month': 4, 'year': None}}}}
+
+
+def rep_log(src, dst, at, delta=1):
+    return {'from': src, 'to': dst, 'delta': delta, 'reason': None, 'created_at': at}
+
+
+def test_rep_logs_keep_their_rows_when_the_list_shifts(data_dir):
+    path = str(data_dir / 'reputation.json')
+    shard = str(data_dir / 'reputation' / '1.json')
+    logs = [rep_log(10, 11, 100), rep_log(12, 11, 100), rep_log(10, 11, 100, -1), rep_log(13, 11, 200)]
+
+    async def main():
+        backend = backend_for(data_dir, 'reputation')
+        await backend.load(shard, {})
+        doc = {'totals': {'11': 2}, 'logs': list(logs)}
+        assert await backend.save(shard, doc, None)
+
+        db = await backend.connect()
+        await db.execute('CREATE TEMP TABLE writes (n INTEGER)')
+        await db.execute("CREATE TEMP TRIGGER count_deletes AFTER DELETE ON rep_logs BEGIN INSERT INTO writes VALUES (1); END")
+        await db.execute("CREATE TEMP TRIGGER count_inserts AFTER INSERT ON rep_logs BEGIN INSERT INTO writes VALUES (1); END")
+        await db.execute("CREATE TEMP TRIGGER count_updates AFTER UPDATE ON rep_logs BEGIN INSERT INTO writes VALUES (1); END")
+
+        # The oldest entry is trimmed and a new one appended
+        doc['logs'] = doc['logs'][1:] + [rep_log(10, 11, 300)]
+        assert await backend.save(shard, doc, [('logs',)])
+        async with db.execute('SELECT COUNT(*) FROM writes') as cur:
+            writes = (await cur.fetchone())[0]
+        # The other entries keep their rows: the (10 -> 11, 100) duplicate
+        # left behind takes dup 0 (one update, one delete), plus the insert
+        assert writes == 3
+
+        # Appended one by one
+        doc['logs'].append(rep_log(10, 11, 300))
+        assert await backend.save(shard, doc, [('logs', len(doc['logs']) - 1)])
+        await backend.close()
+
+        backend = backend_for(data_dir, 'reputation')
+        reloaded = await backend.load(shard, {})
+        await backend.close()
+        return doc, reloaded
+
+    doc, reloaded = asyncio.run(main())
+    assert sorted(map(str, reloaded['logs'])) == sorted(map(str, doc['logs']))
+    assert [log['created_at'] for log in reloaded['logs']] == [100, 100, 200, 300, 300]
+
+
+def test_rep_logs_keyed_by_position_are_upgraded(data_dir):
+    db_path = str(data_dir / 'valiance.db')
+    db = sqlite3.connect(db_path)
+    db.executescript("""
+        CREATE TABLE rep_logs (guild_id INTEGER NOT NULL, seq INTEGER NOT NULL, from_id INTEGER NOT NULL,
+            to_id INTEGER NOT NULL, delta INTEGER NOT NULL, reason TEXT, created_at INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, seq));
+        CREATE INDEX idx_rep_logs_pair ON rep_logs (guild_id, from_id, to_id, created_at);
+        INSERT INTO rep_logs VALUES (1, 0, 10, 11, 1, 'a', 100), (1, 1, 10, 11, -1, 'b', 100), (1, 2, 12, 11, 1, NULL, 150);
+    """)
+    db.commit()
+    db.close()
+
+    async def main():
+        backend = backend_for(data_dir, 'reputation')
+        data = await backend.load(str(data_dir / 'reputation' / '1.json'), {})
+        await backend.close()
+        return data
+
+    assert asyncio.run(main())['logs'] == [
+        {'from': 10, 'to': 11, 'delta': 1, 'reason': 'a', 'created_at': 100},
+        {'from': 10, 'to': 11, 'delta': -1, 'reason': 'b', 'created_at': 100},
+        {'from': 12, 'to': 11, 'delta': 1, 'reason': None, 'created_at': 150},
+    ]
+    db = sqlite3.connect(db_path)
+    assert 'seq' not in [row[1] for row in db.execute('PRAGMA table_info(rep_logs)')]
+    assert db.execute("SELECT name FROM sqlite_master WHERE name='rep_logs_seq'").fetchone() is None
@@ -0,0 +1,86 @@
+import os
+import json
+import random
+
+import pytest
+
+from cogs.log.templates import EmbedTemplate, Lazy, Template, compile_templates
+
+LOG_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cogs', 'log', 'log.json')
+
+
+def chained_replace(text, values):
+    """How log.py filled templates before they were compiled."""
+    text = text or ''
+    for key, value in values.items():
+        text = text.replace('{' + key + '}', str(value))
+    return text
+
+
+def log_templates():
+    with open(LOG_JSON, encoding='utf-8') as f:
+        config = json.load(f)
+    out = []
+    for name, cfg in config.items():
+        if isinstance(cfg, dict):
+            for key in EmbedTemplate.TEXT_KEYS:
+                if isinstance(cfg.get(key), str):
+                    out.append((f'{name}.{key}', cfg[key]))
+    return out
+
+
+TEMPLATES = log_templates()
+
+
+def test_log_json_has_templates():
+    assert len(TEMPLATES) > 20
+
+
+@pytest.mark.parametrize('name,text', TEMPLATES, ids=[name for name, _ in TEMPLATES])
+def test_render_matches_chained_replace(name, text):
+    rng = random.Random(name)
+    fields = sorted(Template(text).fields)
+    # Every field, some fields, or none; plus unused keys
+    for values in (
+        {f: rng.choice(['<@123>', 'testo\ncon a capo', 42, '', 'ü ✓', None]) for f in fields},
+        {f: f'v{i}' for i, f in enumerate(fields) if i % 2},
+        {},
+    ):
+        values['unused'] = 'x'
+        assert Template(text).render(values) == chained_replace(text, values)
+
+
+@pytest.mark.parametrize('text', [
+    None, '', 'nessun segnaposto', '{a}', '{a}{a}{b}', '{{a}}', '{a', 'a}', '{ a }',
+    '{a.b}', '{é}', 'x{a}y{missing}z',
+])
+def test_edge_cases_match_chained_replace(text):
+    values = {'a': 'A', 'b': 2, 'é': 'E'}
+    assert Template(text).render(values) == chained_replace(text, values)
+
+
+def test_no_placeholders_returns_the_same_string():
+    text = 'Messaggio eliminato'
+    assert Template(text).render({'a': 1}) is text
+
+
+def test_lazy_values_are_only_computed_when_referenced():
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return 'computed'
+
+    templates = compile_templates({
+        'uses': {'title': 'Valore: {value}'},
+        'skips': {'title': 'Fisso', 'description': '{other}'},
+        'not_a_template': {'enabled': True},
+    })
+    assert set(templates) == {'uses', 'skips'}
+    kwargs = {'value': Lazy(expensive), 'other': 'o'}
+    assert templates['skips'].values(kwargs) == {'other': 'o'}
+    assert calls == []
+    values = templates['uses'].values(kwargs)
+    assert templates['uses'].title.render(values) == 'Valore: computed'
+    assert calls == [1]
+    assert templates['uses'].needs('value') and not templates['uses'].needs('other')
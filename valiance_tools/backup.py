@@ -0,0 +1,309 @@
+"""Incremental, content-addressed backups of the bot state.
+
+    python -m valiance_tools.backup snapshot
+    python -m valiance_tools.backup list
+    python -m valiance_tools.backup restore latest [--only data/levels] [--target DIR]
+    python -m valiance_tools.backup prune
+
+Files are cut in CHUNK_SIZE chunks stored once under objects/ by sha256 and
+compressed with zstd when the optional zstandard package is installed
+(pip install zstandard), gzip otherwise. A snapshot is a
+small manifest listing the chunks of every file, so an unchanged file costs
+nothing and an append-only file (journals, rep logs) only adds its last
+chunks. Files whose size and mtime match the previous snapshot are not even
+read. Retention keeps the newest snapshot of each of the last keep_hourly
+hours and keep_daily days; prune drops the rest and their unreferenced chunks.
+
+The bot runs snapshot() from a background task (see "backup" in config.json).
+Restore with the bot stopped.
+"""
+import os
+import sys
+import gzip
+import calendar
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json_store
+
+CHUNK_SIZE = 1024 * 1024
+BACKUP_DIR = os.path.join(ROOT, 'backups')
+# What counts as bot state, relative to ROOT
+SOURCES = ('config.json', 'data', 'cogs')
+INCLUDE_EXT = ('.json', '.journal')
+SKIP_SUFFIX = ('.tmp', '.lock', '.migrated')
+# Sidecars SQLite would replay over (or mix with) a restored database
+SQLITE_SIDECARS = ('-wal', '-shm', '-journal')
+
+
+def _codec(name: str) -> str:
+    return 'zst' if name == 'zstd' and zstandard is not None else 'gz'
+
+
+def _compress(raw: bytes, codec: str) -> bytes:
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=10).compress(raw)
+    return gzip.compress(raw, compresslevel=6)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError('serve il pacchetto zstandard per leggere questo backup')
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+def iter_state_files(root: str = ROOT) -> Iterator[str]:
+    for source in SOURCES:
+        path = os.path.join(root, source)
+        if os.path.isfile(path):
+            yield source
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d != '__pycache__')
+            for fname in sorted(filenames):
+                if fname.endswith(INCLUDE_EXT) and not fname.endswith(SKIP_SUFFIX):
+                    yield os.path.relpath(os.path.join(dirpath, fname), root).replace(os.sep, '/')
+
+
+class BackupStore:
+    def __init__(self, directory: str = BACKUP_DIR, compression: str = 'zstd', root: str = ROOT):
+        self.directory = os.path.abspath(directory)
+        self.root = root
+        self.codec = _codec(compression)
+        self.objects = os.path.join(self.directory, 'objects')
+        self.snapshots = os.path.join(self.directory, 'snapshots')
+
+    # Objects
+
+    def _object_path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.objects, digest[:2], f'{digest}.{codec}')
+
+    def _find_object(self, digest: str) -> Tuple[str, str]:
+        for codec in (self.codec, 'zst', 'gz'):
+            path = self._object_path(digest, codec)
+            if os.path.exists(path):
+                return path, codec
+        raise FileNotFoundError(f'chunk {digest} mancante')
+
+    def _put(self, chunk: bytes) -> Tuple[str, int]:
+        digest = hashlib.sha256(chunk).hexdigest()
+        try:
+            self._find_object(digest)
+            return digest, 0
+        except FileNotFoundError:
+            pass
+        path = self._object_path(digest, self.codec)
+        json_store._store_bytes(path, _compress(chunk, self.codec))
+        return digest, os.path.getsize(path)
+
+    def _get(self, digest: str) -> bytes:
+        path, codec = self._find_object(digest)
+        with open(path, 'rb') as f:
+            chunk = _decompress(f.read(), codec)
+        if hashlib.sha256(chunk).hexdigest() != digest:
+            raise ValueError(f'chunk {digest} corrotto')
+        return chunk
+
+    # Manifests
+
+    def list_snapshots(self) -> List[str]:
+        if not os.path.isdir(self.snapshots):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.snapshots) if f.endswith('.json'))
+
+    def load_manifest(self, name: str) -> dict:
+        if name == 'latest':
+            names = self.list_snapshots()
+            if not names:
+                raise FileNotFoundError('nessun backup presente')
+            name = names[-1]
+        with open(os.path.join(self.snapshots, f'{name}.json'), 'rb') as f:
+            manifest = json.loads(f.read())
+        manifest['name'] = name
+        return manifest
+
+    def _read_state_file(self, rel: str) -> bytes:
+        path = os.path.join(self.root, rel)
+        # Shared lock so a writer of the bot (or another process) is not mid-replace
+        with json_store.file_lock(path, exclusive=False):
+            with open(path, 'rb') as f:
+                return f.read()
+
+    def _add_file(self, rel: str, raw: bytes, st: os.stat_result, stats: dict) -> dict:
+        chunks = []
+        for i in range(0, len(raw), CHUNK_SIZE) or [0]:
+            digest, written = self._put(raw[i:i + CHUNK_SIZE])
+            chunks.append(digest)
+            stats['bytes_written'] += written
+        stats['files_read'] += 1
+        return {'size': len(raw), 'mtime_ns': st.st_mtime_ns,
+                'sha256': hashlib.sha256(raw).hexdigest(), 'chunks': chunks}
+
+    def snapshot(self, db_paths: Optional[List[str]] = None) -> dict:
+        """Blocking; the bot runs it in an executor after flushing json_store."""
+        started = time.time()
+        previous: Dict[str, dict] = {}
+        names = self.list_snapshots()
+        if names:
+            try:
+                previous = self.load_manifest(names[-1]).get('files', {})
+            except Exception:
+                previous = {}
+        stats = {'files': 0, 'files_read': 0, 'bytes_written': 0}
+        files: Dict[str, dict] = {}
+        for rel in iter_state_files(self.root):
+            try:
+                st = os.stat(os.path.join(self.root, rel))
+            except OSError:
+                continue
+            stats['files'] += 1
+            prev = previous.get(rel)
+            if prev and prev.get('size') == st.st_size and prev.get('mtime_ns') == st.st_mtime_ns:
+                files[rel] = prev
+                continue
+            try:
+                files[rel] = self._add_file(rel, self._read_state_file(rel), st, stats)
+            except OSError:
+                continue
+        # SQLite files are copied through the backup API, consistent even while open
+        for db_path in db_paths or []:
+            if not os.path.exists(db_path):
+                continue
+            rel = os.path.relpath(db_path, self.root).replace(os.sep, '/')
+            fd, tmp = tempfile.mkstemp(suffix='.db')
+            os.close(fd)
+            try:
+                src, dst = sqlite3.connect(db_path), sqlite3.connect(tmp)
+                try:
+                    src.backup(dst)
+                finally:
+                    src.close()
+                    dst.close()
+                with open(tmp, 'rb') as f:
+                    files[rel] = self._add_file(rel, f.read(), os.stat(db_path), stats)
+                stats['files'] += 1
+            finally:
+                os.remove(tmp)
+        name = base = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(started))
+        n = 1
+        while os.path.exists(os.path.join(self.snapshots, f'{name}.json')):
+            n += 1
+            name = f'{base}-{n}'
+        manifest = {'created_at': int(started), 'files': files}
+        json_store._store_bytes(os.path.join(self.snapshots, f'{name}.json'), json_store.dumps(manifest))
+        stats['name'] = name
+        stats['seconds'] = round(time.time() - started, 3)
+        return stats
+
+    # Retention
+
+    def prune(self, keep_hourly: int = 24, keep_daily: int = 14, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        names = self.list_snapshots()
+        keep = set(names[-1:])
+        hours, days = set(), set()
+        for name in reversed(names):
+            ts = calendar.timegm(time.strptime(name[:16], '%Y%m%dT%H%M%SZ'))
+            hour, day = int(ts // 3600), int(ts // 86400)
+            if now - ts < keep_hourly * 3600 and hour not in hours:
+                hours.add(hour)
+                keep.add(name)
+            if now - ts < keep_daily * 86400 and day not in days:
+                days.add(day)
+                keep.add(name)
+        removed = [n for n in names if n not in keep]
+        for name in removed:
+            os.remove(os.path.join(self.snapshots, f'{name}.json'))
+        # Chunks no longer referenced by any kept snapshot
+        referenced = set()
+        for name in keep:
+            for info in self.load_manifest(name).get('files', {}).values():
+                referenced.update(info.get('chunks', []))
+        objects_removed = 0
+        if os.path.isdir(self.objects):
+            for dirpath, _, filenames in os.walk(self.objects):
+                for fname in filenames:
+                    if fname.split('.')[0] not in referenced:
+                        os.remove(os.path.join(dirpath, fname))
+                        objects_removed += 1
+        return {'kept': len(keep), 'removed': removed, 'objects_removed': objects_removed}
+
+    # Restore
+
+    def restore(self, name: str = 'latest', only: Optional[str] = None, target: Optional[str] = None) -> dict:
+        manifest = self.load_manifest(name)
+        target = os.path.abspath(target or self.root)
+        files = manifest.get('files', {})
+        restored = []
+        for rel, info in sorted(files.items()):
+            if only and not (rel == only or rel.startswith(only.rstrip('/') + '/')):
+                continue
+            raw = b''.join(self._get(d) for d in info.get('chunks', []))
+            if hashlib.sha256(raw).hexdigest() != info.get('sha256'):
+                raise ValueError(f'{rel}: contenuto non corrispondente al backup')
+            path = os.path.join(target, *rel.split('/'))
+            with json_store.file_lock(path, exclusive=True):
+                if raw.startswith(b'SQLite format 3\x00'):
+                    # The backup API copy is self-contained; a leftover WAL
+                    # from before would be replayed over it on open
+                    for suffix in SQLITE_SIDECARS:
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+                json_store._store_bytes(path, raw)
+                # A newer journal would be replayed on top of the restored file
+                jpath = json_store._journal_path(path)
+                if rel + '.journal' not in files and os.path.exists(jpath):
+                    os.remove(jpath)
+            restored.append(rel)
+        return {'snapshot': manifest['name'], 'restored': len(restored), 'target': target}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m valiance_tools.backup', description='Backup incrementali dello stato del bot')
+    parser.add_argument('--dir', default=BACKUP_DIR, help='cartella dei backup')
+    parser.add_argument('--compression', choices=('zstd', 'gzip'), default='zstd')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('snapshot', help='crea un nuovo snapshot')
+    sub.add_parser('list', help='elenca gli snapshot')
+    p_restore = sub.add_parser('restore', help='ripristina uno snapshot (a bot spento)')
+    p_restore.add_argument('snapshot', nargs='?', default='latest')
+    p_restore.add_argument('--only', help='solo questo file o cartella, es. data/levels')
+    p_restore.add_argument('--target', help='ripristina in un\'altra cartella')
+    p_prune = sub.add_parser('prune', help='applica la retention')
+    p_prune.add_argument('--keep-hourly', type=int, default=24)
+    p_prune.add_argument('--keep-daily', type=int, default=14)
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.dir, args.compression)
+    if args.command == 'snapshot':
+        result = store.snapshot([os.path.join(ROOT, 'data', 'valiance.db')])
+    elif args.command == 'list':
+        result = []
+        for name in store.list_snapshots():
+            files = store.load_manifest(name).get('files', {})
+            result.append({'name': name, 'files': len(files), 'bytes': sum(f.get('size', 0) for f in files.values())})
+    elif args.command == 'restore':
+        result = store.restore(args.snapshot, args.only, args.target)
+    else:
+        result = store.prune(args.keep_hourly, args.keep_daily)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""Offline migration between the JSON files and the SQLite backend.
+
+    python -m valiance_tools.migrate --to sqlite     # JSON -> data/valiance.db
+    python -m valiance_tools.migrate --to json       # data/valiance.db -> JSON
+    python -m valiance_tools.migrate --to sqlite --verify-only
+
+Run it with the bot stopped. Work is split in units: one guild of a dataset
+(levels, reputation, ...) or one whole document (warns, closed tickets, a
+giveaway). Only one unit is in memory at a time, each unit is written
+atomically and verified (row count + sha256 of the canonical rows) right
+after, and finished units are recorded in a state file so an interrupted run
+resumes where it stopped (--restart starts over).
+
+The documents stay JSON files on both backends, so --to json only restores
+one that is missing or unchanged since it was migrated; a file the bot wrote
+after that is newer than the database copy and is skipped (and reported).
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json_store
+import sqlite_store
+from sqlite_store import DATASETS, MARK_IMPORTED, Dataset, _index_rows, schema_script
+
+DATA_DIR = os.path.join(ROOT, 'data')
+DOCUMENT_FILES = (
+    os.path.join('cogs', 'moderation', 'warns.json'),
+    os.path.join('cogs', 'ticket', 'closed_tickets.json'),
+)
+GIVEAWAY_DIR = os.path.join('cogs', 'giveaway', 'data')
+
+
+class VerifyError(Exception):
+    pass
+
+
+# Canonical form shared by both directions
+
+def canonical_rows(dataset: Dataset, gid: str, doc: Any) -> List[tuple]:
+    indexed = _index_rows(dataset, {gid: doc})
+    rows = []
+    for table in sorted(indexed):
+        rows.extend((table,) + row for _, row in sorted(indexed[table].items()))
+    return rows
+
+
+def digest_rows(rows: List[tuple]) -> str:
+    h = hashlib.sha256()
+    for row in rows:
+        h.update(json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def document_body(doc: Any) -> Tuple[str, int, str]:
+    body = json.dumps(doc, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    entries = len(doc) if isinstance(doc, (dict, list)) else 1
+    return body, entries, hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+# JSON side
+
+def _load(path: str) -> Any:
+    # A leftover journal is folded in memory only, the file is left as is
+    return json_store.read_document(path)
+
+
+class JsonDataset:
+    """Guild documents of data/<name>.json, one at a time.
+
+    Migrating does the same one-time split into shards the bot does, so every
+    unit can be read alone; with verify_only nothing is written and guilds
+    still in the unsplit file are served from one in-memory read of it.
+    """
+
+    def __init__(self, name: str, verify_only: bool):
+        self.path = os.path.join(DATA_DIR, f'{name}.json')
+        self.root = os.path.join(DATA_DIR, name)
+        self.legacy: Optional[dict] = None
+        if os.path.exists(self.path):
+            if verify_only:
+                legacy = json_store.read_document(self.path)
+                self.legacy = legacy if isinstance(legacy, dict) else None
+            else:
+                json_store.split_dataset(self.path)
+
+    def guilds(self) -> List[str]:
+        return json_store.dataset_guilds(self.path)
+
+    def shard(self, gid: str) -> str:
+        return os.path.join(self.root, f'{gid}.json')
+
+    def load(self, gid: str) -> Any:
+        shard = self.shard(gid)
+        if os.path.exists(shard) or self.legacy is None:
+            return _load(shard)
+        return self.legacy.get(gid)
+
+
+def json_documents() -> Iterator[str]:
+    for rel in DOCUMENT_FILES:
+        if os.path.exists(os.path.join(ROOT, rel)):
+            yield rel.replace(os.sep, '/')
+    gdir = os.path.join(ROOT, GIVEAWAY_DIR)
+    if os.path.isdir(gdir):
+        for fname in sorted(os.listdir(gdir)):
+            if fname.endswith('.json') and not fname.startswith('_'):
+                yield os.path.join(GIVEAWAY_DIR, fname).replace(os.sep, '/')
+    # data/*.json that are not one of the guild datasets
+    if os.path.isdir(DATA_DIR):
+        for fname in sorted(os.listdir(DATA_DIR)):
+            name, ext = os.path.splitext(fname)
+            if ext == '.json' and name not in DATASETS and not name.startswith('.'):
+                yield f'data/{fname}'
+
+
+def write_json_file(path: str, doc: Any):
+    # A stale journal would be replayed on top of the migrated data
+    if not json_store.write_document(path, doc, drop_journal=True):
+        raise OSError(f'scrittura di {path} fallita')
+
+
+# SQLite side
+
+def sqlite_guilds(db: sqlite3.Connection, dataset: Dataset) -> List[str]:
+    gids = set()
+    for table in dataset.tables:
+        gids.update(r[0] for r in db.execute(f'SELECT DISTINCT guild_id FROM {table}'))
+    return [str(g) for g in sorted(gids)]
+
+
+def sqlite_read_guild(db: sqlite3.Connection, dataset: Dataset, gid: str) -> Optional[dict]:
+    grouped: Dict[str, List[tuple]] = {}
+    for table, (columns, key_len) in dataset.tables.items():
+        cur = db.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE guild_id=? "
+                         f"ORDER BY {', '.join(columns[:key_len])}", (int(gid),))
+        rows = [tuple(r) for r in cur]
+        if rows:
+            grouped[table] = rows
+    return dataset.from_rows(grouped) if grouped else None
+
+
+def sqlite_write_guild(db: sqlite3.Connection, dataset: Dataset, gid: str, doc: Any, batch: int):
+    indexed = _index_rows(dataset, {gid: doc})
+    with db:
+        for table, (columns, _) in dataset.tables.items():
+            db.execute(f'DELETE FROM {table} WHERE guild_id=?', (int(gid),))
+            rows = list(indexed[table].values())
+            sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            for i in range(0, len(rows), batch):
+                db.executemany(sql, rows[i:i + batch])
+
+
+# Resumable state
+
+class State:
+    def __init__(self, path: str, restart: bool):
+        self.path = path
+        self.done: Dict[str, dict] = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        data = json_store.read_document(path)
+        if isinstance(data, dict):
+            self.done = data.get('done', {})
+
+    def mark(self, unit: str, rows: int, checksum: str):
+        self.done[unit] = {'rows': rows, 'checksum': checksum}
+        json_store.write_document(self.path, {'done': self.done, 'updated_at': int(time.time())})
+
+
+class Migration:
+    def __init__(self, target: str, db_path: str, batch: int, verify_only: bool, state: State):
+        self.target = target
+        self.batch = batch
+        self.verify_only = verify_only
+        self.state = state
+        if verify_only:
+            # Read-only: no schema, no WAL switch, nothing written
+            self.db = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        else:
+            self.db = sqlite3.connect(db_path)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in self.db.execute('PRAGMA table_info(rep_logs)')]
+            self.db.executescript(schema_script(columns))
+        self.totals: Dict[str, dict] = {}
+        self.errors: List[str] = []
+        # Documents not restored to JSON because the file is newer
+        self.skipped: List[str] = []
+
+    def _count(self, group: str, rows: int, checksum: str):
+        t = self.totals.setdefault(group, {'units': 0, 'rows': 0, 'checksum': hashlib.sha256()})
+        t['units'] += 1
+        t['rows'] += rows
+        t['checksum'].update(checksum.encode('ascii'))
+
+    def _unit(self, unit: str, group: str, copy, verify):
+        """copy() -> (rows, checksum) of the source; verify() -> same for the target."""
+        done = self.state.done.get(unit)
+        if done is not None and not self.verify_only:
+            self._count(group, done['rows'], done['checksum'])
+            return
+        try:
+            rows, checksum = copy()
+            got_rows, got_checksum = verify()
+            if (rows, checksum) != (got_rows, got_checksum):
+                raise VerifyError(f'{rows} righe {checksum[:12]} -> {got_rows} righe {got_checksum[:12]}')
+        except Exception as e:
+            self.errors.append(f'{unit}: {e}')
+            print(f'  ✗ {unit}: {e}', file=sys.stderr)
+            return
+        if not self.verify_only:
+            self.state.mark(unit, rows, checksum)
+        self._count(group, rows, checksum)
+
+    def dataset(self, name: str, dataset: Dataset):
+        source = JsonDataset(name, self.verify_only)
+        gids = source.guilds() if self.target == 'sqlite' else sqlite_guilds(self.db, dataset)
+        for gid in gids:
+            shard = source.shard(gid)
+
+            def source_json():
+                return canonical_rows(dataset, gid, source.load(gid))
+
+            def source_sqlite():
+                return canonical_rows(dataset, gid, sqlite_read_guild(self.db, dataset, gid))
+
+            if self.target == 'sqlite':
+                def copy():
+                    doc = source.load(gid)
+                    if not self.verify_only:
+                        sqlite_write_guild(self.db, dataset, gid, doc, self.batch)
+                    rows = canonical_rows(dataset, gid, doc)
+                    return len(rows), digest_rows(rows)
+                read_back = source_sqlite
+            else:
+                def copy():
+                    doc = sqlite_read_guild(self.db, dataset, gid)
+                    if not self.verify_only:
+                        write_json_file(shard, doc)
+                    rows = canonical_rows(dataset, gid, doc)
+                    return len(rows), digest_rows(rows)
+                read_back = source_json
+
+            def verify():
+                rows = read_back()
+                return len(rows), digest_rows(rows)
+
+            self._unit(f'{name}:{gid}', name, copy, verify)
+        if self.target == 'sqlite' and not self.verify_only:
+            # The bot must not import the JSON files over the migrated rows
+            with self.db:
+                self.db.execute(MARK_IMPORTED, (name, int(time.time())))
+
+    def documents(self):
+        if self.target == 'sqlite':
+            names = sorted(json_documents())
+        else:
+            names = [r[0] for r in self.db.execute('SELECT name FROM documents ORDER BY name')]
+        for name in names:
+            path = os.path.join(ROOT, *name.split('/'))
+
+            def read_sqlite():
+                row = self.db.execute('SELECT body, entries, checksum FROM documents WHERE name=?', (name,)).fetchone()
+                if row is None:
+                    raise VerifyError('documento mancante')
+                return row
+
+            if self.target == 'sqlite':
+                def copy():
+                    body, entries, checksum = document_body(_load(path))
+                    if not self.verify_only:
+                        with self.db:
+                            self.db.execute('INSERT INTO documents (name, body, entries, checksum) VALUES (?, ?, ?, ?) '
+                                            'ON CONFLICT (name) DO UPDATE SET body=excluded.body, '
+                                            'entries=excluded.entries, checksum=excluded.checksum',
+                                            (name, body, entries, checksum))
+                    return entries, checksum
+
+                def verify():
+                    body, entries, checksum = read_sqlite()
+                    if hashlib.sha256(body.encode('utf-8')).hexdigest() != checksum:
+                        raise VerifyError('checksum del documento non valido')
+                    return entries, checksum
+            else:
+                # The bot keeps these files as JSON on either backend, so the
+                # copy in the database is only a snapshot of the migration:
+                # a file changed since then is newer and is left alone
+                if os.path.exists(path):
+                    _, _, stored = read_sqlite()
+                    if document_body(_load(path))[2] != stored:
+                        self.skipped.append(f'doc:{name}')
+                        print(f'  ! doc:{name}: modificato dopo la migrazione, lasciato com\'è', file=sys.stderr)
+                        continue
+
+                def copy():
+                    body, entries, checksum = read_sqlite()
+                    if not self.verify_only:
+                        write_json_file(path, json.loads(body))
+                    return entries, checksum
+
+                def verify():
+                    _, entries, checksum = document_body(_load(path))
+                    return entries, checksum
+
+            self._unit(f'doc:{name}', 'documents', copy, verify)
+
+    def run(self, only: Optional[List[str]]):
+        for name, dataset in DATASETS.items():
+            if only and name not in only:
+                continue
+            print(f'→ {name}', file=sys.stderr)
+            self.dataset(name, dataset)
+        if not only or 'documents' in only:
+            print('→ documents', file=sys.stderr)
+            self.documents()
+        self.db.close()
+        return {
+            'target': self.target,
+            'verify_only': self.verify_only,
+            'groups': {g: {'units': t['units'], 'rows': t['rows'], 'checksum': t['checksum'].hexdigest()}
+                       for g, t in self.totals.items()},
+            'skipped': self.skipped,
+            'errors': self.errors,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m valiance_tools.migrate',
+                                     description='Migra i dati tra file JSON e SQLite (a bot spento)')
+    parser.add_argument('--to', choices=('sqlite', 'json'), required=True, help='formato di destinazione')
+    parser.add_argument('--db', default=sqlite_store.DB_PATH, help='database SQLite')
+    parser.add_argument('--only', help='gruppi da migrare, es. levels,reputation,documents')
+    parser.add_argument('--batch', type=int, default=5000, help='righe per INSERT')
+    parser.add_argument('--verify-only', action='store_true', help='confronta soltanto, senza scrivere')
+    parser.add_argument('--restart', action='store_true', help='ignora lo stato di una migrazione interrotta')
+    args = parser.parse_args(argv)
+
+    state = State(os.path.join(DATA_DIR, f'.migrate-{args.to}.json'), args.restart)
+    only = [s.strip() for s in args.only.split(',')] if args.only else None
+    report = Migration(args.to, args.db, max(1, args.batch), args.verify_only, state).run(only)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report['errors']:
+        sys.exit(1)
+    if args.to == 'sqlite' and not args.verify_only:
+        print('Imposta "storage_backend": "sqlite" in config.json per usare il database.', file=sys.stderr)
+    elif args.to == 'json' and not args.verify_only:
+        print('Imposta "storage_backend": "json" in config.json per tornare ai file.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()